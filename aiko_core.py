@@ -1,14 +1,22 @@
 import time
 import threading
 import queue
+from utils.config_manager import aiko_cfg
+from utils.db_manager import db
 from utils.logger import logger
+from utils.metrics import LatencyStats
+from utils.tracing import tracer
+from utils.audio_player import audio_manager
 from core.audio_handler import AudioHandler
+from core.audio_sources import create_source
 from core.plugin_loader import PluginLoader
 from utils.Intent_сlassifier import IntentClassifier
 from core.activation_service import ActivationService
 from core.scheduler import TaskScheduler
 from core.plugin_router import CommandRouter
 from core.stt import STTService
+from core.vad import VoiceActivityGate
+from core.stt_worker import STTWorker
 
 
 class AikoCore:
@@ -20,23 +28,37 @@ class AikoCore:
     MAX_RESTARTS = 3
     RESTART_COOLDOWN = 5  # сек
 
-    def __init__(self, ctx):
+    def __init__(self, ctx, audio_source=None):
+        """
+        :param audio_source: источник аудио (см. core.audio_sources); по умолчанию —
+                             из конфига (audio.source), обычно микрофон.
+        """
         self.ctx = ctx
         self.stop_event = threading.Event()
 
         self.threads = {}
         self.restart_counters = {}
+        # shutdown() зовется и из run(), и из GUI (выход из трея): выполняется один раз
+        self._shutdown_lock = threading.Lock()
+        self._is_shut_down = False
 
         logger.info("Core: Инициализация...")
 
         # --- Подсистемы ---
         self.audio = AudioHandler(
             device_id=self.ctx.device_id,
-            on_status_change=self.ctx.ui_audio_status
+            on_status_change=self.ctx.ui_audio_status,
+            source=audio_source or create_source(aiko_cfg, self.ctx.device_id)
         )
 
+        self.vad = VoiceActivityGate(samplerate=self.audio.samplerate)
         self.stt = STTService(self.ctx.model_path)
+        # Модель грузится в фоне, пока идут загрузка плагинов и обучение NLU
+        self.stt.preload(on_state_change=self._on_stt_state)
+        self.stt_worker = STTWorker(self.audio.audio_q, self.vad, self.stt)
         self.activation = ActivationService(self.ctx)
+        # Полный уровень STT нужен и без имени, пока открыто окно диалога
+        self.stt.window_probe = self.activation.is_window_active
 
         cmds, intent_map, fallbacks = PluginLoader.load_all()
         self.ctx.commands = cmds
@@ -47,6 +69,10 @@ class AikoCore:
         self.router = CommandRouter(nlu, intent_map, fallbacks)
         self.scheduler = TaskScheduler(self.ctx)
 
+        # Задержка от готовности фразы до старта ее обработки и время обработки
+        self.dispatch_wait = LatencyStats()
+        self.dispatch_time = LatencyStats()
+
         logger.info("Core: Готово.")
 
     # =========================
@@ -61,6 +87,11 @@ class AikoCore:
             target=self.audio.listen,
             args=(self.stop_event,)
         )
+        self._start_thread(
+            name="STT",
+            target=self.stt_worker.run,
+            args=(self.stop_event,)
+        )
 
         self.scheduler.start()
 
@@ -77,17 +108,24 @@ class AikoCore:
                             logger.error(f"Core: Ошибка тика в {cmd.__class__.__name__}: {e}")
                     # ----------------------------------
 
+                # Ядро только диспетчеризует готовые фразы из потока STT.
+                # Короткий timeout, чтобы цикл крутился чаще и тики были точнее
                 try:
-                    # Уменьшаем timeout, чтобы цикл крутился чаще и тики были точнее
-                    data = self.audio.audio_q.get(timeout=0.1)
-                    phrase = self.stt.get_phrase(data)
-
-                    if phrase:
-                        self._on_phrase_detected(phrase)
-
+                    phrase, is_final, captured_at, trace = self.stt_worker.phrase_q.get(timeout=0.1)
                 except queue.Empty:
                     continue
 
+                if not is_final:
+                    self._on_partial_detected(phrase)
+                    continue
+
+                started = time.monotonic()
+                self.dispatch_wait.add(started - captured_at)
+                with tracer.activate(trace):
+                    self._on_phrase_detected(phrase)
+                self.dispatch_time.add(time.monotonic() - started)
+                tracer.finish(trace, text=phrase)
+
         except KeyboardInterrupt:
             logger.warning("Core: Остановка по Ctrl+C")
         except Exception:
@@ -96,6 +134,11 @@ class AikoCore:
             self.shutdown()
 
     def shutdown(self):
+        with self._shutdown_lock:
+            if self._is_shut_down:
+                return
+            self._is_shut_down = True
+
         logger.info("Core: Shutdown...")
 
         self.stop_event.set()
@@ -108,6 +151,8 @@ class AikoCore:
                 logger.debug(f"Core: Ожидание {name}")
                 t.join(timeout=2)
 
+        # Сбрасывает отложенные записи (write-behind) и закрывает соединения
+        db.close()
         logger.info("Core: Остановлен корректно.")
 
     # =========================
@@ -153,11 +198,39 @@ class AikoCore:
                 target=self.audio.listen,
                 args=(self.stop_event,)
             )
+        elif name == "STT":
+            self._start_thread(
+                name="STT",
+                target=self.stt_worker.run,
+                args=(self.stop_event,)
+            )
+
+    def pipeline_stats(self) -> dict:
+        """Глубина очередей и задержки по стадиям голосового конвейера."""
+        return {
+            "audio": self.audio.audio_q.stats(),
+            "vad": self.vad.stats(),
+            "stt": self.stt_worker.stats(),
+            "dispatch": {
+                "wait": self.dispatch_wait.snapshot(),
+                "exec": self.dispatch_time.snapshot(),
+            },
+        }
 
     # =========================
     # Logic
     # =========================
 
+    def _on_partial_detected(self, text: str):
+        """
+        Ранняя активация: имя бота прозвучало, фраза еще не закончена.
+        Только индикация и звук: окно команд не открывается, адресована ли фраза
+        боту, решает check() по финальному тексту (Vosk может пересмотреть гипотезу).
+        """
+        if self.activation.check_partial(text):
+            self.set_state("active")
+            audio_manager.play.listen()
+
     def _on_phrase_detected(self, text: str):
         should_exec, clean_text = self.activation.check(text)
 
@@ -184,6 +257,15 @@ class AikoCore:
         elif name_triggered:
             self.activation.refresh_activation()
 
+    def _on_stt_state(self, state: str):
+        """Проброс готовности модели STT в контекст и трей."""
+        self.ctx.stt_state = state
+        if self.ctx.ui_stt_status:
+            self.ctx.ui_stt_status(state)
+
+        if state == "error":
+            self.ctx.ui_output("Модель распознавания речи не загружена", "error")
+
     # =========================
     # UI State
     # =========================
@@ -37,6 +37,7 @@ class AikoApp(QObject):
         self.ctx.open_ui = self.open_ui
         self.ctx.ui_status = self.tray.update_icon
         self.ctx.ui_audio_status = self.signals.audio_status_changed.emit
+        self.ctx.ui_stt_status = self.signals.stt_status_changed.emit
 
     def _connect_signals(self):
         """Внутренняя шина сигналов Qt."""
@@ -46,6 +47,10 @@ class AikoApp(QObject):
 
         self.signals.audio_status_changed.connect(self._handle_audio_status_change)
 
+        # Модель могла загрузиться раньше, чем поднялся GUI
+        self.signals.stt_status_changed.connect(self.tray.update_stt_status)
+        self.tray.update_stt_status(self.ctx.stt_state)
+
     def open_ui(self, name: str, *args, **kwargs):
         """Публичный метод вызова окон: ctx.open_ui(...)"""
         payload = {"name": name, "args": args, "kwargs": kwargs}
@@ -130,4 +135,6 @@ class AikoApp(QObject):
 
     def quit_app(self):
         self.ctx.is_running = False
+        # Поток ядра — демон: без явной остановки отложенные записи БД пропадут при выходе
+        self.core.shutdown()
         QApplication.quit()
\ No newline at end of file
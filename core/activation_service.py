@@ -4,6 +4,7 @@ from utils.audio_player import audio_manager
 from utils.config_manager import aiko_cfg
 from utils.matcher import CommandMatcher
 from utils.logger import logger
+from utils.tracing import tracer
 
 class ActivationService:
     """
@@ -13,16 +14,25 @@ class ActivationService:
 
     def __init__(self, ctx):
         self.ctx = ctx
+        # Источник времени: в офлайн-прогоне подменяется позицией в аудио
+        self.clock = time.time
         self.bot_name = aiko_cfg.get("bot.name", "айко").lower()
         self.threshold = aiko_cfg.get("audio.match_threshold", 80)
 
+        # Wake-word уже пойман на промежуточной гипотезе текущей фразы
+        self._partial_fired = False
+
         logger.info(f"Activation: Инициализация (Имя: {self.bot_name}, Порог: {self.threshold}%)")
 
+    @tracer.traced("activation.check")
     def check(self, text: str):
         """
         Определяет, адресована ли фраза боту.
         :return: (bool, clean_text)
         """
+        # Финальная фраза закрывает текущее высказывание
+        early_fired, self._partial_fired = self._partial_fired, False
+
         # 1. Триггер по имени (Айко, ...)
         is_trig, cmd_text = CommandMatcher.check_trigger(text, [self.bot_name], self.threshold)
         if is_trig:
@@ -30,20 +40,37 @@ class ActivationService:
             return True, cmd_text
 
         # 2. Активное окно (продолжение диалога)
-        if self._is_window_active():
-            audio_manager.play.listen()
+        if self.is_window_active():
+            # Звук уже прозвучал при раннем срабатывании на гипотезе
+            if not early_fired:
+                audio_manager.play.listen()
 
             logger.debug("Activation: Фраза в активном окне.")
             return True, text
 
         return False, None
 
+    def check_partial(self, text: str) -> bool:
+        """
+        Раннее срабатывание на промежуточной гипотезе STT (до конца фразы).
+        Срабатывает не чаще одного раза за высказывание.
+        :return: True, если в гипотезе найдено имя бота.
+        """
+        if self._partial_fired:
+            return False
+
+        is_trig, _ = CommandMatcher.check_trigger(text, [self.bot_name], self.threshold)
+        if is_trig:
+            self._partial_fired = True
+            logger.info(f"Activation: Ранний триггер '{self.bot_name}' в гипотезе: '{text}'")
+        return is_trig
+
     def extend_post_command_window(self):
         """
         Продлевает окно ожидания после успешного выполнения команды.
         Дает пользователю короткое время (post_command_window) на уточнение без повтора имени.
         """
-        self.ctx.last_activation_time = time.time() - (self.ctx.active_window - self.ctx.post_command_window)
+        self.ctx.last_activation_time = self.clock() - (self.ctx.active_window - self.ctx.post_command_window)
         logger.debug("Activation: Окно продлено после команды.")
 
     def refresh_activation(self):
@@ -51,15 +78,15 @@ class ActivationService:
         Сбрасывает таймер окна на полную длительность (active_window).
         Обычно вызывается при простом упоминании имени бота.
         """
-        self.ctx.last_activation_time = time.time()
+        self.ctx.last_activation_time = self.clock()
         logger.debug("Activation: Таймер окна сброшен на максимум.")
 
     def handle_timeouts(self, set_state_cb):
         """Сброс состояния в idle при неактивности."""
-        if not self._is_window_active() and self.ctx.state == "active":
+        if not self.is_window_active() and self.ctx.state == "active":
             logger.info("Activation: Окно закрыто по таймауту.")
             set_state_cb("idle")
 
-    def _is_window_active(self) -> bool:
-        """Внутренняя проверка: открыто ли сейчас окно диалога."""
-        return (time.time() - self.ctx.last_activation_time) < self.ctx.active_window
+    def is_window_active(self) -> bool:
+        """Проверка: открыто ли сейчас окно диалога."""
+        return (self.clock() - self.ctx.last_activation_time) < self.ctx.active_window
@@ -1,19 +1,30 @@
-import sounddevice as sd
-import queue
 import time
+from core.audio_sources import MicSource
+from core.ring_buffer import AudioRingBuffer
+from utils.config_manager import aiko_cfg
 from utils.logger import logger
 
 
 class AudioHandler:
     """
     Интерфейс захвата аудио.
-    Обеспечивает стабильный поток данных из микрофона в систему.
+    Обеспечивает стабильный поток данных из источника (микрофон, запись, синтетика) в систему.
     """
 
-    def __init__(self, device_id=1, samplerate=16000, on_status_change=None):
+    BLOCK_SIZE = 4000
+
+    def __init__(self, device_id=1, samplerate=16000, on_status_change=None, source=None):
         self.device_id = device_id
         self.samplerate = samplerate
-        self.audio_q = queue.Queue()
+        self.source = source or MicSource(device_id)
+
+        # Предвыделенный кольцевой буфер вместо безразмерной очереди байтов
+        buffer_sec = aiko_cfg.get("audio.buffer_seconds", 10)
+        self.audio_q = AudioRingBuffer(
+            capacity=int(buffer_sec * samplerate),
+            max_read=self.BLOCK_SIZE,
+            overflow=aiko_cfg.get("audio.overflow_policy", AudioRingBuffer.DROP_OLDEST)
+        )
 
         self.is_active = None
         self._need_restart = False
@@ -24,7 +35,7 @@ class AudioHandler:
 
     def _callback(self, indata, frames, time_info, status):
         """
-        Низкоуровневый колбэк PortAudio. Вызывается в отдельном высокоприоритетном потоке.
+        Низкоуровневый колбэк источника (для микрофона — поток PortAudio).
         """
         if status:
             # Игнорируем переполнение буфера, это обычное дело при кратковременных нагрузках
@@ -33,8 +44,14 @@ class AudioHandler:
                 return
 
         self.last_audio_time = time.time()
-        # Копируем данные, чтобы избежать повреждения при переиспользовании буфера библиотекой
-        self.audio_q.put(indata.copy().tobytes())
+        # Единственная копия: из буфера PortAudio сразу в кольцевой буфер
+        self.audio_q.write(indata)
+
+    def _has_room(self) -> bool:
+        # Источник быстрее реального времени жив, но ждет потребителя:
+        # это не молчание устройства, watchdog срабатывать не должен
+        self.last_audio_time = time.time()
+        return len(self.audio_q) + self.BLOCK_SIZE <= self.audio_q.capacity
 
     def _notify(self, new_state: bool, msg: str):
         """
@@ -56,47 +73,46 @@ class AudioHandler:
         """
         Основной цикл захвата. Инициализирует поток и следит за его 'здоровьем'.
         """
-        logger.info(f"Audio: Запуск захвата (Device: {self.device_id}, Rate: {self.samplerate})")
+        logger.info(f"Audio: Запуск захвата ({self.source}, Rate: {self.samplerate})")
 
         while not stop_event.is_set():
             self._need_restart = False
             self.last_audio_time = time.time()
 
-            # Очищаем очередь от старых данных перед новым запуском
-            with self.audio_q.mutex:
-                self.audio_q.queue.clear()
+            # Очищаем буфер от старых данных перед новым запуском
+            self.audio_q.clear()
 
             try:
-                # Валидация устройства
-                devices = sd.query_devices()
-                if self.device_id >= len(devices):
-                    raise IndexError(f"Устройство #{self.device_id} отсутствует.")
-
-                dev_info = devices[self.device_id]
-                logger.debug(f"Audio: Открытие потока для '{dev_info['name']}'")
-
-                # Настройка входного потока
-                with sd.InputStream(
-                        samplerate=self.samplerate,
-                        device=self.device_id,
-                        channels=1,
-                        dtype='int16',
-                        callback=self._callback,
-                        blocksize=4000  # Снизил до 125мс для лучшей отзывчивости, можно 4000
+                with self.source.open(
+                        self._callback,
+                        self.samplerate,
+                        self.BLOCK_SIZE,  # 250мс на блок
+                        has_room=self._has_room
                 ):
-                    self._notify(True, "Микрофон готов")
+                    self._notify(True, "Микрофон готов" if isinstance(self.source, MicSource) else f"Источник готов ({self.source})")
                     self.error_count = 0
 
                     # Контрольный цикл внутри активного стрима
                     while not stop_event.is_set() and not self._need_restart:
+                        if self.source.exhausted:
+                            break
+
                         # Hardware Watchdog: если данные не поступали более 2 секунд
                         if time.time() - self.last_audio_time > 2.0:
-                            raise sd.PortAudioError("Hardware Timeout: Устройство молчит.")
+                            raise TimeoutError("Hardware Timeout: Устройство молчит.")
 
                         time.sleep(0.4)
 
+                if self.source.exhausted:
+                    # Запись доиграна: ждем остановки или рестарта, а не перезапускаем по watchdog
+                    self._notify(False, "Источник исчерпан")
+                    while not stop_event.is_set() and not self._need_restart:
+                        time.sleep(0.1)
+
             except Exception as e:
                 self._notify(False, f"Ошибка: {str(e)[:40]}")
+                # Устройство могло исчезнуть или смениться — перечитаем список при следующей попытке
+                self.source.invalidate()
                 # Экспоненциальная пауза перед рестартом не нужна,
                 # фиксированные 5-10 секунд достаточно, чтобы не перегреть лог
                 logger.warning("Audio: Ожидание перед повторной попыткой подключения...")
@@ -112,6 +128,8 @@ class AudioHandler:
         """
         if new_device_id is not None:
             self.device_id = new_device_id
+            if isinstance(self.source, MicSource):
+                self.source.device_id = new_device_id
 
         logger.warning(f"Audio: Запрошен горячий рестарт (Device ID -> {self.device_id})")
         self._need_restart = True
\ No newline at end of file
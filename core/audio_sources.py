@@ -0,0 +1,232 @@
+"""
+Источники аудио для AudioHandler.
+
+Источник открывается как контекстный менеджер и, пока открыт, вызывает
+callback(indata, frames, time_info, status) с блоками int16 формы (N, 1) —
+ровно как sounddevice.InputStream. Поэтому очередь, VAD и watchdog
+одинаковы для микрофона, записи и синтетики, и весь конвейер можно
+гонять без звуковой карты.
+"""
+import threading
+import time
+import wave
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+from utils.logger import logger
+
+SAMPLE_RATE = 16000
+
+
+def load_audio(path) -> np.ndarray:
+    """
+    Читает запись как int16 моно 16 кГц.
+    WAV проверяется по заголовку, .raw/.pcm считаются сырым int16 моно 16 кГц.
+    """
+    path = Path(path)
+    if path.suffix.lower() != ".wav":
+        return np.fromfile(path, dtype=np.int16)
+
+    with wave.open(str(path), "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != SAMPLE_RATE:
+            raise ValueError(
+                f"Ожидается моно int16 {SAMPLE_RATE} Гц, получено: "
+                f"{wf.getnchannels()} кан., {wf.getsampwidth() * 8} бит, {wf.getframerate()} Гц"
+            )
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+
+class AudioSource(ABC):
+    """Базовый интерфейс источника."""
+
+    name = "source"
+
+    # Конечный источник (запись) выставляет флаг, когда данные закончились
+    exhausted = False
+
+    @abstractmethod
+    def open(self, callback, samplerate, blocksize, has_room=None):
+        """
+        Возвращает контекстный менеджер активного потока.
+        has_room() — признак свободного места у потребителя; источники быстрее
+        реального времени ждут его, чтобы не терять данные в кольцевом буфере.
+        """
+
+    def invalidate(self):
+        """Сброс закэшированного состояния после ошибки потока."""
+
+    def __str__(self):
+        return f"Source: {self.name}"
+
+
+class MicSource(AudioSource):
+    """
+    Микрофон через PortAudio.
+    Список устройств запрашивается один раз и перечитывается только после ошибки,
+    а не на каждом рестарте потока.
+    """
+
+    name = "mic"
+
+    def __init__(self, device_id=1):
+        self.device_id = device_id
+        self._devices = None
+
+    def _device_info(self, sd):
+        if self._devices is None:
+            self._devices = sd.query_devices()
+
+        if self.device_id >= len(self._devices):
+            # Устройство могло появиться после первого запроса
+            self._devices = None
+            raise IndexError(f"Устройство #{self.device_id} отсутствует.")
+
+        return self._devices[self.device_id]
+
+    def open(self, callback, samplerate, blocksize, has_room=None):
+        import sounddevice as sd
+
+        dev_info = self._device_info(sd)
+        logger.debug(f"Audio: Открытие потока для '{dev_info['name']}'")
+
+        return sd.InputStream(
+            samplerate=samplerate,
+            device=self.device_id,
+            channels=1,
+            dtype='int16',
+            callback=callback,
+            blocksize=blocksize
+        )
+
+    def invalidate(self):
+        self._devices = None
+
+    def __str__(self):
+        return f"Device: {self.device_id}"
+
+
+class _PumpStream:
+    """Поток-насос: режет блоки источника и отдает их в callback (аналог InputStream)."""
+
+    def __init__(self, source, callback, samplerate, blocksize, has_room=None):
+        self.source = source
+        self.callback = callback
+        self.has_room = has_room
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name=f"AudioSource-{self.source.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+    def _run(self):
+        block_sec = self.blocksize / self.samplerate
+        deadline = time.monotonic()
+        pending = np.empty(0, dtype=np.int16)
+
+        for chunk in self.source.blocks():
+            pending = np.concatenate((pending, np.asarray(chunk, dtype=np.int16).reshape(-1)))
+
+            while len(pending) >= self.blocksize:
+                if self._stop.is_set():
+                    return
+                if not self.source.realtime and self.has_room:
+                    # Без темпа реального времени — ждем, пока потребитель разберет буфер
+                    while not self.has_room() and not self._stop.is_set():
+                        self._stop.wait(0.001)
+                    if self._stop.is_set():
+                        return
+                self._push(pending[:self.blocksize])
+                pending = pending[self.blocksize:]
+
+                if self.source.realtime:
+                    # Темп реального времени по накопленному дедлайну, без дрейфа
+                    deadline += block_sec
+                    delay = deadline - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+
+        if len(pending) and not self._stop.is_set():
+            self._push(pending)
+
+        self.source.exhausted = True
+
+    def _push(self, block):
+        self.callback(block.reshape(-1, 1), len(block), None, None)
+
+
+class GeneratorSource(AudioSource):
+    """
+    Синтетический источник: итерируемое int16-блоков произвольной длины
+    или фабрика, возвращающая такое итерируемое (тогда рестарт начинает заново).
+    realtime=False отдает данные с максимальной скоростью.
+    """
+
+    name = "generator"
+
+    def __init__(self, blocks, realtime=True):
+        self._blocks = blocks
+        self.realtime = realtime
+
+    def blocks(self):
+        return self._blocks() if callable(self._blocks) else self._blocks
+
+    def open(self, callback, samplerate, blocksize, has_room=None):
+        self.exhausted = False
+        return _PumpStream(self, callback, samplerate, blocksize, has_room)
+
+
+class FileSource(GeneratorSource):
+    """
+    Воспроизведение записи (WAV/raw int16 моно 16 кГц) вместо микрофона.
+    В конце добавляется тишина, чтобы VAD закрыл последнюю фразу.
+    """
+
+    name = "file"
+
+    def __init__(self, path, realtime=True, loop=False, tail_silence_sec=1.0):
+        super().__init__(self._replay, realtime=realtime)
+        self.path = Path(path)
+        self.loop = loop
+        self.tail_silence_sec = tail_silence_sec
+        self._samples = None
+
+    def _replay(self):
+        if self._samples is None:
+            self._samples = load_audio(self.path)
+        silence = np.zeros(int(self.tail_silence_sec * SAMPLE_RATE), dtype=np.int16)
+
+        while True:
+            yield self._samples
+            yield silence
+            if not self.loop:
+                return
+
+    def __str__(self):
+        return f"File: {self.path.name}"
+
+
+def create_source(cfg, device_id=1) -> AudioSource:
+    """
+    Источник по конфигу: audio.source = "mic" (по умолчанию) или "file"
+    (audio.file_path, audio.realtime, audio.loop).
+    """
+    kind = cfg.get("audio.source", "mic")
+    if kind == "file":
+        return FileSource(
+            cfg.get("audio.file_path"),
+            realtime=cfg.get("audio.realtime", True),
+            loop=cfg.get("audio.loop", False)
+        )
+    if kind != "mic":
+        logger.warning(f"Audio: Неизвестный источник '{kind}', используется микрофон.")
+    return MicSource(device_id)
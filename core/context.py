@@ -22,6 +22,9 @@ class AikoContext:
         self.active_window = aiko_cfg.get("trigger.active_window", 5.0)
         self.post_command_window = aiko_cfg.get("trigger.post_command_window", 3.0)
 
+        # --- Готовность модели STT (loading, ready, error) ---
+        self.stt_state = "idle"
+
         # --- Конфигурация ресурсов ---
         self.model_path = Path(aiko_cfg.get("stt-model.path", "models/base"))
         self.device_id = aiko_cfg.get("audio.device_id", 1)
@@ -29,6 +32,7 @@ class AikoContext:
         # --- Коллбеки для GUI ---
         self.ui_status = lambda status: None
         self.ui_audio_status = lambda is_ok, msg: None
+        self.ui_stt_status = lambda state: None
 
     def ui_output(self, text: str, level: str = "info", priority: Optional[str] = None):
         """Централизованный вывод в UI уведомления."""
@@ -53,6 +57,16 @@ class AikoContext:
         else:
             logger.warning(f"CTX: Попытка открыть {name}, когда GUI не активен.")
 
+    @staticmethod
+    def _durability(priority):
+        """Критичные сообщения пишутся в outbox сразу, остальные могут ждать пакетного сброса."""
+        return db.CRITICAL if str(priority).lower() == "critical" else db.BUFFERED
+
+    @staticmethod
+    def _tg_priority(priority):
+        """Приоритет outbox: важные уходят первыми и не склеиваются с бэклогом."""
+        return {"critical": 2, "warning": 1}.get(str(priority).lower(), 0)
+
     def broadcast(self, text: str, ui=True, tg=True, window=None, priority: Optional[str] = None, **kwargs):
         """Вещание на все активные фронты (UI, Telegram, Окна)."""
         # Поддержка обоих имен аргумента для совместимости
@@ -66,8 +80,9 @@ class AikoContext:
 
         if tg:
             # Добавляем визуальный префикс для ТГ в зависимости от типа
-            prefix = "⚠️ " if priority in ["warning", "critical"] else "📢 "
-            db.add_tg_message(f"{prefix}{text}")
+            prefix = "⚠️ " if self._tg_priority(priority) else "📢 "
+            db.add_tg_message(f"{prefix}{text}", priority=self._tg_priority(priority),
+                              durability=self._durability(priority))
 
         logger.info(f"BROADCAST [{msg_type.upper()}]: {text}")
 
@@ -79,4 +94,4 @@ class AikoContext:
 
         # 2. Ответ в Telegram
         if self.last_input_source == "tg" or to_all:
-            db.add_tg_message(text)
\ No newline at end of file
+            db.add_tg_message(text, priority=self._tg_priority(priority), durability=self._durability(priority))
\ No newline at end of file
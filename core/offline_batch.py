@@ -0,0 +1,231 @@
+"""
+Офлайн-прогон голосового конвейера по записям.
+Гоняет WAV/raw int16 файлы через тот же STT + активацию + маршрутизацию,
+что и в продакшене, но быстрее реального времени и параллельно
+(пул процессов, своя модель Vosk в каждом воркере).
+
+Плагины не исполняются: для каждой фразы пишется каскад кандидатов роутера.
+
+Запуск:
+    python -m core.offline_batch recordings/ --out transcripts.jsonl --workers 4
+"""
+import os
+
+# В офлайне звуки активации не нужны, но AudioController должен подняться
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from core.audio_sources import load_audio, SAMPLE_RATE
+from utils.config_manager import aiko_cfg
+from utils.logger import logger
+
+AUDIO_EXTENSIONS = {".wav", ".raw", ".pcm"}
+BLOCK_SIZE = 4000
+
+# Конвейер воркера (один на процесс, создается в инициализаторе пула)
+_pipeline = None
+_init_error = None
+
+
+class OfflinePipeline:
+    """Продакшен-конвейер с часами, привязанными к позиции в записи."""
+
+    def __init__(self, model_path, plugins_dir="plugins"):
+        from core.activation_service import ActivationService
+        from core.context import AikoContext
+        from core.plugin_loader import PluginLoader
+        from core.plugin_router import CommandRouter
+        from core.stt import STTService
+        from core.stt_worker import STTWorker
+        from core.vad import VoiceActivityGate
+        from utils.Intent_сlassifier import IntentClassifier
+
+        self.stt = STTService(model_path)
+        self.stt._init_rec()
+        self.vad = VoiceActivityGate(samplerate=SAMPLE_RATE)
+        self.worker = STTWorker(None, self.vad, self.stt)
+
+        self.ctx = AikoContext()
+        self.activation = ActivationService(self.ctx)
+        self.stt.window_probe = self.activation.is_window_active
+
+        # Окно активации считается по времени записи, а не по стенным часам
+        self.audio_pos = 0.0
+        self.activation.clock = lambda: self.audio_pos
+
+        cmds, intent_map, fallbacks = PluginLoader.load_all(plugins_dir)
+        self.ctx.commands = cmds
+        nlu = IntentClassifier()
+        nlu.train(cmds)
+        self.router = CommandRouter(nlu, intent_map, fallbacks)
+
+    def transcribe(self, path) -> dict:
+        samples = load_audio(path)
+
+        self.stt.reset()
+        self.vad.reset()
+        self.audio_pos = 0.0
+        self.ctx.last_activation_time = float("-inf")
+
+        phrases = []
+        started = time.perf_counter()
+
+        for offset in range(0, len(samples), BLOCK_SIZE):
+            block = samples[offset:offset + BLOCK_SIZE]
+            self.audio_pos = (offset + len(block)) / SAMPLE_RATE
+            self.worker.process(memoryview(block))
+            self._drain(phrases)
+
+        # Хвост записи без финальной паузы
+        tail = self.stt.flush()
+        if tail:
+            self.worker._emit(tail, time.monotonic())
+            self._drain(phrases)
+
+        decode_sec = time.perf_counter() - started
+        audio_sec = len(samples) / SAMPLE_RATE
+
+        return {
+            "file": str(path),
+            "audio_sec": round(audio_sec, 3),
+            "decode_sec": round(decode_sec, 3),
+            "rtf": round(decode_sec / audio_sec, 4) if audio_sec else None,
+            "vad": self.vad.stats(),
+            "phrases": phrases,
+        }
+
+    def _drain(self, phrases):
+        while True:
+            try:
+                text, is_final, _, _ = self.worker.phrase_q.get_nowait()
+            except queue.Empty:
+                return
+
+            record = {"t": round(self.audio_pos, 2), "text": text, "final": is_final}
+            if is_final:
+                record.update(self._dispatch(text))
+                phrases.append(record)
+            elif self.activation.check_partial(text):
+                # Ранний wake-word, как в AikoCore._on_partial_detected: окно не открывается
+                record["wake"] = True
+                phrases.append(record)
+
+    def _dispatch(self, text) -> dict:
+        """Повторяет AikoCore._on_phrase_detected, но без исполнения плагинов."""
+        should_exec, clean_text = self.activation.check(text)
+        if not should_exec:
+            return {"activated": False}
+
+        result = {"activated": True, "command": clean_text}
+        name_triggered = (clean_text != text)
+
+        if name_triggered and not clean_text.strip():
+            self.activation.refresh_activation()
+            return result
+
+        candidates = self.router.explain(clean_text)
+        result["candidates"] = [f"{name}:{route}" for name, route in candidates[:3]]
+
+        if candidates:
+            self.activation.extend_post_command_window()
+        elif name_triggered:
+            self.activation.refresh_activation()
+
+        return result
+
+
+def _init_worker(model_path, plugins_dir):
+    global _pipeline, _init_error
+    try:
+        _pipeline = OfflinePipeline(model_path, plugins_dir)
+    except Exception as e:
+        # Не роняем пул: ошибка вернется в результате каждого файла
+        _init_error = f"Ошибка инициализации воркера: {e}"
+
+
+def _transcribe_file(path):
+    if _pipeline is None:
+        return {"file": str(path), "error": _init_error}
+    try:
+        return _pipeline.transcribe(path)
+    except Exception as e:
+        return {"file": str(path), "error": str(e)}
+
+
+def collect_files(root) -> list:
+    root = Path(root)
+    if root.is_file():
+        return [root]
+    return sorted(p for p in root.rglob("*") if p.suffix.lower() in AUDIO_EXTENSIONS)
+
+
+def run_batch(files, out_path, model_path, plugins_dir="plugins", workers=None) -> dict:
+    """
+    Распределяет файлы по пулу процессов и пишет результат в JSONL
+    (по строке на файл, в порядке готовности).
+    :return: сводка по прогону.
+    """
+    total_audio, total_decode, failed = 0.0, 0.0, 0
+    started = time.perf_counter()
+
+    with open(out_path, "w", encoding="utf-8") as out, ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(str(model_path), plugins_dir)
+    ) as pool:
+        futures = [pool.submit(_transcribe_file, str(f)) for f in files]
+
+        for future in as_completed(futures):
+            result = future.result()
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+            if "error" in result:
+                failed += 1
+                logger.error(f"Batch: {result['file']}: {result['error']}")
+                continue
+
+            total_audio += result["audio_sec"]
+            total_decode += result["decode_sec"]
+            logger.info(f"Batch: {result['file']} — {len(result['phrases'])} фраз, RTF {result['rtf']}")
+
+    wall = time.perf_counter() - started
+    summary = {
+        "files": len(files),
+        "failed": failed,
+        "audio_sec": round(total_audio, 2),
+        "decode_sec": round(total_decode, 2),
+        "wall_sec": round(wall, 2),
+        "rtf": round(total_decode / total_audio, 4) if total_audio else None,
+        "speedup": round(total_audio / wall, 2) if wall else None,
+    }
+    logger.info(f"Batch: Готово. {summary}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Офлайн-прогон STT + активации + роутинга по записям.")
+    parser.add_argument("input", help="Файл или директория с WAV/raw int16 (моно, 16 кГц)")
+    parser.add_argument("--out", default="transcripts.jsonl", help="Куда писать JSONL")
+    parser.add_argument("--model", default=aiko_cfg.get("stt-model.path", "models/base"))
+    parser.add_argument("--plugins", default="plugins")
+    parser.add_argument("--workers", type=int, default=None, help="Размер пула (по умолчанию — число ядер)")
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.input)
+    if not files:
+        logger.warning(f"Batch: В '{args.input}' нет аудиофайлов.")
+        return 1
+
+    summary = run_batch(files, args.out, args.model, args.plugins, args.workers)
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0 if not summary["failed"] else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
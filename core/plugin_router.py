@@ -1,6 +1,7 @@
 import re
 from utils.logger import logger
 from utils.matcher import CommandMatcher
+from utils.tracing import tracer
 
 
 class CommandRouter:
@@ -53,6 +54,22 @@ class CommandRouter:
         logger.warning(f"Router: Ни один плагин не обработал команду: '{raw_text}'")
         return False
 
+    def explain(self, text: str) -> list:
+        """
+        Каскад кандидатов без исполнения плагинов (для офлайн-анализа и тюнинга).
+        :return: [(plugin_name, route_name), ...] в порядке попыток.
+        """
+        raw_text = text.lower().strip()
+        seen, result = set(), []
+
+        for plugin, route_name in self._get_candidates(raw_text):
+            if not plugin or plugin in seen:
+                continue
+            seen.add(plugin)
+            result.append((plugin.__class__.__name__, route_name))
+
+        return result
+
     def _get_candidates(self, text):
         """Генератор кандидатов: NLU -> Triggers -> Fallbacks."""
         # 1. NLU
@@ -75,12 +92,16 @@ class CommandRouter:
     def _execute(self, plugin, text, route, ctx):
         """Безопасный запуск плагина."""
         p_name = plugin.__class__.__name__
-        try:
-            if plugin.execute(text, ctx):
-                logger.info(f"Router: [OK] {p_name} через {route}")
-                return True
-            logger.debug(f"Router: [SKIP] {p_name} отклонил {route}")
-            return False
-        except Exception as e:
-            logger.error(f"Router: [ERR] {p_name} в {route}: {e}", exc_info=True)
-            return False
\ No newline at end of file
+        with tracer.span("router.execute", plugin=p_name, route=route) as span:
+            try:
+                if plugin.execute(text, ctx):
+                    logger.info(f"Router: [OK] {p_name} через {route}")
+                    span.set(ok=True)
+                    return True
+                logger.debug(f"Router: [SKIP] {p_name} отклонил {route}")
+                span.set(ok=False)
+                return False
+            except Exception as e:
+                logger.error(f"Router: [ERR] {p_name} в {route}: {e}", exc_info=True)
+                span.set(ok=False, error=type(e).__name__)
+                return False
\ No newline at end of file
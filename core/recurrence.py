@@ -0,0 +1,59 @@
+"""
+Правила повторения задач планировщика.
+
+Правило хранится в колонке scheduler.rule (JSON) одной строки задачи:
+    {"every_sec": 7200, "anchor": "2026-01-05 09:00:00"}   — каждые N секунд от якоря
+    {"weekdays": [0, 2, 4], "anchor": "2026-01-05 09:00:00"} — по дням недели (0 — Пн)
+                                                               во время суток якоря
+После срабатывания следующий запуск вычисляется и записывается в ту же строку.
+"""
+import math
+from datetime import datetime, timedelta
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+
+def rule_from_repeat(repeat, anchor):
+    """
+    Правило из спецификации повторения окна напоминаний
+    ({"type": "Каждые N часов", "interval": N, "days": ["Пн", ...]}).
+    :return: dict правила или None для разовой задачи.
+    """
+    if not repeat:
+        return None
+    kind = repeat.get("type")
+    if kind == "Каждые N часов" and repeat.get("interval"):
+        return {"every_sec": int(repeat["interval"]) * 3600, "anchor": anchor}
+    if kind == "По дням недели":
+        days = sorted(WEEKDAYS.index(d) for d in repeat.get("days", []) if d in WEEKDAYS)
+        if days:
+            return {"weekdays": days, "anchor": anchor}
+    return None
+
+
+def next_occurrence(rule, after: datetime):
+    """Первый запуск по правилу строго позже after; None, если правило пустое или битое."""
+    try:
+        anchor = datetime.strptime(rule["anchor"], TIME_FORMAT)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    step = rule.get("every_sec")
+    if step:
+        if after < anchor:
+            return anchor
+        periods = math.floor((after - anchor).total_seconds() / step) + 1
+        return anchor + timedelta(seconds=periods * step)
+
+    days = set(rule.get("weekdays") or [])
+    if days:
+        # Поиск с даты якоря, если он еще впереди
+        start = max(after, anchor - timedelta(seconds=1))
+        candidate = datetime.combine(start.date(), anchor.time())
+        for shift in range(8):
+            moment = candidate + timedelta(days=shift)
+            if moment > after and moment >= anchor and moment.weekday() in days:
+                return moment
+
+    return None
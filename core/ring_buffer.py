@@ -0,0 +1,160 @@
+import threading
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Кольцевой буфер аудио фиксированного размера (int16, NumPy).
+    Схема Single-Producer / Single-Consumer: пишет только колбэк PortAudio,
+    читает только поток распознавания. Индексы монотонные, у каждого поля
+    ровно один владелец-писатель, поэтому на пути данных нет блокировок.
+
+    Чтение отдает memoryview прямо на внутреннюю память (без копирования).
+    Выданный блок остается валидным до следующего вызова read().
+    """
+
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+
+    def __init__(self, capacity=160000, max_read=4000, overflow=DROP_OLDEST):
+        if overflow not in (self.DROP_OLDEST, self.DROP_NEWEST):
+            raise ValueError(f"Неизвестная политика переполнения: {overflow}")
+
+        self.capacity = int(capacity)
+        self.max_read = int(max_read)
+        self.overflow = overflow
+
+        # Физически буфер вдвое больше логической емкости: при DROP_OLDEST
+        # читатель сам перескакивает устаревшие кадры, а писателю остается
+        # запас, чтобы не перезаписать блок, выданный читателю.
+        self._size = 2 * self.capacity + self.max_read
+        self._buf = np.zeros(self._size, dtype=np.int16)
+
+        # --- Поля писателя ---
+        self._write = 0        # Всего записано кадров
+        self._drop_to = 0      # Кадры ниже отметки сброшены через clear()
+        self._dropped_new = 0
+        self._overflows_new = 0
+
+        # --- Поля читателя ---
+        self._read = 0         # Кадры ниже отметки уже выданы читателю
+        self._lease_start = 0  # Начало блока, который сейчас у читателя
+        self._dropped_old = 0
+        self._overflows_old = 0
+        self.read_frames = 0
+
+        self._data_ready = threading.Event()
+
+    # =========================
+    # Producer
+    # =========================
+
+    def write(self, frames) -> int:
+        """
+        Записывает кадры в буфер (вызывается из колбэка PortAudio).
+        :param frames: массив int16 формы (N,) или (N, 1).
+        :return: количество фактически записанных кадров.
+        """
+        data = np.asarray(frames, dtype=np.int16).reshape(-1)
+        count = len(data)
+        if not count:
+            return 0
+
+        if self.overflow == self.DROP_NEWEST:
+            head = max(self._read, self._drop_to)
+            free = self.capacity - (self._write - head)
+        else:
+            # Старые кадры отбросит читатель, здесь только защищаем выданный блок
+            free = self._lease_start + self._size - self._write
+
+        if count > free:
+            free = max(free, 0)
+            self._dropped_new += count - free
+            self._overflows_new += 1
+            data = data[:free]
+            count = free
+
+        if not count:
+            return 0
+
+        start = self._write % self._size
+        first = min(count, self._size - start)
+        self._buf[start:start + first] = data[:first]
+        if first < count:
+            self._buf[:count - first] = data[first:]
+
+        self._write += count
+        self._data_ready.set()
+        return count
+
+    def clear(self):
+        """Отбрасывает накопленные данные (например, перед рестартом потока)."""
+        self._drop_to = self._write
+
+    # =========================
+    # Consumer
+    # =========================
+
+    def read(self, max_frames=None, timeout=None):
+        """
+        Забирает следующий непрерывный блок данных.
+        :param max_frames: максимум кадров (не больше max_read).
+        :param timeout: сколько ждать данные в секундах (None — не ждать).
+        :return: memoryview int16 или None, если данных нет.
+        """
+        limit = min(max_frames or self.max_read, self.max_read)
+
+        if self._write <= max(self._read, self._drop_to):
+            self._data_ready.clear()
+            # Повторная проверка после сброса флага, чтобы не потерять запись
+            if self._write <= max(self._read, self._drop_to):
+                if not timeout or not self._data_ready.wait(timeout):
+                    return None
+
+        write = self._write
+        start = max(self._read, self._drop_to)
+        if write <= start:
+            return None
+
+        if self.overflow == self.DROP_OLDEST and write - start > self.capacity:
+            self._dropped_old += write - self.capacity - start
+            self._overflows_old += 1
+            start = write - self.capacity
+
+        pos = start % self._size
+        count = min(limit, write - start, self._size - pos)
+
+        # Публикуем новый блок: писатель не тронет кадры начиная с lease_start
+        self._lease_start = start
+        self._read = start + count
+        self.read_frames += count
+        return memoryview(self._buf[pos:pos + count])
+
+    # =========================
+    # Stats
+    # =========================
+
+    @property
+    def dropped_frames(self) -> int:
+        return self._dropped_new + self._dropped_old
+
+    @property
+    def overflow_events(self) -> int:
+        return self._overflows_new + self._overflows_old
+
+    def __len__(self):
+        """Количество кадров, ожидающих чтения."""
+        queued = self._write - max(self._read, self._drop_to)
+        return max(0, min(queued, self.capacity))
+
+    def stats(self) -> dict:
+        """Сводка для мониторинга (переполнения, заполненность)."""
+        return {
+            "capacity": self.capacity,
+            "queued": len(self),
+            "written": self._write,
+            "read": self.read_frames,
+            "dropped": self.dropped_frames,
+            "overflows": self.overflow_events,
+            "policy": self.overflow,
+        }
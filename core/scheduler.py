@@ -1,22 +1,96 @@
+import heapq
 import time
 import threading
 import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from core.recurrence import TIME_FORMAT, next_occurrence
 from utils.logger import logger
 from utils.db_manager import db
+from utils.config_manager import aiko_cfg
+from utils.metrics import LatencyStats
+
+# Что делать с задачами, пропущенными за время простоя:
+# all — выполнить все, latest — только последнюю, coalesce — одна сводка, skip — пропустить
+CATCH_UP_POLICIES = ("all", "latest", "coalesce", "skip")
 
 
 class TaskScheduler:
+    """
+    Планировщик задач из таблицы scheduler.
+    В памяти держится min-heap моментов запуска ожидающих задач: поток спит ровно
+    до ближайшей, а add_task/delete_task будят его через событие.
+    Источник истины — БД: сработавшие задачи читаются оттуда, а расписание
+    периодически перечитывается целиком (внешние записи, восстановление после сбоя).
+
+    Исполнитель ищется по индексу type -> плагин, on_schedule выполняется в пуле
+    потоков с таймаутом, статусы пачки задач пишутся одной транзакцией.
+    Повторяющаяся задача — одна строка с правилом (core.recurrence): после
+    срабатывания она переносится на следующий запуск, а не копируется.
+
+    Задачи, опоздавшие больше чем на catch_up_grace_sec (Айко была выключена),
+    разбираются политикой догонялки по типу: scheduler.catch_up в конфиге,
+    атрибут catch_up плагина или scheduler.catch_up_default. По умолчанию — all
+    (как раньше): напоминаниям сводку включает сам плагин (catch_up = "coalesce").
+    """
+
     def __init__(self, ctx):
         self.ctx = ctx
         self.active = False
         self.thread = None
 
+        self._heap = []  # [(timestamp, task_id), ...]
+        self._heap_lock = threading.Lock()
+        self._wake = threading.Event()
+        self.resync_sec = aiko_cfg.get("scheduler.resync_sec", 300)
+
+        # Ретеншн выполненных задач: чистка при старте и раз в compact_interval_sec
+        self.retention_days = aiko_cfg.get("scheduler.retention_days", 30)
+        self.compact_interval = aiko_cfg.get("scheduler.compact_interval_sec", 86400)
+        self._last_compact = None
+
+        # Догонялка после простоя
+        self.catch_up = aiko_cfg.get("scheduler.catch_up", {}) or {}
+        self.catch_up_default = aiko_cfg.get("scheduler.catch_up_default", "all")
+        self.catch_up_grace = aiko_cfg.get("scheduler.catch_up_grace_sec", 60)
+        self.caught_up = 0
+
+        # Опоздание срабатывания относительно exec_at (для задач, поставленных при работающей Айко)
+        self.fire_jitter = LatencyStats()
+        self._started_at = None
+
+        # Исполнители задач: индекс по type и пул для on_schedule
+        self._handlers = {}
+        self.reindex()
+        self.task_timeout = aiko_cfg.get("scheduler.task_timeout_sec", 30)
+        self._pool = ThreadPoolExecutor(
+            max_workers=aiko_cfg.get("scheduler.workers", 4),
+            thread_name_prefix="Sched-Task"
+        )
+        self._inflight = {}  # task_id -> (future, submitted_at, rule)
+        self._started = {}   # task_id -> момент старта в пуле (таймаут считается от него)
+        self.run_time = LatencyStats()
+        self.timeouts = 0
+
+    def reindex(self):
+        """Строит индекс type -> плагин (вызывать после загрузки плагинов)."""
+        handlers = {}
+        for cmd in getattr(self.ctx, "commands", None) or []:
+            t_type = getattr(cmd, 'type', None)
+            # Как и при линейном поиске, выигрывает первый плагин с этим типом
+            if t_type is not None and t_type not in handlers:
+                handlers[t_type] = cmd
+        self._handlers = handlers
+
     def start(self):
         """Запускает поток планировщика."""
         if self.active:
             return
 
         self.active = True
+        self._started_at = time.time()
+        db.on_task_changed = self._on_task_changed
+        self._reload()
         self.thread = threading.Thread(target=self._loop, daemon=True, name="Scheduler")
         self.thread.start()
         logger.info("Scheduler: Служба планировщика запущена.")
@@ -24,47 +98,268 @@ class TaskScheduler:
     def stop(self):
         """Останавливает поток."""
         self.active = False
+        self._wake.set()
+        if db.on_task_changed == self._on_task_changed:
+            db.on_task_changed = None
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=1.0)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- Расписание в памяти ---
+
+    @staticmethod
+    def _to_ts(exec_at) -> float:
+        try:
+            return datetime.strptime(str(exec_at), "%Y-%m-%d %H:%M:%S").timestamp()
+        except ValueError:
+            # Нестандартный формат: пусть решает запрос к БД
+            return time.time()
+
+    def _on_task_changed(self, task_id, exec_at):
+        """Хук DBManager: новая задача попадает в heap, удаление просто будит цикл."""
+        if exec_at is not None:
+            with self._heap_lock:
+                heapq.heappush(self._heap, (self._to_ts(exec_at), task_id))
+        # Удаленные задачи из heap не вычищаем: БД их уже не вернет
+        self._wake.set()
+
+    def _reload(self):
+        """Перечитывает расписание из БД."""
+        heap = [(self._to_ts(exec_at), t_id) for t_id, exec_at in db.get_upcoming_tasks()]
+        heapq.heapify(heap)
+        with self._heap_lock:
+            self._heap = heap
+        logger.debug(f"Scheduler: Расписание загружено, задач: {len(heap)}")
+
+    def _pop_due(self, now) -> dict:
+        """Снимает с heap наступившие задачи: {task_id: timestamp}."""
+        due = {}
+        with self._heap_lock:
+            while self._heap and self._heap[0][0] <= now:
+                ts, t_id = heapq.heappop(self._heap)
+                due[t_id] = ts
+        return due
+
+    def _sleep_time(self, last_sync) -> float:
+        timeout = self.resync_sec - (time.monotonic() - last_sync)
+        with self._heap_lock:
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - time.time())
+        if self._inflight:
+            # Проснуться к ближайшему таймауту выполняющейся задачи
+            nearest = min(self._started.get(t_id, submitted)
+                          for t_id, (_, submitted, _) in self._inflight.items())
+            timeout = min(timeout, nearest + self.task_timeout - time.monotonic())
+        return max(0.0, timeout)
 
     def _loop(self):
         """Основной цикл (рабочий метод)."""
         logger.info("Scheduler: Цикл обработки задач активен.")
+        last_sync = time.monotonic()
         while self.active and self.ctx.is_running:
+            # Сброс до проверки: пробуждение во время обработки не потеряется
+            self._wake.clear()
             try:
-                tasks = db.get_pending_tasks()
-                for t_id, t_type, t_payload in tasks:
-                    self.process_task(t_id, t_type, t_payload)
+                if time.monotonic() - last_sync >= self.resync_sec:
+                    self._reload()
+                    last_sync = time.monotonic()
+                self._maybe_compact()
+
+                closed = self._collect()
+                due = self._pop_due(time.time())
+                if due:
+                    closed += self._run_due(due, skip={t_id for t_id, _ in closed})
+                self._close(closed)
             except Exception as e:
                 logger.error(f"Scheduler: Ошибка цикла: {e}", exc_info=True)
 
-            time.sleep(5)
+            self._wake.wait(self._sleep_time(last_sync))
 
-    def process_task(self, t_id, t_type, t_payload):
-        # Десериализация
-        data = json.loads(t_payload) if isinstance(t_payload, str) else t_payload
-        handler_found = False
+    def _run_due(self, due, skip=()) -> list:
+        """
+        Отправляет наступившие задачи в пул, пропущенные за время простоя —
+        через политику догонялки.
+        skip — уже завершенные задачи, чей статус еще не записан.
+        :return: [(task_id, rule), ...] задач, которые сразу закрываются планировщиком.
+        """
+        finished, unknown, missed = [], set(), {}
+        now = time.time()
+        for t_id, t_type, t_payload, rule, exec_at in db.get_pending_tasks(with_schedule=True):
+            if t_id in self._inflight or t_id in skip:
+                continue  # Еще выполняется или ждет записи статуса: в БД пока pending
 
-        # Ищем исполнителя среди загруженных команд
-        for cmd in self.ctx.commands:
-            if getattr(cmd, 'type', None) == t_type:
+            ts = due.get(t_id)
+            if ts is not None and ts >= self._started_at:
+                self.fire_jitter.add(now - ts)
 
-                # 1. Выполнение действия
-                if hasattr(cmd, 'on_schedule'):
-                    try:
-                        cmd.on_schedule(data, self.ctx, t_id)
-                    except Exception as e:
-                        logger.error(f"Scheduler: Ошибка в плагине {cmd}: {e}")
+            cmd = self._handlers.get(t_type)
+            if cmd is None:
+                unknown.add(t_type)
+                finished.append((t_id, None))
+                continue
 
-                # 2. Завершение задачи
-                if hasattr(cmd, 'complete_task'):
-                    cmd.complete_task(t_id, data)
-                    handler_found = True
+            # Десериализация
+            data = json.loads(t_payload) if isinstance(t_payload, str) else t_payload
+            rule = json.loads(rule) if rule else None
+            if now - self._to_ts(exec_at) > self.catch_up_grace:
+                missed.setdefault(t_type, []).append((exec_at, t_id, data, rule))
+            else:
+                self._submit(cmd, t_id, data, rule)
 
-                break
+        for t_type, items in missed.items():
+            finished += self._catch_up(t_type, sorted(items, key=lambda item: (item[0], item[1])))
 
-        if not handler_found:
+        for t_type in unknown:
             warning = f"Scheduler: Не найден плагин для типа '{t_type}'."
             logger.warning(warning)
             self.ctx.broadcast(warning, priority="WARNING")
-            db.update_task_status(t_id, 'done')
\ No newline at end of file
+        return finished
+
+    def _submit(self, cmd, t_id, data, rule):
+        future = self._pool.submit(self._execute, cmd, t_id, data, rule is not None)
+        self._inflight[t_id] = (future, time.monotonic(), rule)
+
+    def _catch_up_policy(self, t_type) -> str:
+        policy = (self.catch_up.get(t_type)
+                  or getattr(self._handlers.get(t_type), "catch_up", None)
+                  or self.catch_up_default)
+        if policy not in CATCH_UP_POLICIES:
+            logger.warning(f"Scheduler: Неизвестная политика догонялки '{policy}' для '{t_type}', выполняю все.")
+            return "all"
+        return policy
+
+    def _catch_up(self, t_type, items) -> list:
+        """
+        Пропущенные задачи одного типа (по возрастанию exec_at).
+        :return: [(task_id, rule), ...] задач, закрываемых без выполнения.
+        """
+        cmd = self._handlers[t_type]
+        policy = self._catch_up_policy(t_type)
+        if len(items) == 1 and policy in ("latest", "coalesce"):
+            policy = "all"  # Одну задачу нечего сворачивать
+
+        logger.info(f"Scheduler: Пропущено задач '{t_type}': {len(items)}, политика: {policy}")
+        self.caught_up += len(items)
+
+        if policy == "all":
+            for _, t_id, data, rule in items:
+                self._submit(cmd, t_id, data, rule)
+            return []
+
+        if policy == "latest":
+            _, t_id, data, rule = items[-1]
+            self._submit(cmd, t_id, data, rule)
+            return [(t_id, rule) for _, t_id, _, rule in items[:-1]]
+
+        if policy == "coalesce":
+            self._summarize(cmd, t_type, items)
+
+        return [(t_id, rule) for _, t_id, _, rule in items]
+
+    def _summarize(self, cmd, t_type, items):
+        """Одна сводка вместо серии уведомлений; плагин может собрать ее сам (on_schedule_batch)."""
+        if hasattr(cmd, 'on_schedule_batch'):
+            batch = [(t_id, data) for _, t_id, data, _ in items]
+            self._pool.submit(self._execute_batch, cmd, batch)
+            return
+
+        lines = [f"⏰ Пропущено за время простоя ({t_type}): {len(items)}"]
+        for exec_at, _, data, _ in items[-10:]:
+            text = data.get("text") if isinstance(data, dict) else None
+            lines.append(f"• {exec_at}: {text or '—'}")
+        if len(items) > 10:
+            lines.append(f"… и еще {len(items) - 10}")
+        self.ctx.broadcast("\n".join(lines))
+
+    def _execute_batch(self, cmd, batch):
+        try:
+            cmd.on_schedule_batch(batch, self.ctx)
+        except Exception as e:
+            logger.error(f"Scheduler: Ошибка сводки в плагине {cmd}: {e}")
+
+    def _execute(self, cmd, t_id, data, recurring=False) -> bool:
+        """
+        Выполняется в пуле: действие плагина и его собственное завершение задачи.
+        Статусом повторяющейся задачи владеет планировщик, complete_task для нее не зовется.
+        :return: True, если статус выставил сам плагин (complete_task).
+        """
+        started = time.monotonic()
+        self._started[t_id] = started
+        try:
+            # 1. Выполнение действия
+            if hasattr(cmd, 'on_schedule'):
+                try:
+                    cmd.on_schedule(data, self.ctx, t_id)
+                except Exception as e:
+                    logger.error(f"Scheduler: Ошибка в плагине {cmd}: {e}")
+
+            # 2. Завершение задачи
+            if hasattr(cmd, 'complete_task') and not recurring:
+                cmd.complete_task(t_id, data)
+                return True
+            return False
+        finally:
+            self.run_time.add(time.monotonic() - started)
+            self._wake.set()
+
+    def _collect(self) -> list:
+        """
+        Снимает завершенные и просроченные задачи из работы.
+        :return: [(task_id, rule), ...] задач, статус которых должен выставить планировщик.
+        """
+        finished = []
+        now = time.monotonic()
+        for t_id, (future, submitted, rule) in list(self._inflight.items()):
+            if future.done():
+                closed_by_plugin = not (future.cancelled() or future.exception()) and future.result()
+                if not closed_by_plugin:
+                    finished.append((t_id, rule))
+            elif t_id not in self._started:
+                # Еще в очереди пула за медленными задачами: таймаут ожидания, а не выполнения.
+                # Отмененная задача уже не запустится — закрываем без устаревшего срабатывания
+                if now - submitted < self.task_timeout or not future.cancel():
+                    continue
+                self.timeouts += 1
+                logger.warning(f"Scheduler: Задача #{t_id} отменена: {self.task_timeout}с в очереди пула.")
+                finished.append((t_id, rule))
+            elif now - self._started[t_id] >= self.task_timeout:
+                # Поток не прервать; задачу закрываем, чтобы она не сработала повторно
+                self.timeouts += 1
+                logger.warning(f"Scheduler: Задача #{t_id} не уложилась в {self.task_timeout}с.")
+                finished.append((t_id, rule))
+            else:
+                continue
+            del self._inflight[t_id]
+            self._started.pop(t_id, None)
+        return finished
+
+    def _close(self, closed):
+        """Разовые задачи — в done, повторяющиеся — на следующий запуск; одной транзакцией."""
+        done, rescheduled = [], []
+        now = datetime.now()
+        for t_id, rule in closed:
+            upcoming = next_occurrence(rule, now) if rule else None
+            if upcoming is None:
+                done.append(t_id)
+            else:
+                rescheduled.append((t_id, upcoming.strftime(TIME_FORMAT)))
+        db.finish_tasks(done, rescheduled)
+
+    def _maybe_compact(self):
+        now = time.monotonic()
+        if self._last_compact is not None and now - self._last_compact < self.compact_interval:
+            return
+        self._last_compact = now
+        db.compact_scheduler(self.retention_days)
+
+    def stats(self) -> dict:
+        with self._heap_lock:
+            scheduled = len(self._heap)
+        return {
+            "scheduled": scheduled,
+            "in_flight": len(self._inflight),
+            "timeouts": self.timeouts,
+            "caught_up": self.caught_up,
+            "fire_jitter": self.fire_jitter.snapshot(),
+            "run": self.run_time.snapshot(),
+        }
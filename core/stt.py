@@ -1,28 +1,86 @@
 import json
+import threading
 import time
+from collections import deque
 from vosk import Model, KaldiRecognizer
+from utils.config_manager import aiko_cfg
 from utils.logger import logger
+from utils.matcher import CommandMatcher
+
+try:
+    # FFI Vosk позволяет передать memoryview в распознаватель без копии в bytes
+    from vosk import _ffi as _vosk_ffi
+except ImportError:
+    _vosk_ffi = None
 
 
 class STTService:
     """
     Сервис Speech-to-Text (STT).
     Обеспечивает трансформацию аудиопотока в текст с использованием модели Vosk.
+
+    Двухуровневый режим (stt.two_tier): на каждом блоке работает легкий
+    распознаватель с грамматикой из фонетики имени, а полный словарный
+    распознаватель включается только после wake-word или при открытом окне
+    активации. Требует модель с поддержкой runtime-грамматик (small-модели).
     """
 
-    def __init__(self, model_path):
+    def __init__(self, model_path, window_probe=None):
         self.model_path = model_path
         self._rec = None
         self._model = None
 
+        # --- Готовность модели (фоновый прогрев) ---
+        self.state = "idle"  # idle, loading, ready, error
+        self.ready = threading.Event()
+        self.on_state_change = None
+        self._load_lock = threading.Lock()
+        # Неудачная загрузка запоминается: повтор не на каждом блоке речи, а с паузой
+        self.load_error = None
+        self.retry_sec = aiko_cfg.get("stt.load_retry_sec", 30)
+        self.retry_max_sec = aiko_cfg.get("stt.load_retry_max_sec", 600)
+        self._retry_delay = self.retry_sec
+        self._retry_at = 0.0
+
+        # Потоковый режим: промежуточные гипотезы Vosk для раннего wake-word
+        self.streaming = aiko_cfg.get("stt.partial_results", True)
+        self._last_partial = ""
+
+        # --- Двухуровневое распознавание ---
+        self.two_tier = aiko_cfg.get("stt.two_tier", False)
+        self.window_probe = window_probe  # callable: открыто ли окно активации
+        self._wake_rec = None
+        self._full_active = False
+        self._wake_hint = None
+        # Имя и порог — те же, что у ActivationService: переименование бота меняет и wake-уровень
+        self.bot_name = aiko_cfg.get("bot.name", "айко").lower()
+        self.match_threshold = aiko_cfg.get("audio.match_threshold", 80)
+        preroll_sec = aiko_cfg.get("stt.wake_preroll_ms", 1500) / 1000
+        self._preroll = deque()
+        self._preroll_limit = int(16000 * preroll_sec) * 2  # в байтах
+        self._preroll_bytes = 0
+
     def _init_rec(self):
         """
         Ленивая инициализация модели и распознавателя.
         Загружает тяжелые веса нейросети в память только при первом обращении.
         """
-        if not self._rec:
+        if self._rec:
+            return self._rec
+
+        # Параллельный вызов из потока STT дождется фоновой загрузки
+        with self._load_lock:
+            if self._rec:
+                return self._rec
+
+            if self.load_error is not None and time.monotonic() < self._retry_at:
+                raise self.load_error
+
             start_time = time.time()
             logger.info(f"STT: Инициализация модели из {self.model_path}...")
+            if self.load_error is None:
+                # Повторная попытка после ошибки не сбрасывает "error" в UI до успеха
+                self._set_state("loading")
 
             try:
                 # Модель Vosk загружается один раз
@@ -30,41 +88,254 @@ class STTService:
                 # Распознаватель настраивается на частоту 16000 Гц (стандарт для микрофонов)
                 self._rec = KaldiRecognizer(self._model, 16000)
 
+                if self.two_tier:
+                    self._wake_rec = KaldiRecognizer(self._model, 16000, self._wake_grammar())
+                    logger.info("STT: Включен двухуровневый режим (wake-грамматика + полный словарь).")
+
+                self._warm_up()
+
                 duration = time.time() - start_time
                 logger.info(f"STT: Модель успешно загружена за {duration:.2f} сек.")
+                self.load_error = None
+                self._retry_delay = self.retry_sec
+                self._set_state("ready")
             except Exception as e:
-                logger.error(f"STT: Критическая ошибка загрузки модели: {e}", exc_info=True)
+                self._rec = self._wake_rec = None
+                self.load_error = e
+                self._retry_at = time.monotonic() + self._retry_delay
+                logger.error(f"STT: Критическая ошибка загрузки модели: {e}. "
+                             f"Повтор через {self._retry_delay:.0f} сек.", exc_info=True)
+                self._retry_delay = min(self._retry_delay * 2, self.retry_max_sec)
+                self._set_state("error")
                 raise
 
         return self._rec
 
+    def preload(self, on_state_change=None):
+        """
+        Фоновая загрузка модели сразу при старте ядра.
+        Идет параллельно с загрузкой плагинов и обучением NLU,
+        чтобы первая фраза не ждала загрузку весов.
+        """
+        if on_state_change:
+            self.on_state_change = on_state_change
+
+        def _load():
+            try:
+                self._init_rec()
+            except Exception:
+                pass  # Ошибка уже залогирована и отражена в state
+
+        threading.Thread(target=_load, daemon=True, name="STTPreload").start()
+
+    def _warm_up(self):
+        """
+        Пробный декод синтетической тишины: прогревает графы и кэши Kaldi,
+        чтобы первый реальный декод не платил за ленивую инициализацию.
+        """
+        silence = bytes(16000)  # 0.5 сек int16 @ 16 кГц
+        for rec in (self._rec, self._wake_rec):
+            if rec:
+                rec.AcceptWaveform(silence)
+                rec.FinalResult()
+                rec.Reset()
+
+    def retry_load(self):
+        """Явный запрос повторной загрузки (без ожидания паузы)."""
+        self._retry_at = 0.0
+        self._retry_delay = self.retry_sec
+
+    def model_available(self) -> bool:
+        """Можно ли сейчас обращаться к модели: загружена или пауза после ошибки истекла."""
+        return self._rec is not None or self.load_error is None or time.monotonic() >= self._retry_at
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        logger.debug(f"STT: Состояние модели -> {state}")
+
+        if self.on_state_change:
+            try:
+                self.on_state_change(state)
+            except Exception as e:
+                logger.error(f"STT: Ошибка обработчика состояния: {e}")
+
+        if state == "ready":
+            self.ready.set()
+
+    def _wake_grammar(self):
+        """Грамматика первого уровня: префиксы и имя бота (для "айко" — с фонетическими вариантами)."""
+        phrases = set(CommandMatcher.PREFIX_PHONETIC) | {self.bot_name}
+        if self.bot_name == "айко":
+            phrases |= set(CommandMatcher.AIKO_PHONETIC)
+        return json.dumps(sorted(phrases) + ["[unk]"], ensure_ascii=False)
+
     def get_phrase(self, audio_data):
         """
         Обрабатывает фрагмент аудиоданных.
-        :param audio_data: байтовый поток аудио.
+        :param audio_data: bytes или memoryview int16 (блок из AudioRingBuffer).
         :return: str (текст фразы), если обнаружена пауза в конце речи, иначе None.
         """
+        if not self.model_available():
+            return None
+
         try:
             rec = self._init_rec()
 
-            # AcceptWaveform возвращает True, когда Vosk считает фразу законченной
-            if rec.AcceptWaveform(audio_data):
-                result_json = rec.Result()
-                text = json.loads(result_json).get('text', '')
+            if self.two_tier and not self._full_active:
+                return self._wake_tier(audio_data)
+
+            text = self._decode(rec, audio_data)
+            if text:
+                self._release_full_tier()
+            return text
+
+        except Exception as e:
+            logger.error(f"STT: Ошибка в процессе распознавания: {e}")
+            return None
+
+    def _decode(self, rec, audio_data):
+        """Один шаг полного распознавателя."""
+        # AcceptWaveform возвращает True, когда Vosk считает фразу законченной
+        if rec.AcceptWaveform(self._as_waveform(audio_data)):
+            self._last_partial = ""
+            result_json = rec.Result()
+            text = json.loads(result_json).get('text', '')
+
+            if text:
+                logger.debug(f"STT: Распознана финальная фраза: '{text}'")
+                print(text)
+                return text
 
-                if text:
-                    logger.debug(f"STT: Распознана финальная фраза: '{text}'")
-                    print(text)
-                    return text
+        return None
 
+    # =========================
+    # Two-tier
+    # =========================
+
+    def _wake_tier(self, audio_data):
+        """
+        Первый уровень: копит пре-ролл и ищет имя легким распознавателем.
+        При срабатывании (или открытом окне) передает пре-ролл полному уровню.
+        """
+        chunk = bytes(audio_data)
+        self._preroll.append(chunk)
+        self._preroll_bytes += len(chunk)
+        while self._preroll_bytes - len(self._preroll[0]) >= self._preroll_limit:
+            self._preroll_bytes -= len(self._preroll.popleft())
+
+        window_open = bool(self.window_probe and self.window_probe())
+        if not window_open and not self._spot_wake_word(chunk):
             return None
 
+        logger.debug(f"STT: Полный уровень активирован ({'окно' if window_open else 'wake-word'}).")
+        self._full_active = True
+
+        # Проигрываем пре-ролл, чтобы полная модель услышала фразу целиком (вместе с именем)
+        texts = []
+        while self._preroll:
+            text = self._decode(self._rec, self._preroll.popleft())
+            if text:
+                texts.append(text)
+        self._preroll_bytes = 0
+
+        if texts:
+            self._release_full_tier()
+            return " ".join(texts)
+        return None
+
+    def _spot_wake_word(self, chunk) -> bool:
+        """Проверка имени на грамматике первого уровня."""
+        wake = self._wake_rec
+        if wake.AcceptWaveform(chunk):
+            text = json.loads(wake.Result()).get('text', '')
+        else:
+            text = json.loads(wake.PartialResult()).get('partial', '')
+
+        if not text or not CommandMatcher.check_trigger(text, [self.bot_name], self.match_threshold)[0]:
+            return False
+
+        wake.Reset()
+        # Гипотеза для раннего срабатывания ActivationService.check_partial
+        self._wake_hint = text
+        return True
+
+    def _release_full_tier(self):
+        """После закрытой фразы возвращаемся на легкий уровень, если окно закрыто."""
+        if not self.two_tier or not self._full_active:
+            return
+        if self.window_probe and self.window_probe():
+            return
+        self._full_active = False
+        logger.debug("STT: Возврат на уровень wake-word.")
+
+    def get_partial(self):
+        """
+        Промежуточная гипотеза текущей (еще не законченной) фразы.
+        :return: str, если гипотеза изменилась с прошлого вызова, иначе None.
+        """
+        if self._wake_hint:
+            text, self._wake_hint = self._wake_hint, None
+            return text
+
+        if not self._rec or (self.two_tier and not self._full_active):
+            return None
+
+        try:
+            text = json.loads(self._rec.PartialResult()).get('partial', '')
         except Exception as e:
-            logger.error(f"STT: Ошибка в процессе распознавания: {e}")
+            logger.error(f"STT: Ошибка чтения промежуточного результата: {e}")
+            return None
+
+        if text and text != self._last_partial:
+            self._last_partial = text
+            return text
+        return None
+
+    def flush(self):
+        """
+        Принудительно закрывает текущую фразу (конец речевого сегмента от VAD).
+        :return: str (текст фразы) или None.
+        """
+        if not self._rec:
             return None
 
+        self._last_partial = ""
+        if self.two_tier and not self._full_active:
+            # Сегмент закончился без имени: сбрасываем гипотезу легкого уровня
+            if self._wake_rec:
+                self._wake_rec.Reset()
+            return None
+
+        try:
+            text = json.loads(self._rec.FinalResult()).get('text', '')
+            self._release_full_tier()
+            if text:
+                logger.debug(f"STT: Фраза закрыта по концу сегмента: '{text}'")
+                return text
+            return None
+        except Exception as e:
+            logger.error(f"STT: Ошибка финализации фразы: {e}")
+            return None
+
+    @staticmethod
+    def _as_waveform(audio_data):
+        """Готовит блок для Vosk: bytes как есть, буферы — без копирования."""
+        if isinstance(audio_data, bytes):
+            return audio_data
+        if _vosk_ffi is not None:
+            return _vosk_ffi.from_buffer(audio_data)
+        return bytes(audio_data)
+
     def reset(self):
         """Сброс состояния распознавателя (полезно при смене контекста)."""
+        self._last_partial = ""
+        self._full_active = False
+        self._preroll.clear()
+        self._preroll_bytes = 0
+        if self._wake_rec:
+            self._wake_rec.Reset()
         if self._rec:
             self._rec.Reset()
             logger.debug("STT: Состояние распознавателя сброшено.")
\ No newline at end of file
@@ -0,0 +1,98 @@
+import queue
+import time
+from utils.logger import logger
+from utils.metrics import LatencyStats
+from utils.tracing import tracer
+
+
+class STTWorker:
+    """
+    Отдельная стадия конвейера распознавания: AudioRingBuffer → VAD → STT.
+    Работает в собственном потоке и отдает фразы в phrase_q
+    как (text, is_final, captured_at, trace) — финальные и, в потоковом режиме,
+    промежуточные гипотезы,
+    поэтому медленный on_tick плагина не задерживает декодирование,
+    а долгий декод Vosk не задерживает тики ядра.
+    """
+
+    def __init__(self, audio_q, vad, stt, max_phrases=32):
+        self.audio_q = audio_q
+        self.vad = vad
+        self.stt = stt
+        self.phrase_q = queue.Queue(maxsize=max_phrases)
+
+        # Время обработки одного аудиоблока (VAD + декод Vosk)
+        self.decode_latency = LatencyStats()
+        self.dropped_phrases = 0
+
+        # Трейс текущего высказывания (создается на первом речевом блоке)
+        self._trace = None
+
+    def run(self, stop_event):
+        """Основной цикл потока STT."""
+        logger.info("STT-Worker: Поток распознавания запущен.")
+
+        while not stop_event.is_set():
+            data = self.audio_q.read(timeout=0.1)
+            if data is None:
+                continue
+            self.process(data)
+
+        logger.info("STT-Worker: Поток распознавания остановлен.")
+
+    def process(self, data):
+        """
+        Один шаг стадии: блок аудио → VAD → STT → очередь фраз.
+        Вынесен отдельно, чтобы офлайн-прогон шел через тот же код, что и поток.
+        """
+        started = time.monotonic()
+
+        chunks, segment_ended = self.vad.process(data)
+        if chunks and self._trace is None:
+            self._trace = tracer.start("mic", started)
+
+        with tracer.activate(self._trace):
+            for chunk in chunks:
+                with tracer.span("stt.decode"):
+                    phrase = self.stt.get_phrase(chunk)
+                if phrase:
+                    self._emit(phrase, started)
+                elif self.stt.streaming:
+                    partial = self.stt.get_partial()
+                    if partial:
+                        self._emit(partial, started, is_final=False)
+
+            if segment_ended:
+                with tracer.span("stt.flush"):
+                    phrase = self.stt.flush()
+                if phrase:
+                    self._emit(phrase, started)
+                # Сегмент без фразы: трейс просто не попадает в буфер
+                self._trace = None
+
+        if chunks:
+            self.decode_latency.add(time.monotonic() - started)
+
+    def _emit(self, text, captured_at, is_final=True):
+        """
+        Передает фразу ядру: (text, is_final, captured_at, trace).
+        Метка времени нужна для замера задержки диспетчеризации.
+        Финальная фраза забирает трейс высказывания с собой.
+        """
+        trace = self._trace
+        if is_final:
+            self._trace = None
+
+        try:
+            self.phrase_q.put_nowait((text, is_final, captured_at, trace))
+        except queue.Full:
+            if is_final:
+                self.dropped_phrases += 1
+                logger.warning(f"STT-Worker: Очередь фраз переполнена, фраза отброшена: '{text}'")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.phrase_q.qsize(),
+            "dropped_phrases": self.dropped_phrases,
+            "decode": self.decode_latency.snapshot(),
+        }
@@ -0,0 +1,130 @@
+from collections import deque
+import numpy as np
+from utils.config_manager import aiko_cfg
+from utils.logger import logger
+
+
+class VoiceActivityGate:
+    """
+    Энергетический VAD перед распознавателем.
+    Пропускает в Vosk только участки речи (плюс короткий пре-ролл и хвост
+    тишины для эндпоинта), тишина до KaldiRecognizer не доходит.
+
+    Решение принимается по подкадрам в 30 мс: RMS выше адаптивного порога
+    и ZCR ниже порога шума (отсекаем шипение/белый шум).
+    """
+
+    def __init__(self, samplerate=16000):
+        self.samplerate = samplerate
+        self.enabled = aiko_cfg.get("vad.enabled", True)
+
+        self.frame_len = int(samplerate * aiko_cfg.get("vad.frame_ms", 30) / 1000)
+        self.energy_threshold = aiko_cfg.get("vad.energy_threshold", 300)
+        self.noise_ratio = aiko_cfg.get("vad.noise_ratio", 3.0)
+        self.zcr_max = aiko_cfg.get("vad.zcr_max", 0.35)
+
+        # Хвост тишины после речи: должен быть длиннее эндпоинта Vosk (~0.5 с)
+        self.hangover_frames = int(samplerate * aiko_cfg.get("vad.hangover_ms", 800) / 1000)
+        self.preroll_frames = int(samplerate * aiko_cfg.get("vad.preroll_ms", 500) / 1000)
+
+        self.noise_floor = float(self.energy_threshold) / self.noise_ratio
+        self.in_speech = False
+        self._silence_run = 0
+        self._preroll = deque()
+        self._preroll_len = 0
+
+        # --- Счетчики (в сэмплах) ---
+        self.frames_passed = 0
+        self.frames_skipped = 0
+        self.segments = 0
+
+        logger.info(
+            f"VAD: {'Включен' if self.enabled else 'Выключен'} "
+            f"(Порог: {self.energy_threshold}, Хвост: {self.hangover_frames} сэмпл.)"
+        )
+
+    def _has_speech(self, samples) -> bool:
+        """Векторная оценка блока: есть ли в нем хотя бы один речевой подкадр."""
+        n_frames = max(1, len(samples) // self.frame_len)
+        usable = samples[:n_frames * self.frame_len] if len(samples) >= self.frame_len else samples
+        frames = usable.reshape(n_frames, -1).astype(np.float32)
+
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1) if frames.shape[1] > 1 else np.zeros(n_frames)
+
+        threshold = max(self.energy_threshold, self.noise_floor * self.noise_ratio)
+        speech = (rms > threshold) & (zcr < self.zcr_max)
+
+        # Подстройка уровня шума только по тихим подкадрам
+        quiet = rms[~speech]
+        if len(quiet):
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * float(quiet.mean())
+
+        return bool(speech.any())
+
+    def process(self, block):
+        """
+        Пропускает блок через гейт.
+        :param block: memoryview/ndarray int16 (блок из AudioRingBuffer).
+        :return: (chunks, segment_ended) — что отдать в STT и закончился ли сегмент.
+        """
+        if not self.enabled:
+            return [block], False
+
+        samples = np.frombuffer(block, dtype=np.int16)
+        n = len(samples)
+        if not n:
+            return [], False
+
+        if self._has_speech(samples):
+            self._silence_run = 0
+            if not self.in_speech:
+                self.in_speech = True
+                self.segments += 1
+                chunks = list(self._preroll) + [block]
+                # Пре-ролл уже учтен как пропущенный, теперь он уходит в STT
+                self.frames_skipped -= self._preroll_len
+                self.frames_passed += self._preroll_len + n
+                self._preroll.clear()
+                self._preroll_len = 0
+                logger.debug(f"VAD: Начало речи (сегмент #{self.segments})")
+                return chunks, False
+
+            self.frames_passed += n
+            return [block], False
+
+        if self.in_speech:
+            # Хвост после речи: Vosk нужна тишина, чтобы закрыть фразу
+            self._silence_run += n
+            self.frames_passed += n
+            if self._silence_run >= self.hangover_frames:
+                self.in_speech = False
+                logger.debug("VAD: Конец речи.")
+                return [block], True
+            return [block], False
+
+        # Тишина: копим пре-ролл (копия обязательна, вид буфера живет до следующего чтения)
+        self.frames_skipped += n
+        self._preroll.append(samples.tobytes())
+        self._preroll_len += n
+        while self._preroll and self._preroll_len - len(self._preroll[0]) // 2 >= self.preroll_frames:
+            self._preroll_len -= len(self._preroll.popleft()) // 2
+        return [], False
+
+    def reset(self):
+        """Сброс состояния сегмента (например, после рестарта аудиопотока)."""
+        self.in_speech = False
+        self._silence_run = 0
+        self._preroll.clear()
+        self._preroll_len = 0
+
+    def stats(self) -> dict:
+        total = self.frames_passed + self.frames_skipped
+        return {
+            "passed": self.frames_passed,
+            "skipped": self.frames_skipped,
+            "segments": self.segments,
+            "skip_ratio": round(self.frames_skipped / total, 3) if total else 0.0,
+            "noise_floor": round(self.noise_floor, 1),
+        }
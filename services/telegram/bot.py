@@ -1,10 +1,26 @@
 import asyncio
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from services.telegram.command_executor import CommandExecutor
 from services.telegram.worker import TelegramWorker
 from utils.config_manager import aiko_cfg
 from utils.logger import logger
 
 
+def create_bot(token) -> Bot:
+    """
+    Бот на официальном Bot API или, если задан telegram.api_url,
+    на другом сервере (локальный Bot API, фейк для нагрузочных тестов).
+    """
+    api_url = aiko_cfg.get("telegram.api_url")
+    if not api_url:
+        return Bot(token=token)
+
+    logger.info(f"TG-Service: Bot API -> {api_url}")
+    return Bot(token=token, session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+
+
 class AikoTelegramService:
     def __init__(self, ctx, core):
         self.ctx = ctx
@@ -15,16 +31,17 @@ class AikoTelegramService:
             logger.error("TG-Service: ТОКЕН НЕ НАЙДЕН в конфигурации!")
             return
 
-        self.bot = Bot(token=token)
+        self.bot = create_bot(token)
         self.dp = Dispatcher()
         self.worker = TelegramWorker(self.bot)
+        self.executor = CommandExecutor(core.router, ctx)
         logger.info("TG-Service: Объект бота и диспетчера создан.")
 
     async def start(self):
         logger.info("TG-Service: Запуск поллинга и воркера...")
 
         from services.telegram.handlers.bridge import register_bridge_handlers
-        register_bridge_handlers(self.dp, self.ctx, self.core)
+        register_bridge_handlers(self.dp, self.ctx, self.core, self.executor)
 
         try:
             # Запускаем всё параллельно
@@ -33,4 +50,12 @@ class AikoTelegramService:
                 self.worker.run()
             )
         except Exception as e:
-            logger.error(f"TG-Service: КРИТИЧЕСКАЯ ОШИБКА ПОЛЛИНГА: {e}", exc_info=True)
\ No newline at end of file
+            logger.error(f"TG-Service: КРИТИЧЕСКАЯ ОШИБКА ПОЛЛИНГА: {e}", exc_info=True)
+        finally:
+            self.executor.shutdown()
+
+    def stats(self) -> dict:
+        return {
+            "outbox": self.worker.stats(),
+            "commands": self.executor.stats(),
+        }
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.config_manager import aiko_cfg
+from utils.logger import logger
+from utils.metrics import LatencyStats
+from utils.tracing import tracer
+
+
+class CommandExecutor:
+    """
+    Исполняет команды из Telegram в отдельном пуле потоков, а не в цикле aiogram:
+    медленный плагин (psutil, БД) не стопорит поллинг и воркер outbox.
+    Число команд в работе ограничено; зависшая команда отпускает обработчик
+    по таймауту, но свое место занимает, пока поток действительно не освободится.
+    """
+
+    def __init__(self, router, ctx):
+        self.router = router
+        self.ctx = ctx
+
+        self.timeout = aiko_cfg.get("telegram.command_timeout_sec", 15)
+        self.max_in_flight = aiko_cfg.get("telegram.max_in_flight", 8)
+        self._pool = ThreadPoolExecutor(
+            max_workers=aiko_cfg.get("telegram.command_workers", 2),
+            thread_name_prefix="TG-Cmd"
+        )
+
+        self.in_flight = 0
+        self.rejected = 0
+        self.timeouts = 0
+        # Ожидание свободного потока, исполнение и полный путь от прихода сообщения
+        self.queue_wait = LatencyStats()
+        self.run_time = LatencyStats()
+        self.total = LatencyStats()
+
+    def _run(self, text, trace, submitted_at):
+        started = time.monotonic()
+        self.queue_wait.add(started - submitted_at)
+        try:
+            # Источник ставим в потоке исполнения, перед самой маршрутизацией
+            self.ctx.set_input_source("tg")
+            with tracer.activate(trace):
+                return self.router.route(text, self.ctx)
+        finally:
+            self.run_time.add(time.monotonic() - started)
+
+    def _release(self, future):
+        self.in_flight -= 1
+        if not future.cancelled() and future.exception():
+            logger.error(f"TG-Executor: Ошибка команды: {future.exception()}")
+
+    async def execute(self, text, trace=None):
+        """
+        Выполняет команду в пуле.
+        :return: результат route, None при перегрузке или таймауте.
+        """
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            logger.warning(f"TG-Executor: Перегрузка ({self.in_flight} в работе), команда отклонена.")
+            return None
+
+        loop = asyncio.get_running_loop()
+        submitted_at = time.monotonic()
+        self.in_flight += 1
+        future = loop.run_in_executor(self._pool, self._run, text, trace, submitted_at)
+        # Счетчик уменьшаем по фактическому завершению потока, а не по таймауту
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"TG-Executor: Команда '{text}' не уложилась в {self.timeout}с.")
+            return None
+        except Exception:
+            return False
+        finally:
+            self.total.add(time.monotonic() - submitted_at)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "queue_wait": self.queue_wait.snapshot(),
+            "run": self.run_time.snapshot(),
+            "total": self.total.snapshot(),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,178 @@
+"""
+Локальная замена Telegram Bot API для нагрузочных тестов и замеров задержек.
+
+Поддерживает то, чем пользуется Айко: getMe, deleteWebhook, getUpdates
+(long polling) и sendMessage. Задержка ответа, доля ответов 429 и доля
+ошибок сервера настраиваются. Бот направляется сюда через конфиг:
+
+    "telegram": {"api_url": "http://127.0.0.1:8081", "token": "42:fake"}
+
+Запуск отдельно: python -m services.telegram.fake_api --port 8081 --latency-ms 50 --rate-429 0.05
+"""
+import argparse
+import asyncio
+import random
+import time
+from aiohttp import web
+from utils.logger import logger
+
+BOT_USER = {"id": 42, "is_bot": True, "first_name": "Aiko", "username": "aiko_fake_bot"}
+OWNER_USER = {"id": 1001, "is_bot": False, "first_name": "Owner"}
+
+# Без задержек и сбоев: сервисные вызовы не должны мешать замерам
+_SERVICE_METHODS = {"getme", "deletewebhook", "getupdates"}
+
+
+class FakeBotAPI:
+    """
+    aiohttp-приложение с состоянием фейкового Bot API.
+    sent — принятые sendMessage [(chat_id, text, monotonic), ...];
+    push_message() кладет входящее сообщение владельца в очередь getUpdates.
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, rate_429=0.0, retry_after=1,
+                 failure_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+        self.sent = []
+        self.pushed_at = {}  # text -> monotonic постановки входящего сообщения
+        self.requests = 0
+        self.throttled = 0
+        self.failed = 0
+
+        self._updates = []
+        self._update_id = 0
+        self._message_id = 0
+        self._new_update = asyncio.Event()
+
+        self.app = web.Application()
+        self.app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        self._runner = None
+
+    # --- Входящие ---
+
+    def push_message(self, text, chat_id=OWNER_USER["id"]):
+        """Сообщение владельца, которое бот получит следующим getUpdates."""
+        self._update_id += 1
+        self._updates.append({
+            "update_id": self._update_id,
+            "message": self._message(chat_id, text, sender=OWNER_USER),
+        })
+        self.pushed_at[text] = time.monotonic()
+        self._new_update.set()
+
+    # --- Сервер ---
+
+    async def start(self, host="127.0.0.1", port=0) -> str:
+        """Запускает сервер и возвращает базовый URL для telegram.api_url."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"FakeBotAPI: Слушаю http://{host}:{port}")
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request):
+        self.requests += 1
+        method = request.match_info["method"].lower()
+        params = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+
+        if method not in _SERVICE_METHODS:
+            delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+
+            roll = self._random.random()
+            if roll < self.rate_429:
+                self.throttled += 1
+                return web.json_response({
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }, status=429)
+            if roll < self.rate_429 + self.failure_rate:
+                self.failed += 1
+                return web.json_response({
+                    "ok": False,
+                    "error_code": 500,
+                    "description": "Internal Server Error",
+                }, status=500)
+
+        handler = getattr(self, f"_m_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    # --- Методы Bot API ---
+
+    async def _m_getme(self, params):
+        return BOT_USER
+
+    async def _m_getupdates(self, params):
+        offset = int(params.get("offset", 0) or 0)
+        timeout = float(params.get("timeout", 0) or 0)
+
+        # Подтвержденные клиентом обновления больше не отдаем
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:100]
+
+    async def _m_sendmessage(self, params):
+        chat_id = params.get("chat_id")
+        text = params.get("text", "")
+        self.sent.append((chat_id, text, time.monotonic()))
+        return self._message(chat_id, text, sender=BOT_USER)
+
+    def _message(self, chat_id, text, sender):
+        self._message_id += 1
+        return {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": sender,
+            "text": text,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "sent": len(self.sent),
+            "throttled": self.throttled,
+            "failed": self.failed,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фейковый Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    api = FakeBotAPI(args.latency_ms, args.jitter_ms, args.rate_429, args.retry_after, args.failure_rate)
+    web.run_app(api.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
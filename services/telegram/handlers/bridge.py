@@ -1,11 +1,16 @@
 from aiogram import types, Dispatcher
+from services.telegram.command_executor import CommandExecutor
 from utils.config_manager import aiko_cfg
 from utils.logger import logger
+from utils.tracing import tracer
 
 
-def register_bridge_handlers(dp: Dispatcher, ctx, core):
+def register_bridge_handlers(dp: Dispatcher, ctx, core, executor=None):
+    executor = executor or CommandExecutor(core.router, ctx)
+
     @dp.message()
     async def handle_tg_message(message: types.Message):
+        trace = tracer.start("tg")
         user_text = message.text.strip()
         chat_id = str(message.chat.id)
 
@@ -31,13 +36,16 @@ def register_bridge_handlers(dp: Dispatcher, ctx, core):
         # ЭТАП 3: Проброс в ядро (Logic Bridge)
         logger.info(f"TG-Bridge: Команда из Telegram -> {user_text}")
 
-        # Устанавливаем источник ПЕРЕД выполнением, чтобы ctx.reply знал, куда отвечать
-        ctx.set_input_source("tg")
+        # Логика выполняется в пуле потоков: цикл aiogram остается свободным.
+        # Источник "tg" исполнитель ставит сам, чтобы ctx.reply знал, куда отвечать
+        success = await executor.execute(user_text.lower(), trace)
+        tracer.finish(trace, text=user_text, executed=bool(success))
 
-        # Пытаемся выполнить логику
-        success = core.router.route(user_text.lower(), ctx)
+        if success is None:
+            # Перегрузка или команда не уложилась в таймаут
+            ctx.reply("⏳ Команда выполняется слишком долго или я перегружена, попробуй позже.")
         # Если плагины промолчали (не сработал мэтчер) — уведомляем пользователя
-        if not success:
+        elif not success:
             # Используем ctx.reply вместо прямого message.reply для единообразия логов
             ctx.reply("🤷 Не нашла подходящего плагина для этой команды.")
 
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Асинхронное ведро токенов: rate токенов в секунду, запас до capacity.
+    Ожидающие обслуживаются по очереди (FIFO), поэтому порядок отправки сохраняется.
+    pause() блокирует выдачу на время retry_after из ответа 429.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        if now <= self._updated:
+            return  # Еще идет пауза после 429
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Не выдавать токены seconds секунд; после паузы доступен один токен, запас копится заново."""
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = 1.0
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._updated = max(now, self._blocked_until)
+
+    @property
+    def blocked_for(self) -> float:
+        return max(0.0, self._blocked_until - time.monotonic())
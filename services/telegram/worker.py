@@ -1,19 +1,93 @@
 import asyncio
+import time
 from datetime import datetime
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from services.telegram.rate_limit import TokenBucket
 from utils.db_manager import db
 from utils.logger import logger
 from utils.config_manager import aiko_cfg
+from utils.metrics import LatencyStats
+
+# Исход отправки одной единицы
+SENT = "sent"
+RETRY = "retry"          # 429: повторить после retry_after, без backoff
+TRANSIENT = "transient"  # Сеть/сервер: вернуть в очередь и уйти на backoff
+PERMANENT = "permanent"  # Telegram не примет никогда: отложить, очередь не стопорить
 
 
 class TelegramWorker:
+    # Лимит длины текста одного сообщения Bot API
+    MAX_MESSAGE_LEN = 4096
+    # Сообщение старше этого досылается с пометкой «Дослано»
+    BACKLOG_AGE_SEC = 60
+    BACKLOG_HEADER = "⏳ *[Дослано]*"
+
     def __init__(self, bot: Bot):
         self.bot = bot
         self.retry_delay = 5
         self.is_running = True
 
+        # Страховочный опрос БД на случай пропущенного уведомления (крах, внешняя запись)
+        self.safety_poll = aiko_cfg.get("telegram.safety_poll_sec", 30)
+        self._wake = None
+
+        # Пачка захватывается в аренду: другой воркер ее не возьмет,
+        # а при падении до подтверждения она вернется в очередь
+        self.batch_size = aiko_cfg.get("telegram.batch_size", 50)
+        self.lease_sec = aiko_cfg.get("telegram.lease_sec", 60)
+
+        # Сообщения с priority не выше порога склеиваются в одно (бэклог после офлайна)
+        self.coalesce_priority = aiko_cfg.get("telegram.coalesce_max_priority", 0)
+
+        # Лимиты Telegram: ~1 сообщение/с в чат (короткие всплески допустимы) и ~30/с на бота
+        self.chat_rate = aiko_cfg.get("telegram.chat_rate", 1.0)
+        self.chat_burst = aiko_cfg.get("telegram.chat_burst", 3)
+        self.global_bucket = TokenBucket(
+            aiko_cfg.get("telegram.global_rate", 30.0),
+            aiko_cfg.get("telegram.global_burst", 30)
+        )
+        self._chat_buckets = {}
+        # Сколько запросов может быть в полете одновременно (всего и в одном чате:
+        # при 1 сообщения чата приходят строго в порядке очереди)
+        self.max_concurrency = aiko_cfg.get("telegram.max_concurrency", 4)
+        self.chat_concurrency = aiko_cfg.get("telegram.chat_concurrency", 1)
+
+        # Задержка от постановки в outbox до успешной отправки
+        self.send_latency = LatencyStats()
+        self.throttled = 0
+        self.failed = 0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _attach_notifier(self):
+        """Подписывает воркер на новые сообщения outbox (вызов придет из любого потока)."""
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+
+        def notify():
+            try:
+                loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                pass  # Цикл уже закрыт
+
+        db.on_tg_message_added = notify
+
+    async def _wait_for_work(self, timeout):
+        """Спит до уведомления о новом сообщении или до таймаута."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
     async def run(self):
         logger.info("TG-Worker: Цикл мониторинга очереди запущен.")
+        self._attach_notifier()
+
         while self.is_running:
             try:
                 # 1. Проверяем наличие chat_id перед началом круга
@@ -23,47 +97,186 @@ class TelegramWorker:
                     await asyncio.sleep(10)
                     continue
 
-                # 2. Опрашиваем БД
-                messages = db.get_pending_tg_messages()
-                if not messages:
-                    await asyncio.sleep(2)  # Нет задач — быстро засыпаем
+                # 2. Захватываем пачку. Флаг сбрасываем до запроса: уведомление,
+                # пришедшее во время чтения, не потеряется
+                self._wake.clear()
+                batch = db.claim_tg_batch(self.batch_size, self.lease_sec)
+                if not batch:
+                    await self._wait_for_work(self.safety_poll)
                     continue
 
-                logger.debug(f"TG-Worker: Найдено сообщений в очереди: {len(messages)}")
+                logger.debug(f"TG-Worker: Захвачено сообщений: {len(batch)}")
 
                 # 3. Рассылка
-                for m_id, text, created_at in messages:
-                    if await self._try_send(current_chat_id, m_id, text, created_at):
-                        self.retry_delay = 5
-                    else:
-                        # Ошибка сети: ждем и уходим на Backoff
-                        logger.warning(f"TG-Worker: Сеть недоступна. Ждем {self.retry_delay}с.")
-                        await asyncio.sleep(self.retry_delay)
-                        self.retry_delay = min(self.retry_delay * 2, 300)
-                        break
+                if not await self._send_batch(current_chat_id, batch):
+                    # Ошибка сети: ждем и уходим на Backoff
+                    logger.warning(f"TG-Worker: Сеть недоступна. Ждем {self.retry_delay}с.")
+                    await asyncio.sleep(self.retry_delay)
+                    self.retry_delay = min(self.retry_delay * 2, 300)
 
             except Exception as e:
                 logger.error(f"TG-Worker: Глобальная ошибка цикла: {e}")
                 await asyncio.sleep(5)
 
-    async def _try_send(self, chat_id, m_id, text, created_at):
+    async def _send_batch(self, chat_id, batch) -> bool:
+        """
+        Отправляет захваченную пачку: старты идут по порядку через ведра токенов,
+        в полете одновременно не больше max_concurrency запросов и не больше
+        chat_concurrency в этот чат (пачка всегда для одного чата).
+        Отправленное подтверждается одним запросом, неотправленное сразу
+        возвращается в очередь, а неприемлемое для Telegram откладывается.
+        Пока пачка отправляется (лимит чата, пауза после 429), аренда продлевается.
+        :return: False, если отправка прервалась ошибкой сети.
+        """
+        units = self._coalesce(batch)
+        bucket = self._chat_bucket(chat_id)
+        slots = asyncio.Semaphore(self.max_concurrency)
+        chat_slots = asyncio.Semaphore(self.chat_concurrency)
+        sent, failed, returned = [], [], []
+        outcomes = []
+        tasks = []
+
+        async def deliver(ids, text, enqueued):
+            try:
+                outcome = await self._try_send(chat_id, text)
+            finally:
+                slots.release()
+                chat_slots.release()
+
+            outcomes.append(outcome)
+            if outcome == SENT:
+                sent.extend(ids)
+                now = time.time()
+                for enqueued_at in enqueued:
+                    if enqueued_at:
+                        self.send_latency.add(now - enqueued_at)
+            elif outcome == PERMANENT:
+                failed.extend(ids)
+            else:
+                returned.extend(ids)
+
+        def halted():
+            return any(outcome in (RETRY, TRANSIENT) for outcome in outcomes)
+
+        async def renew_lease():
+            # Продлеваем всю пачку: итог (ack/release) пишется только в конце
+            ids = [row[0] for row in batch]
+            while True:
+                await asyncio.sleep(self.lease_sec / 2)
+                db.extend_tg_lease(ids, self.lease_sec)
+
+        renewal = asyncio.create_task(renew_lease())
         try:
-            # Парсим время создания (теперь оно локальное)
-            dt_created = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S")
-            delta = datetime.now() - dt_created
-
-            # Ставим "Дослано" только если реально прошло больше минуты
-            if delta.total_seconds() > 60:
-                text = f"⏳ *[Дослано]*\n_Создано: {created_at}_\n\n{text}"
-
-            await self.bot.send_message(
-                chat_id=chat_id,
-                text=text,
-                parse_mode="Markdown"
-            )
-
-            db.mark_tg_sent(m_id)
-            return True
-        except Exception as e:
-            logger.error(f"TG-Worker: {e}")
-            return False
\ No newline at end of file
+            for i, (ids, text, enqueued) in enumerate(units):
+                await chat_slots.acquire()
+                await slots.acquire()
+                if not halted():
+                    await bucket.acquire()
+                    await self.global_bucket.acquire()
+                if halted():
+                    # После 429 или обрыва сети остаток пачки не трогаем
+                    slots.release()
+                    chat_slots.release()
+                    returned.extend(m_id for unit in units[i:] for m_id in unit[0])
+                    break
+                tasks.append(asyncio.create_task(deliver(ids, text, enqueued)))
+
+            await asyncio.gather(*tasks)
+        finally:
+            renewal.cancel()
+            for task in tasks:
+                task.cancel()
+            db.ack_tg_batch(sent)
+            db.fail_tg_batch(failed)
+            db.release_tg_batch(returned)
+
+        if TRANSIENT in outcomes:
+            return False
+        self.retry_delay = 5
+        return True
+
+    def _is_backlog(self, created_at) -> bool:
+        # Время создания локальное
+        dt_created = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S")
+        return (datetime.now() - dt_created).total_seconds() > self.BACKLOG_AGE_SEC
+
+    def _coalesce(self, batch) -> list:
+        """
+        Пачка → единицы отправки [(ids, text, [enqueued_at, ...]), ...].
+        Важные сообщения (priority выше порога) уходят по одному и первыми —
+        так их отдает claim_tg_batch. Склеиваются только подряд идущие обычные
+        из бэклога, пока текст помещается в лимит Telegram; свежие ответы
+        уходят отдельными сообщениями.
+        """
+        units, group, group_len = [], [], 0
+
+        for row in batch:
+            m_id, text, priority, created_at, enqueued_at = row
+            if priority > self.coalesce_priority or not self._is_backlog(created_at):
+                if group:
+                    units.append(self._render(group))
+                    group = []
+                units.append(self._render([row]))
+                continue
+
+            # Записи разделяются пустой строкой; заголовок считаем всегда — с запасом
+            entry_len = len(self._entry(text, created_at)) + 2
+            if group and group_len + entry_len > self.MAX_MESSAGE_LEN:
+                units.append(self._render(group))
+                group = []
+            if not group:
+                group_len = len(self.BACKLOG_HEADER)
+
+            group.append(row)
+            group_len += entry_len
+
+        if group:
+            units.append(self._render(group))
+        return units
+
+    def _entry(self, text, created_at):
+        return f"_Создано: {created_at}_\n{text}" if self._is_backlog(created_at) else text
+
+    def _render(self, rows):
+        """Одна единица отправки; пометка «Дослано» — если в ней есть старые сообщения."""
+        body = "\n\n".join(self._entry(row[1], row[3]) for row in rows)
+        # Ставим "Дослано" только если реально прошло больше минуты
+        if any(self._is_backlog(row[3]) for row in rows):
+            body = f"{self.BACKLOG_HEADER}\n{body}"
+        return [row[0] for row in rows], body, [row[4] for row in rows]
+
+    async def _try_send(self, chat_id, text) -> str:
+        """Одна попытка отправки; исключения Telegram раскладываются по исходам."""
+        parse_mode = "Markdown"
+        while True:
+            try:
+                await self.bot.send_message(
+                    chat_id=chat_id,
+                    text=text,
+                    parse_mode=parse_mode
+                )
+                return SENT
+            except TelegramRetryAfter as e:
+                # Флуд-контроль: чат молчит ровно столько, сколько просит сервер
+                self.throttled += 1
+                self._chat_bucket(chat_id).pause(e.retry_after)
+                logger.warning(f"TG-Worker: 429, пауза {e.retry_after}с.")
+                return RETRY
+            except TelegramBadRequest as e:
+                if parse_mode and "can't parse entities" in str(e):
+                    # Битая разметка (в т.ч. после склейки) — шлем как простой текст
+                    parse_mode = None
+                    continue
+                self.failed += 1
+                logger.error(f"TG-Worker: Сообщение отклонено Telegram, отложено: {e}")
+                return PERMANENT
+            except Exception as e:
+                logger.error(f"TG-Worker: {e}")
+                return TRANSIENT
+
+    def stats(self) -> dict:
+        return {
+            "enqueue_to_send": self.send_latency.snapshot(),
+            "throttled": self.throttled,
+            "failed": self.failed,
+        }
@@ -1,6 +1,9 @@
 """
 Базовые фикстуры для тестов Aiko
 """
+import json
+import os
+import time
 import pytest
 import tempfile
 import shutil
@@ -14,6 +17,17 @@ sys.path.insert(0, str(project_root))
 
 from core.context import AikoContext
 from utils.db_manager import DBManager
+from utils.metrics import find_regressions
+
+BENCH_BASELINE = Path(__file__).parent / "bench_baseline.json"
+
+
+def pytest_addoption(parser):
+    parser.addoption("--bench-save", action="store_true",
+                     help="Перезаписать базовые результаты бенчмарков текущими")
+    parser.addoption("--bench-threshold", type=float,
+                     default=float(os.environ.get("AIKO_BENCH_THRESHOLD", 0.25)),
+                     help="Допустимое относительное ухудшение метрик (0.25 = 25%%)")
 
 
 @pytest.fixture
@@ -78,6 +92,7 @@ def test_db(temp_dir):
     db_path = temp_dir / "test.db"
     db = DBManager(str(db_path))
     yield db
+    db.close()
     # Cleanup происходит автоматически через temp_dir
 
 
@@ -111,4 +126,63 @@ def clear_singleton_cache():
 
     # Повторная очистка после теста
     gc._context_instance = None
-    AudioController._instance = None
\ No newline at end of file
+    AudioController._instance = None
+
+class BenchBaseline:
+    """Базовые результаты бенчмарков в JSON: сравнение и сохранение."""
+
+    # Абсолютные задержки сняты на одной машине: в отчете для справки, не для сравнения
+    ABSOLUTE_MS = {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+
+    _calibration = None
+
+    @classmethod
+    def cpu_unit(cls) -> float:
+        """
+        CPU-время процесса (с) эталонной питоновской нагрузки — знаменатель для *_rel.
+        process_time не считает время, отданное соседним процессам, а скорость машины
+        одинаково сказывается на эталоне и на замеряемом коде.
+        """
+        if cls._calibration is None:
+            best = float("inf")
+            for _ in range(3):
+                started = time.process_time()
+                data = [(i * 7919) % 10007 for i in range(200_000)]
+                sorted(data)
+                best = min(best, time.process_time() - started)
+            cls._calibration = best
+        return cls._calibration
+
+    def __init__(self, path, threshold, save):
+        self.path = path
+        self.threshold = threshold
+        self.save = save
+        self.data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+    def check(self, name, report: dict, thresholds=None):
+        """
+        Печатает отчет и падает, если метрики хуже базовых больше чем на threshold.
+        thresholds — порог по имени метрики (None — метрика только для справки),
+        для абсолютных времен, которые сильно зависят от машины.
+        """
+        print(f"\n[bench] {name}: {json.dumps(report, ensure_ascii=False, indent=2)}")
+
+        if self.save:
+            self.data[name] = report
+            self.path.write_text(json.dumps(self.data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            return
+        if name not in self.data:
+            pytest.fail(f"Нет базовых результатов '{name}' в {self.path.name}: запустите с --bench-save")
+
+        regressions = find_regressions(report, self.data[name], self.threshold, thresholds=thresholds)
+        assert not regressions, f"Регрессия бенчмарка '{name}':\n" + "\n".join(regressions)
+
+
+@pytest.fixture
+def bench_baseline(request):
+    """Базовые результаты (tests/bench_baseline.json) для регресс-проверки бенчмарков"""
+    return BenchBaseline(
+        BENCH_BASELINE,
+        threshold=request.config.getoption("--bench-threshold"),
+        save=request.config.getoption("--bench-save")
+    )
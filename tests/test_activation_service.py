@@ -115,3 +115,20 @@ class TestActivationService:
         activation_service.handle_timeouts(set_state_cb)
         
         set_state_cb.assert_not_called()
+
+    def test_check_partial_fires_on_name(self, activation_service):
+        """Проверка раннего срабатывания на промежуточной гипотезе"""
+        assert activation_service.check_partial("айко") is True
+
+    def test_check_partial_fires_once_per_utterance(self, activation_service):
+        """Проверка что гипотезы одной фразы не срабатывают повторно"""
+        assert activation_service.check_partial("айко") is True
+        assert activation_service.check_partial("айко включи") is False
+
+        # Финальная фраза закрывает высказывание
+        activation_service.check("айко включи свет")
+        assert activation_service.check_partial("айко") is True
+
+    def test_check_partial_ignores_other_speech(self, activation_service):
+        """Проверка что посторонняя речь не активирует бота"""
+        assert activation_service.check_partial("включи свет") is False
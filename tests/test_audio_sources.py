@@ -0,0 +1,156 @@
+"""
+Тесты источников аудио и AudioHandler без звуковой карты
+"""
+import sys
+import threading
+import time
+import wave
+import pytest
+import numpy as np
+from unittest.mock import MagicMock, patch
+from core.audio_handler import AudioHandler
+from core.audio_sources import MicSource, GeneratorSource, FileSource
+
+
+def _drain(audio_q, until, timeout=5.0):
+    """Читает кольцевой буфер, пока не выполнится условие"""
+    frames = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = audio_q.read(timeout=0.05)
+        if data is not None:
+            frames.append(np.frombuffer(data, dtype=np.int16).copy())
+        elif until():
+            break
+    return np.concatenate(frames) if frames else np.empty(0, dtype=np.int16)
+
+
+@pytest.mark.unit
+class TestMicSource:
+    """Тесты источника-микрофона"""
+
+    def test_devices_queried_once(self):
+        """Проверка что список устройств не запрашивается на каждом рестарте"""
+        sd = MagicMock()
+        sd.query_devices.return_value = [{"name": "a"}, {"name": "b"}]
+
+        with patch.dict(sys.modules, {"sounddevice": sd}):
+            source = MicSource(device_id=1)
+            source.open(None, 16000, 4000)
+            source.open(None, 16000, 4000)
+
+            assert sd.query_devices.call_count == 1
+
+            source.invalidate()
+            source.open(None, 16000, 4000)
+            assert sd.query_devices.call_count == 2
+
+    def test_missing_device(self):
+        """Проверка ошибки для отсутствующего устройства"""
+        sd = MagicMock()
+        sd.query_devices.return_value = [{"name": "a"}]
+
+        with patch.dict(sys.modules, {"sounddevice": sd}):
+            with pytest.raises(IndexError):
+                MicSource(device_id=3).open(None, 16000, 4000)
+
+
+@pytest.mark.unit
+class TestGeneratorSource:
+    """Тесты синтетического источника и воспроизведения записей"""
+
+    def test_blocks_rechunked(self):
+        """Проверка нарезки на блоки заданного размера в форме (N, 1)"""
+        received = []
+        source = GeneratorSource([np.ones(2500, dtype=np.int16)] * 3, realtime=False)
+
+        with source.open(lambda data, frames, t, status: received.append(data.copy()), 16000, 1000):
+            for _ in range(100):
+                if source.exhausted:
+                    break
+                time.sleep(0.01)
+
+        assert source.exhausted
+        assert [len(b) for b in received] == [1000] * 7 + [500]
+        assert received[0].shape == (1000, 1)
+
+    def test_realtime_pacing(self):
+        """Проверка темпа реального времени"""
+        source = GeneratorSource([np.zeros(1600, dtype=np.int16)], realtime=True)
+        started = time.monotonic()
+
+        with source.open(lambda *args: None, 16000, 400):
+            while not source.exhausted:
+                time.sleep(0.005)
+
+        # 4 блока по 25 мс; первый отдается сразу
+        assert time.monotonic() - started >= 0.07
+
+    def test_file_source_appends_silence(self, temp_dir):
+        """Проверка воспроизведения WAV с хвостом тишины"""
+        path = temp_dir / "a.wav"
+        with wave.open(str(path), "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes(np.full(800, 7, dtype=np.int16).tobytes())
+
+        source = FileSource(path, realtime=False, tail_silence_sec=0.1)
+        blocks = list(source.blocks())
+
+        assert len(blocks[0]) == 800
+        assert len(blocks[1]) == 1600 and not blocks[1].any()
+
+
+@pytest.mark.unit
+class TestAudioHandlerWithSource:
+    """Тесты захвата через подменяемый источник"""
+
+    def test_fast_replay_without_loss(self):
+        """Проверка что быстрый прогон не теряет кадры при полном буфере"""
+        samples = np.arange(40000, dtype=np.int16)
+        source = GeneratorSource([samples], realtime=False)
+        statuses = []
+
+        handler = AudioHandler(on_status_change=lambda state, msg: statuses.append(state), source=source)
+        handler.audio_q = handler.audio_q.__class__(capacity=8000, max_read=handler.BLOCK_SIZE)
+
+        stop = threading.Event()
+        t = threading.Thread(target=handler.listen, args=(stop,), daemon=True)
+        t.start()
+
+        # Медленный потребитель: буфер на 8000 кадров наполняется быстрее
+        time.sleep(0.1)
+        received = _drain(handler.audio_q, until=lambda: source.exhausted)
+
+        stop.set()
+        t.join(timeout=2)
+
+        assert np.array_equal(received, samples)
+        assert handler.audio_q.dropped_frames == 0
+        assert statuses[0] is True
+
+    def test_backpressure_keeps_watchdog_quiet(self):
+        """Проверка что ожидание потребителя не считается молчанием устройства"""
+        handler = AudioHandler(source=GeneratorSource([], realtime=False))
+        handler.audio_q = handler.audio_q.__class__(capacity=8000, max_read=handler.BLOCK_SIZE)
+        handler.audio_q.write(np.zeros(8000, dtype=np.int16))
+        handler.last_audio_time = 0
+
+        assert handler._has_room() is False
+        assert time.time() - handler.last_audio_time < 1.0
+
+    def test_no_push_after_stop(self):
+        """Проверка что после остановки насос не дописывает блок, дождавшись места"""
+        pushed = []
+        room = threading.Event()
+        source = GeneratorSource([np.zeros(12000, dtype=np.int16)], realtime=False)
+
+        stream = source.open(lambda block, *_: pushed.append(len(block)), 16000, 4000,
+                             has_room=room.is_set)
+        with stream:
+            time.sleep(0.05)
+        room.set()
+        stream._thread.join(timeout=1)
+
+        assert pushed == []
@@ -0,0 +1,92 @@
+"""
+Микробенчмарк уровня триггеров NLU (utils/aho_corasick.py).
+
+Запуск: pytest -m bench -s tests/test_bench_nlu.py
+Сравнивает проход автоматом Ахо–Корасик с прежним перебором
+`trigger in text` при сотнях и тысячах триггеров. С базовыми результатами
+сравниваются только относительные стоимости (*_rel): абсолютные
+миллисекунды зависят от машины и выводятся для справки.
+"""
+import random
+import time
+import pytest
+from utils.aho_corasick import TriggerAutomaton
+
+PHRASES = 1000
+SIZES = (100, 1000, 5000)
+
+
+def _word(rnd, length):
+    return "".join(rnd.choice("абвгдежзиклмнопрстуфхцчшыэюя") for _ in range(length))
+
+
+def _workload(triggers_count, seed=3):
+    rnd = random.Random(seed)
+    triggers = {f"{_word(rnd, rnd.randint(4, 8))} {_word(rnd, rnd.randint(3, 7))}": i
+                for i in range(triggers_count)}
+    keys = list(triggers)
+    phrases = []
+    for i in range(PHRASES):
+        words = [_word(rnd, rnd.randint(3, 8)) for _ in range(rnd.randint(3, 8))]
+        if i % 2:
+            words.insert(rnd.randint(0, len(words)), rnd.choice(keys))
+        phrases.append(" ".join(words))
+    return triggers, phrases
+
+
+def _naive(triggers, text):
+    for trigger, value in triggers.items():
+        if trigger in text:
+            return trigger, value
+    return None
+
+
+def _measure(fn, phrases, repeat=5) -> float:
+    """Лучшее из repeat прогонов, мс: меньше шума от соседних процессов."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for phrase in phrases:
+            fn(phrase)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+@pytest.mark.bench
+class TestTriggerBenchmark:
+    """Время разбора 1000 фраз в зависимости от числа триггеров"""
+
+    def test_trigger_scaling(self, bench_baseline):
+        """Автомат не должен замедляться пропорционально числу триггеров"""
+        report = {}
+        for size in SIZES:
+            triggers, phrases = _workload(size)
+
+            started = time.perf_counter()
+            automaton = TriggerAutomaton(triggers)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            hits = sum(1 for p in phrases if automaton.longest_match(p))
+            assert hits >= PHRASES // 2
+
+            automaton_ms = _measure(automaton.longest_match, phrases)
+            naive_ms = _measure(lambda p: _naive(triggers, p), phrases)
+            report[f"triggers_{size}"] = {
+                "build_ms": round(build_ms, 2),
+                "automaton_ms": round(automaton_ms, 2),
+                "naive_ms": round(naive_ms, 2),
+                # Стоимость автомата относительно перебора на той же машине
+                "automaton_rel": round(automaton_ms / naive_ms, 3),
+            }
+
+        small, large = report[f"triggers_{SIZES[0]}"], report[f"triggers_{SIZES[-1]}"]
+        # Рост триггеров в 50 раз: перебор растет линейно, автомат — почти нет
+        report["scaling_rel"] = round(large["automaton_ms"] / small["automaton_ms"], 3)
+        assert report["scaling_rel"] < 5
+        assert large["automaton_rel"] < 1
+
+        # Отношения тоже шумят (кэш процессора, частота): ловим только кратный рост.
+        # Масштабирование уже проверено жестким assert выше — в базе только для справки
+        thresholds = {"build_ms": None, "automaton_ms": None, "naive_ms": None,
+                      "automaton_rel": 1.0, "scaling_rel": None}
+        bench_baseline.check("nlu_triggers", report, thresholds=thresholds)
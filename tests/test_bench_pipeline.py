@@ -0,0 +1,378 @@
+"""
+Бенчмарк голосового конвейера: аудио → VAD/STT → ActivationService.check → CommandRouter.route.
+
+Запуск: pytest -m bench -s
+  --bench-save        перезаписать tests/bench_baseline.json
+  --bench-threshold   допустимое ухудшение (по умолчанию 0.25)
+
+Без модели Vosk распознаватель подменяется заглушкой. С моделью и переменной
+AIKO_BENCH_RECORDINGS (директория с WAV) дополнительно гоняются реальные записи.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from vosk import _ffi
+
+from core.activation_service import ActivationService
+from core.audio_handler import AudioHandler
+from core.audio_sources import GeneratorSource, load_audio
+from core.context import AikoContext
+from core.plugin_router import CommandRouter
+from core.stt import STTService
+from core.stt_worker import STTWorker
+from core.vad import VoiceActivityGate
+from utils.config_manager import aiko_cfg
+from utils.Intent_сlassifier import IntentClassifier
+from utils.metrics import LatencyStats, find_regressions
+
+SAMPLE_RATE = 16000
+PHRASES = [
+    "айко покажи статус системы",
+    "айко включи режим фокуса",
+    "айко статус",
+    "айко фокус на час",
+]
+
+
+class BenchStatus:
+    triggers = ["статус"]
+    samples = ["покажи статус системы", "как там система", "нагрузка процессора"]
+
+    def execute(self, text, ctx):
+        return True
+
+
+class BenchFocus:
+    triggers = ["фокус"]
+    samples = ["включи режим фокуса", "не отвлекай меня", "фокус на час"]
+
+    def execute(self, text, ctx):
+        return True
+
+
+class StubRecognizer:
+    """Заглушка Vosk: каждая речевая вставка превращается в следующую фразу из PHRASES"""
+
+    def __init__(self, model, rate, grammar=None):
+        self.heard_speech = False
+        self.index = 0
+
+    def AcceptWaveform(self, data):
+        if isinstance(data, _ffi.CData):
+            data = _ffi.buffer(data)[:]
+        samples = np.frombuffer(bytes(data), dtype=np.int16)
+        if len(samples) and np.abs(samples).max() > 1000:
+            self.heard_speech = True
+        return False
+
+    def Result(self):
+        return json.dumps({"text": ""})
+
+    def PartialResult(self):
+        return json.dumps({"partial": ""})
+
+    def FinalResult(self):
+        if not self.heard_speech:
+            return json.dumps({"text": ""})
+        self.heard_speech = False
+        text = PHRASES[self.index % len(PHRASES)]
+        self.index += 1
+        return json.dumps({"text": text})
+
+    def Reset(self):
+        self.heard_speech = False
+
+
+def synthetic_phrases(count, speech_sec=1.0, pause_sec=1.2):
+    """Тон 300 Гц как «речь» (проходит VAD по энергии и ZCR), между фразами — тишина"""
+    t = np.arange(int(speech_sec * SAMPLE_RATE)) / SAMPLE_RATE
+    speech = (np.sin(2 * np.pi * 300 * t) * 5000).astype(np.int16)
+    pause = np.zeros(int(pause_sec * SAMPLE_RATE), dtype=np.int16)
+
+    def blocks():
+        for _ in range(count):
+            yield speech
+            yield pause
+
+    return blocks
+
+
+class PipelineBench:
+    """
+    Собирает продакшен-стадии вокруг AudioHandler и замеряет каждую.
+    Поток STT повторяет STTWorker.run, но дополнительно сопоставляет
+    прочитанные кадры с моментом их записи в кольцевой буфер.
+    """
+
+    def __init__(self, source, model_path, nlu_path):
+        self.handler = AudioHandler(source=source)
+        self.vad = VoiceActivityGate(samplerate=SAMPLE_RATE)
+        self.stt = STTService(model_path)
+        self.stt._init_rec()
+        self.worker = STTWorker(self.handler.audio_q, self.vad, self.stt, max_phrases=256)
+
+        self.ctx = AikoContext()
+        self.activation = ActivationService(self.ctx)
+
+        plugins = [BenchStatus(), BenchFocus()]
+        intent_map = {}
+        for plugin in plugins:
+            for trigger in plugin.triggers:
+                intent_map.setdefault(trigger, []).append(plugin)
+        nlu = IntentClassifier(model_path=nlu_path)
+        nlu.train(plugins)
+        self.router = CommandRouter(nlu, intent_map, [])
+
+        self.stages = {name: LatencyStats(window=10000)
+                       for name in ("buffer", "stt", "queue", "activation", "route", "end_to_end")}
+        self.executed = 0
+
+        # (конец блока в кадрах, момент записи) и соответствие captured_at → момент записи
+        self._pushed = deque()
+        self._pushed_frames = 0
+        self._read_frames = 0
+        self._captured = {}
+
+        callback = self.handler._callback
+
+        def timed_callback(indata, frames, time_info, status):
+            self._pushed_frames += frames
+            self._pushed.append((self._pushed_frames, time.monotonic()))
+            callback(indata, frames, time_info, status)
+
+        self.handler._callback = timed_callback
+
+        emit = self.worker._emit
+
+        def traced_emit(text, captured_at, is_final=True):
+            self._captured[captured_at] = self._current_push
+            emit(text, captured_at, is_final)
+
+        self.worker._emit = traced_emit
+        self._current_push = None
+
+    def _stt_loop(self, stop):
+        audio_q = self.handler.audio_q
+        while not stop.is_set():
+            data = audio_q.read(timeout=0.05)
+            if data is None:
+                continue
+
+            now = time.monotonic()
+            self._read_frames += data.nbytes // 2
+            while self._pushed and self._pushed[0][0] <= self._read_frames:
+                _, pushed_at = self._pushed.popleft()
+                self.stages["buffer"].add(now - pushed_at)
+                self._current_push = pushed_at
+
+            self.worker.process(data)
+
+    def run(self, expected=None, timeout=120.0) -> dict:
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.handler.listen, args=(stop,), daemon=True),
+            threading.Thread(target=self._stt_loop, args=(stop,), daemon=True),
+        ]
+        started = time.monotonic()
+        cpu_started = time.process_time()
+        for t in threads:
+            t.start()
+
+        deadline = started + timeout
+        idle_since = None
+        while time.monotonic() < deadline:
+            if expected is not None and self.executed >= expected:
+                break
+            try:
+                phrase, is_final, captured_at, _ = self.worker.phrase_q.get(timeout=0.05)
+            except queue.Empty:
+                # Источник доигран и конвейер опустел
+                if self.handler.source.exhausted and len(self.handler.audio_q) == 0:
+                    idle_since = idle_since or time.monotonic()
+                    if time.monotonic() - idle_since > 0.5:
+                        break
+                continue
+
+            if is_final:
+                self._dispatch(phrase, captured_at)
+
+        elapsed = time.monotonic() - started
+        self.cpu_sec = time.process_time() - cpu_started
+        stop.set()
+        for t in threads:
+            t.join(timeout=2)
+
+        return self.report(elapsed)
+
+    def _dispatch(self, phrase, captured_at):
+        """Повторяет AikoCore._on_phrase_detected с замерами стадий."""
+        t0 = time.monotonic()
+        self.stages["queue"].add(t0 - captured_at)
+
+        should_exec, clean_text = self.activation.check(phrase)
+        t1 = time.monotonic()
+        self.stages["activation"].add(t1 - t0)
+        if not should_exec or not clean_text.strip():
+            return
+
+        executed = self.router.route(clean_text, self.ctx)
+        t2 = time.monotonic()
+        self.stages["route"].add(t2 - t1)
+        if not executed:
+            return
+
+        self.executed += 1
+        self.activation.extend_post_command_window()
+        pushed_at = self._captured.pop(captured_at, None)
+        if pushed_at is not None:
+            self.stages["end_to_end"].add(t2 - pushed_at)
+
+    def report(self, elapsed) -> dict:
+        self.stages["stt"] = self.worker.decode_latency
+        report = {}
+        for name, stats in self.stages.items():
+            snap = stats.snapshot()
+            report[name] = {k: snap[k] for k in ("count", "p50_ms", "p95_ms", "p99_ms")}
+        report["throughput"] = {
+            "phrases": self.executed,
+            "elapsed_sec": round(elapsed, 3),
+            "phrases_per_sec": round(self.executed / elapsed, 2) if elapsed else 0.0,
+        }
+        return report
+
+
+@pytest.fixture
+def stub_vosk_if_missing():
+    """Подменяет Vosk заглушкой, если модели нет на диске"""
+    model_path = Path(aiko_cfg.get("stt-model.path", "models/base"))
+    with ExitStack() as stack:
+        if not model_path.exists():
+            stack.enter_context(patch("core.stt.Model"))
+            stack.enter_context(patch("core.stt.KaldiRecognizer", StubRecognizer))
+        yield model_path
+
+
+@pytest.mark.bench
+@pytest.mark.slow
+class TestPipelineBenchmark:
+    """Сквозной бенчмарк задержек голосового конвейера"""
+
+    def test_synthetic_phrases(self, stub_vosk_if_missing, temp_dir, bench_baseline):
+        """Синтетические фразы с максимальной скоростью: задержки стадий и фраз/с"""
+        if stub_vosk_if_missing.exists():
+            pytest.skip("Синтетические фразы рассчитаны на заглушку Vosk")
+
+        count = 60
+        source = GeneratorSource(synthetic_phrases(count), realtime=False)
+        bench = PipelineBench(source, stub_vosk_if_missing, temp_dir / "nlu.pkl")
+
+        report = bench.run(expected=count)
+
+        assert report["throughput"]["phrases"] == count
+        assert bench.handler.audio_q.dropped_frames == 0
+        # CPU на фразу в эталонных единицах: не зависит от соседей по машине, в отличие от фраз/с
+        report["throughput"]["cpu_per_phrase_rel"] = round(bench.cpu_sec / count / bench_baseline.cpu_unit(), 3)
+        thresholds = {**bench_baseline.ABSOLUTE_MS, "phrases_per_sec": None, "cpu_per_phrase_rel": 0.5}
+        bench_baseline.check("pipeline_synthetic", report, thresholds=thresholds)
+
+    def test_realtime_dispatch_latency(self, stub_vosk_if_missing, temp_dir, bench_baseline):
+        """Темп реального времени: задержка от конца фразы до исполнения плагина"""
+        if stub_vosk_if_missing.exists():
+            pytest.skip("Синтетические фразы рассчитаны на заглушку Vosk")
+
+        count = 5
+        source = GeneratorSource(synthetic_phrases(count, speech_sec=0.5, pause_sec=1.0), realtime=True)
+        bench = PipelineBench(source, stub_vosk_if_missing, temp_dir / "nlu.pkl")
+
+        report = bench.run(expected=count, timeout=30)
+
+        assert report["throughput"]["phrases"] == count
+        # Пропускная способность в реальном времени ограничена темпом записи — в базу не идет
+        report["throughput"].pop("phrases_per_sec")
+        # По 5 фразам p95/p99 не имеют смысла: только медиана и только для справки
+        for stage in report.values():
+            stage.pop("p95_ms", None)
+            stage.pop("p99_ms", None)
+        bench_baseline.check("pipeline_realtime", report, thresholds=bench_baseline.ABSOLUTE_MS)
+
+    def test_recordings(self, stub_vosk_if_missing, temp_dir, bench_baseline):
+        """Реальные записи через настоящую модель (нужны модель и AIKO_BENCH_RECORDINGS)"""
+        recordings = os.environ.get("AIKO_BENCH_RECORDINGS")
+        if not recordings or not stub_vosk_if_missing.exists():
+            pytest.skip("Нужны модель Vosk и AIKO_BENCH_RECORDINGS")
+
+        files = sorted(Path(recordings).glob("*.wav"))
+        pause = np.zeros(SAMPLE_RATE, dtype=np.int16)
+
+        def blocks():
+            for f in files:
+                yield load_audio(f)
+                yield pause
+
+        bench = PipelineBench(GeneratorSource(blocks, realtime=False), stub_vosk_if_missing, temp_dir / "nlu.pkl")
+        report = bench.run()
+
+        report["throughput"]["cpu_per_phrase_rel"] = round(
+            bench.cpu_sec / max(report["throughput"]["phrases"], 1) / bench_baseline.cpu_unit(), 3)
+        thresholds = {**bench_baseline.ABSOLUTE_MS, "phrases_per_sec": None, "cpu_per_phrase_rel": 0.5}
+        bench_baseline.check("pipeline_recordings", report, thresholds=thresholds)
+
+
+@pytest.mark.unit
+class TestFindRegressions:
+    """Тесты сравнения с базовыми результатами"""
+
+    def test_latency_regression(self):
+        """Проверка роста задержки сверх порога"""
+        base = {"stt": {"p95_ms": 10.0}}
+
+        assert find_regressions({"stt": {"p95_ms": 12.0}}, base, threshold=0.25) == []
+        assert find_regressions({"stt": {"p95_ms": 20.0}}, base, threshold=0.25)
+
+    def test_small_absolute_delta_ignored(self):
+        """Проверка допуска на шум в долях миллисекунды"""
+        assert find_regressions({"p50_ms": 0.4}, {"p50_ms": 0.1}, min_delta_ms=1.0) == []
+
+    def test_throughput_regression(self):
+        """Проверка падения пропускной способности"""
+        base = {"throughput": {"phrases_per_sec": 100.0}}
+
+        assert find_regressions({"throughput": {"phrases_per_sec": 90.0}}, base) == []
+        assert find_regressions({"throughput": {"phrases_per_sec": 50.0}}, base)
+
+    def test_relative_cost_regression(self):
+        """Проверка роста относительной стоимости (*_rel)"""
+        base = {"automaton_rel": 0.1}
+
+        assert find_regressions({"automaton_rel": 0.12}, base) == []
+        assert find_regressions({"automaton_rel": 0.2}, base)
+
+    def test_per_metric_thresholds(self):
+        """Проверка порога по имени метрики и метрик только для справки"""
+        base = {"drain": {"p50_ms": 100.0, "overhead_rel": 2.0}}
+        current = {"drain": {"p50_ms": 400.0, "overhead_rel": 2.8}}
+
+        assert find_regressions(current, base, thresholds={"p50_ms": None, "overhead_rel": 0.5}) == []
+        assert find_regressions(current, base, thresholds={"overhead_rel": 0.5}) == ["drain.p50_ms: 100.0 -> 400.0"]
+
+    def test_missing_baseline_not_written(self, temp_dir):
+        """Проверка что без --bench-save отсутствующая база не создается молча"""
+        from conftest import BenchBaseline
+        path = temp_dir / "baseline.json"
+        baseline = BenchBaseline(path, threshold=0.25, save=False)
+
+        with pytest.raises(pytest.fail.Exception, match="--bench-save"):
+            baseline.check("new_bench", {"p50_ms": 1.0})
+
+        assert not path.exists()
+        BenchBaseline(path, threshold=0.25, save=True).check("new_bench", {"p50_ms": 1.0})
+        assert "new_bench" in BenchBaseline(path, threshold=0.25, save=False).data
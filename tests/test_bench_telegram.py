@@ -0,0 +1,275 @@
+"""
+Бенчмарк Telegram-сервиса на локальном фейке Bot API (services/telegram/fake_api.py).
+
+Запуск: pytest -m bench -s tests/test_bench_telegram.py
+  - скорость разбора outbox при тысячах сообщений в очереди;
+  - задержка входящей команды (getUpdates → CommandRouter.route) на фоне разбора.
+Лимиты отправки подняты: замеряется накладной расход воркера, а не лимиты Telegram.
+"""
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from aiogram import Dispatcher
+from services.telegram.bot import create_bot
+from services.telegram.fake_api import FakeBotAPI, OWNER_USER
+from services.telegram.handlers.bridge import register_bridge_handlers
+from services.telegram.worker import RETRY, SENT, TRANSIENT, TelegramWorker
+from utils.metrics import LatencyStats
+
+CHAT_ID = str(OWNER_USER["id"])
+
+FAST_LIMITS = {
+    "telegram.chat_id": CHAT_ID,
+    "telegram.token": "42:fake",
+    "telegram.safety_poll_sec": 60,
+    "telegram.chat_rate": 1000.0,
+    "telegram.chat_burst": 50,
+    "telegram.global_rate": 1000.0,
+    "telegram.global_burst": 50,
+    "telegram.max_concurrency": 8,
+    "telegram.chat_concurrency": 8,
+}
+
+
+def _cfg(overrides):
+    from utils.config_manager import aiko_cfg
+    original = aiko_cfg.get
+
+    def get(key, default=None):
+        return overrides[key] if key in overrides else original(key, default)
+
+    return patch.object(aiko_cfg, "get", side_effect=get)
+
+
+class RecordingRouter:
+    """Роутер-заглушка: запоминает момент вызова для каждой команды"""
+
+    def __init__(self):
+        self.routed = {}
+
+    def route(self, text, ctx):
+        self.routed[text] = time.monotonic()
+        return True
+
+
+class TelegramBench:
+    """Фейковый API + настоящие Bot, TelegramWorker и мост входящих команд"""
+
+    def __init__(self, test_db, **api_kwargs):
+        self.db = test_db
+        self.api = FakeBotAPI(seed=1, **api_kwargs)
+        self.router = RecordingRouter()
+        self.inbound = LatencyStats(window=10000)
+
+    async def __aenter__(self):
+        url = await self.api.start()
+        self._cfg = _cfg({**FAST_LIMITS, "telegram.api_url": url})
+        self._cfg.start()
+        self.bot = create_bot("42:fake")
+        self.worker = TelegramWorker(self.bot)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.bot.session.close()
+        await self.api.stop()
+        self._cfg.stop()
+
+    async def drain(self, expected, timeout=120.0):
+        """Запускает воркер до отправки expected сообщений; возвращает время разбора"""
+        started = time.monotonic()
+        task = asyncio.create_task(self.worker.run())
+        deadline = started + timeout
+        while self.worker.send_latency.count < expected and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        elapsed = time.monotonic() - started
+        self.worker.is_running = False
+        self.worker._wake.set()
+        await asyncio.wait_for(task, 5)
+        return elapsed
+
+    async def start_polling(self):
+        dp = Dispatcher()
+        core = MagicMock(router=self.router)
+        register_bridge_handlers(dp, MagicMock(), core)
+        task = asyncio.create_task(
+            dp.start_polling(self.bot, polling_timeout=1, handle_signals=False, close_bot_session=False)
+        )
+        return dp, task
+
+    async def command(self, text, timeout=5.0, stats=None):
+        """Одна входящая команда: от постановки в getUpdates до вызова route"""
+        self.api.push_message(text)
+        key = text.lower()  # Мост приводит команду к нижнему регистру
+        deadline = time.monotonic() + timeout
+        while key not in self.router.routed and time.monotonic() < deadline:
+            await asyncio.sleep(0.001)
+        assert key in self.router.routed, f"Команда '{text}' не дошла до роутера"
+        (stats or self.inbound).add(self.router.routed[key] - self.api.pushed_at[text])
+
+    def drain_report(self, count, elapsed) -> dict:
+        snap = self.worker.send_latency.snapshot()
+        return {
+            "messages": count,
+            "sends": len(self.api.sent),
+            "throttled": self.api.throttled,
+            "elapsed_sec": round(elapsed, 3),
+            "messages_per_sec": round(count / elapsed, 1) if elapsed else 0.0,
+            "enqueue_to_send": {k: snap[k] for k in ("p50_ms", "p95_ms", "p99_ms")},
+        }
+
+
+@pytest.mark.bench
+@pytest.mark.slow
+class TestTelegramBenchmark:
+    """Разбор outbox и задержка входящих команд на фейковом Bot API"""
+
+    def test_outbox_drain_coalesced(self, test_db, bench_baseline):
+        """Бэклог из тысяч обычных сообщений со склейкой и задержкой API 20 мс"""
+        count = 3000
+
+        async def scenario():
+            async with TelegramBench(test_db, latency_ms=20) as bench:
+                for i in range(count):
+                    test_db.add_tg_message(f"Напоминание #{i}: проверить почту")
+                # Склеивается только бэклог: сообщения накопились, пока бот был офлайн
+                test_db.flush()
+                with test_db._conn() as conn:
+                    conn.execute("UPDATE tg_outbox SET created_at = ?", ("2020-01-01 10:00:00",))
+                cpu_started = time.process_time()
+                elapsed = await bench.drain(count)
+                cpu_sec = time.process_time() - cpu_started
+                report = bench.drain_report(count, elapsed)
+                # CPU процесса (воркер + фейк API) на сообщение в эталонных единицах
+                report["cpu_per_message_rel"] = round(cpu_sec / count / bench_baseline.cpu_unit(), 4)
+                return report
+
+        with patch("services.telegram.worker.db", test_db):
+            report = asyncio.run(scenario())
+
+        assert report["sends"] < count / 10
+        thresholds = {**bench_baseline.ABSOLUTE_MS, "messages_per_sec": None, "cpu_per_message_rel": 0.5}
+        bench_baseline.check("telegram_drain_coalesced", report, thresholds=thresholds)
+
+    def test_outbox_drain_individual_with_429(self, test_db, bench_baseline):
+        """Важные сообщения по одному: параллельная отправка и редкие 429"""
+        count = 400
+
+        async def scenario():
+            async with TelegramBench(test_db, latency_ms=20, jitter_ms=10, rate_429=0.005) as bench:
+                for i in range(count):
+                    test_db.add_tg_message(f"Важное #{i}", priority=1)
+                elapsed = await bench.drain(count)
+                return bench.drain_report(count, elapsed)
+
+        with patch("services.telegram.worker.db", test_db):
+            report = asyncio.run(scenario())
+
+        assert report["sends"] == count
+        # Число 429 задается seed и от скорости не зависит
+        report.pop("throttled")
+        # Время разбора относительно идеала: задержка API при полной параллельности
+        ideal_sec = count * (20 + 10 / 2) / 1000 / FAST_LIMITS["telegram.max_concurrency"]
+        report["overhead_rel"] = round(report.pop("elapsed_sec") / ideal_sec, 2)
+        # Абсолютные скорость и задержки зависят от машины: только для справки
+        thresholds = {"messages_per_sec": None, "p50_ms": None, "p95_ms": None, "p99_ms": None,
+                      "overhead_rel": 0.5}
+        bench_baseline.check("telegram_drain_individual", report, thresholds=thresholds)
+
+    def test_inbound_latency_under_backlog(self, test_db, bench_baseline):
+        """Задержка входящих команд, пока воркер разбирает тысячи сообщений"""
+        backlog, commands = 3000, 100
+
+        async def scenario():
+            async with TelegramBench(test_db, latency_ms=20) as bench:
+                for i in range(backlog):
+                    test_db.add_tg_message(f"Важное #{i}", priority=1)
+
+                dp, polling = await bench.start_polling()
+                # Та же задержка без разбора outbox — знаменатель для backlog_rel
+                for i in range(commands // 5):
+                    await bench.command(f"тишина {i}", stats=idle)
+
+                worker = asyncio.create_task(bench.worker.run())
+                await asyncio.sleep(0.2)
+
+                for i in range(commands):
+                    await bench.command(f"статус {i}")
+
+                bench.worker.is_running = False
+                bench.worker._wake.set()
+                await asyncio.wait_for(worker, 10)
+                await dp.stop_polling()
+                await asyncio.wait_for(polling, 10)
+
+                snap = bench.inbound.snapshot()
+                return {
+                    "commands": snap["count"],
+                    "sent_meanwhile": len(bench.api.sent),
+                    "inbound": {k: snap[k] for k in ("p50_ms", "p95_ms", "p99_ms")},
+                    # Во сколько раз разбор бэклога замедляет входящие команды
+                    "backlog_rel": round(snap["p50_ms"] / max(idle.snapshot()["p50_ms"], 0.1), 2),
+                }
+
+        idle = LatencyStats(window=1000)
+        with patch("services.telegram.worker.db", test_db):
+            report = asyncio.run(scenario())
+
+        assert report["commands"] == commands
+        report.pop("sent_meanwhile")
+        # Отношения малых задержек шумят: ловим только кратный рост
+        bench_baseline.check("telegram_inbound", report,
+                             thresholds={**bench_baseline.ABSOLUTE_MS, "backlog_rel": 1.0})
+
+
+@pytest.mark.unit
+class TestFakeBotAPI:
+    """Тесты фейкового Bot API с настоящим aiogram.Bot"""
+
+    def test_worker_delivers_through_fake_api(self, test_db):
+        """Проверка доставки outbox через telegram.api_url"""
+
+        async def scenario():
+            async with TelegramBench(test_db) as bench:
+                for text in ("раз", "два"):
+                    test_db.add_tg_message(text, priority=1)
+                await bench.drain(2, timeout=5)
+                return bench.api.sent
+
+        with patch("services.telegram.worker.db", test_db):
+            sent = asyncio.run(scenario())
+
+        assert [(chat, text) for chat, text, _ in sent] == [(CHAT_ID, "раз"), (CHAT_ID, "два")]
+
+    def test_injected_errors_classified(self, test_db):
+        """Проверка что 429 и 500 фейка разбираются воркером как повтор и сбой сети"""
+
+        async def scenario():
+            async with TelegramBench(test_db, rate_429=1.0, retry_after=3) as bench:
+                throttled = await bench.worker._try_send(CHAT_ID, "x")
+                blocked = bench.worker._chat_bucket(CHAT_ID).blocked_for
+                bench.api.rate_429, bench.api.failure_rate = 0.0, 1.0
+                failed = await bench.worker._try_send(CHAT_ID, "x")
+                bench.api.failure_rate = 0.0
+                ok = await bench.worker._try_send(CHAT_ID, "x")
+                return throttled, blocked, failed, ok
+
+        throttled, blocked, failed, ok = asyncio.run(scenario())
+
+        assert (throttled, failed, ok) == (RETRY, TRANSIENT, SENT)
+        assert blocked > 2
+
+    def test_inbound_command_reaches_router(self, test_db):
+        """Проверка что входящее сообщение владельца доходит до роутера"""
+
+        async def scenario():
+            async with TelegramBench(test_db) as bench:
+                dp, polling = await bench.start_polling()
+                await bench.command("Статус")
+                await dp.stop_polling()
+                await asyncio.wait_for(polling, 10)
+                return bench.router.routed
+
+        routed = asyncio.run(scenario())
+
+        assert list(routed) == ["статус"]
@@ -0,0 +1,126 @@
+"""
+Тесты исполнителя команд Telegram (пул потоков вне цикла aiogram)
+"""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from services.telegram.command_executor import CommandExecutor
+from utils.tracing import tracer
+
+
+class SlowRouter:
+    """Роутер, который держит поток заданное время и запоминает, где выполнялся"""
+
+    def __init__(self, delay=0.0, result=True):
+        self.delay = delay
+        self.result = result
+        self.threads = []
+        self.release = threading.Event()
+
+    def route(self, text, ctx):
+        self.threads.append(threading.current_thread().name)
+        self.release.wait(self.delay)
+        return self.result
+
+
+def _executor(router, **cfg):
+    defaults = {
+        "telegram.command_timeout_sec": 1.0,
+        "telegram.max_in_flight": 8,
+        "telegram.command_workers": 2,
+    }
+    defaults.update(cfg)
+    from utils.config_manager import aiko_cfg
+    original = aiko_cfg.get
+    with patch.object(aiko_cfg, "get", side_effect=lambda k, d=None: defaults.get(k, original(k, d))):
+        return CommandExecutor(router, MagicMock())
+
+
+@pytest.mark.unit
+class TestCommandExecutor:
+    """Тесты пула команд Telegram"""
+
+    def test_route_runs_off_event_loop(self):
+        """Проверка что команда исполняется в пуле и цикл не блокируется"""
+        router = SlowRouter(delay=0.3)
+        executor = _executor(router)
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            result = await executor.execute("статус")
+            task.cancel()
+            return result, ticks
+
+        result, ticks = asyncio.run(scenario())
+
+        assert result is True
+        assert router.threads[0].startswith("TG-Cmd")
+        assert ticks > 10
+        executor.ctx.set_input_source.assert_called_with("tg")
+        executor.shutdown()
+
+    def test_timeout_keeps_slot_until_thread_done(self):
+        """Проверка таймаута: обработчик отпущен, место занято до конца потока"""
+        router = SlowRouter(delay=5)
+        executor = _executor(router, **{"telegram.command_timeout_sec": 0.1})
+
+        async def scenario():
+            result = await executor.execute("зависни")
+            in_flight = executor.in_flight
+            router.release.set()
+            await asyncio.sleep(0.1)
+            return result, in_flight
+
+        result, in_flight = asyncio.run(scenario())
+
+        assert result is None
+        assert in_flight == 1
+        assert executor.in_flight == 0
+        assert executor.stats()["timeouts"] == 1
+        executor.shutdown()
+
+    def test_in_flight_limit_rejects(self):
+        """Проверка отказа при превышении числа команд в работе"""
+        router = SlowRouter(delay=5)
+        executor = _executor(router, **{"telegram.max_in_flight": 2, "telegram.command_workers": 1})
+
+        async def scenario():
+            tasks = [asyncio.create_task(executor.execute(f"cmd {i}")) for i in range(3)]
+            await asyncio.sleep(0.05)
+            router.release.set()
+            return await asyncio.gather(*tasks)
+
+        results = asyncio.run(scenario())
+
+        assert results.count(None) == 1
+        stats = executor.stats()
+        assert stats["rejected"] == 1
+        assert stats["queue_wait"]["count"] == 2
+        executor.shutdown()
+
+    def test_trace_active_in_worker_thread(self):
+        """Проверка что трейс команды доступен в потоке пула"""
+        seen = []
+
+        class TracingRouter:
+            def route(self, text, ctx):
+                seen.append(tracer.current())
+                return True
+
+        executor = _executor(TracingRouter())
+        with patch.object(tracer, "enabled", True):
+            trace = tracer.start("tg")
+            asyncio.run(executor.execute("статус", trace))
+
+        assert seen == [trace]
+        executor.shutdown()
@@ -3,6 +3,7 @@
 """
 import pytest
 import json
+from unittest.mock import MagicMock, patch
 from datetime import datetime, timedelta
 from utils.db_manager import DBManager
 
@@ -78,6 +79,69 @@ class TestDBManager:
         tasks_after = test_db.get_pending_tasks()
         assert len(tasks_after) == 0
     
+    def test_update_tasks_status_batch(self, test_db):
+        """Проверка пакетного обновления статусов"""
+        exec_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for _ in range(3):
+            test_db.add_task("test", {}, exec_time)
+        ids = [t[0] for t in test_db.get_pending_tasks()]
+        
+        test_db.update_tasks_status(ids[:2], 'done')
+        
+        assert [t[0] for t in test_db.get_pending_tasks()] == ids[2:]
+    
+    def test_snooze_reuses_row(self, test_db):
+        """Проверка что отложенная задача остается той же строкой"""
+        past = (datetime.now() - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+        later = (datetime.now() + timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S")
+        test_db.add_task("reminder", {}, past)
+        task_id = test_db.get_pending_tasks()[0][0]
+        test_db.update_task_status(task_id, 'done')
+        
+        test_db.snooze_task(task_id, later)
+        
+        assert test_db.get_all_scheduler_tasks() == [(task_id, '{}', later, None)]
+    
+    def test_snooze_recurring_keeps_earlier_occurrence(self, test_db):
+        """Проверка что у повторяющейся задачи отложенный запуск не отодвигает ближайший"""
+        soon = (datetime.now() + timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S")
+        later = (datetime.now() + timedelta(hours=5)).strftime("%Y-%m-%d %H:%M:%S")
+        test_db.add_task("reminder", {}, soon, rule={"every_sec": 3600, "anchor": soon})
+        task_id = test_db.get_upcoming_tasks()[0][0]
+        
+        test_db.snooze_task(task_id, later)
+        
+        assert test_db.get_upcoming_tasks() == [(task_id, soon)]
+    
+    def test_compact_scheduler(self, test_db):
+        """Проверка ретеншна: удаляются только старые выполненные задачи"""
+        old = (datetime.now() - timedelta(days=40)).strftime("%Y-%m-%d %H:%M:%S")
+        recent = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+        for exec_at in (old, old, recent):
+            test_db.add_task("test", {}, exec_at)
+        ids = [t[0] for t in test_db.get_pending_tasks()]
+        test_db.update_tasks_status(ids[1:], 'done')
+        
+        assert test_db.compact_scheduler(retention_days=30) == 1
+        assert [t[0] for t in test_db.get_upcoming_tasks()] == [ids[0]]
+    
+    def test_due_query_uses_partial_index(self, test_db):
+        """Проверка что поиск наступивших задач идет по индексу, а не по всей истории"""
+        conn = test_db._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO scheduler (type, payload, exec_at, status) VALUES ('t', '{}', ?, 'done')",
+                [(f"2020-01-01 00:00:{i % 60:02d}",) for i in range(20000)]
+            )
+        conn.execute("ANALYZE")
+        
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id, type, payload FROM scheduler "
+            "WHERE status = 'pending' AND exec_at <= ?", ("2030-01-01 00:00:00",)
+        ).fetchall()
+        
+        assert "idx_sch_due" in " ".join(row[-1] for row in plan)
+    
     def test_kv_store_set_get(self, test_db):
         """Проверка KV хранилища"""
         test_db.set_val("test_key", "test_value")
@@ -158,3 +222,350 @@ class TestDBManager:
         # Старый файл должен быть изолирован
         corrupt_files = list(temp_dir.glob("corrupt.db.corrupt_*"))
         assert len(corrupt_files) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.db
+class TestDBConnections:
+    """Тесты постоянных соединений"""
+
+    def test_connection_reused(self, test_db):
+        """Проверка что запросы одного потока идут через одно соединение"""
+        before = test_db.connection_stats()["opened"]
+
+        for i in range(5):
+            test_db.add_tg_message(f"msg {i}")
+            test_db.get_pending_tg_messages()
+
+        stats = test_db.connection_stats()
+        assert stats["opened"] == before
+        assert stats["reused"] >= 10
+
+    def test_pragmas_applied(self, test_db):
+        """Проверка PRAGMA на постоянном соединении"""
+        conn = test_db._conn()
+
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] < 0
+
+    def test_connection_per_thread(self, test_db):
+        """Проверка отдельного соединения для другого потока"""
+        import threading
+
+        main_conn = test_db._conn()
+        other = []
+        t = threading.Thread(target=lambda: other.append(test_db._conn()))
+        t.start()
+        t.join()
+
+        assert other[0] is not main_conn
+        assert test_db.connection_stats()["open"] == 2
+
+    def test_close_and_reopen(self, test_db):
+        """Проверка закрытия соединений и прозрачного переоткрытия"""
+        test_db.set_val("key", "value")
+        test_db.close()
+
+        assert test_db.connection_stats()["open"] == 0
+        test_db.kv_cache.invalidate()
+        assert test_db.get_val("key") == "value"
+        assert test_db.connection_stats()["open"] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.db
+class TestWriteBehind:
+    """Тесты отложенной пакетной записи"""
+
+    @pytest.fixture
+    def wb_db(self, test_db):
+        test_db.write_behind = True
+        test_db.flush_interval = 60  # сброс только вручную или по размеру пачки
+        test_db.flush_max_items = 1000
+        return test_db
+
+    def _outbox_rows(self, db):
+        import sqlite3
+        with sqlite3.connect(db.db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM tg_outbox").fetchone()[0]
+
+    def test_writes_buffered_until_flush(self, wb_db):
+        """Проверка что записи копятся и коммитятся одной пачкой"""
+        for i in range(5):
+            wb_db.add_tg_message(f"msg {i}")
+
+        assert self._outbox_rows(wb_db) == 0
+        assert wb_db.write_stats()["pending"] == 5
+
+        wb_db.flush()
+
+        assert self._outbox_rows(wb_db) == 5
+        assert wb_db.write_stats()["batches"] == 1
+        assert wb_db.write_stats()["max_batch"] == 5
+
+    def test_critical_written_immediately(self, wb_db):
+        """Проверка немедленной записи critical вместе с накопленным"""
+        wb_db.add_tg_message("обычное")
+        wb_db.add_tg_message("срочное", durability="critical")
+
+        assert self._outbox_rows(wb_db) == 2
+        messages = wb_db.get_pending_tg_messages()
+        assert [m[1] for m in messages] == ["обычное", "срочное"]
+
+    def test_critical_waits_for_batch_in_flight(self, wb_db):
+        """Проверка что critical не обгоняет пачку, которую другой поток уже забрал из буфера"""
+        import threading
+        import time
+        wb_db.add_tg_message("обычное")
+        real_conn = wb_db._conn
+        taken = threading.Event()
+
+        def slow_conn():
+            if threading.current_thread().name == "Slow-Flush":
+                taken.set()
+                time.sleep(0.2)
+            return real_conn()
+
+        with patch.object(wb_db, "_conn", side_effect=slow_conn):
+            flusher = threading.Thread(target=wb_db.flush, name="Slow-Flush")
+            flusher.start()
+            assert taken.wait(1)
+            wb_db.add_tg_message("срочное", durability="critical")
+            flusher.join()
+
+        assert [m[1] for m in wb_db.get_pending_tg_messages()] == ["обычное", "срочное"]
+
+    def test_size_triggers_flush(self, wb_db):
+        """Проверка фонового сброса по размеру пачки"""
+        import time
+        wb_db.flush_max_items = 3
+        for i in range(3):
+            wb_db.add_tg_message(f"msg {i}")
+
+        for _ in range(100):
+            if self._outbox_rows(wb_db) == 3:
+                break
+            time.sleep(0.01)
+
+        assert self._outbox_rows(wb_db) == 3
+
+    def test_kv_read_your_writes(self, wb_db):
+        """Проверка чтения несброшенного значения KV"""
+        wb_db.set_val("mode", {"focus": True})
+
+        assert wb_db.get_val("mode") == {"focus": True}
+
+        wb_db.flush()
+        assert wb_db.get_val("mode") == {"focus": True}
+        assert wb_db._pending_kv == {}
+
+    def test_pending_tasks_see_buffered_status(self, wb_db):
+        """Проверка что выполненная задача не возвращается повторно до сброса"""
+        past = (datetime.now() - timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+        wb_db.add_task("test", {}, past)
+        task_id = wb_db.get_pending_tasks()[0][0]
+
+        wb_db.update_task_status(task_id, "done")
+
+        assert wb_db.get_pending_tasks() == []
+
+    def test_close_flushes(self, wb_db):
+        """Проверка сброса при закрытии"""
+        wb_db.add_tg_message("последнее")
+        wb_db.close()
+
+        assert self._outbox_rows(wb_db) == 1
+
+    def test_set_many_enqueued_as_one_batch(self, wb_db):
+        """Проверка что set_many ставит все строки в буфер одним захватом"""
+        with patch.object(wb_db, "_enqueue", wraps=wb_db._enqueue) as enqueue:
+            wb_db.set_many({"a": 1, "b": 2, "c": 3})
+
+        assert enqueue.call_count == 1
+        assert len(enqueue.call_args.args[0]) == 3
+        assert wb_db.write_stats()["pending"] == 3
+
+    def test_lost_batch_invalidates_kv_cache(self, wb_db):
+        """Проверка что потерянная пачка не оставляет значение в кэше KV"""
+        wb_db.set_val("mode", "focus")
+        broken = MagicMock()
+        broken.__enter__.return_value.execute.side_effect = ValueError("битая запись")
+
+        with patch.object(wb_db, "_conn", return_value=broken):
+            wb_db.flush()
+
+        assert wb_db._pending_kv == {}
+        assert wb_db.get_val("mode", "нет") == "нет"
+
+
+@pytest.mark.unit
+@pytest.mark.db
+class TestKVCache:
+    """Тесты кэша kv_store"""
+
+    def test_read_through_and_hits(self, test_db):
+        """Проверка что повторное чтение идет из кэша"""
+        test_db.set_val("volume", 0.7)
+        test_db.kv_cache.invalidate()
+
+        assert test_db.get_val("volume") == 0.7
+        assert test_db.get_val("volume") == 0.7
+
+        stats = test_db.kv_cache.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+
+    def test_write_through(self, test_db):
+        """Проверка что set_val обновляет кэш"""
+        test_db.set_val("mode", "work")
+        test_db.set_val("mode", "rest")
+
+        assert test_db.get_val("mode") == "rest"
+        assert test_db.kv_cache.stats()["misses"] == 0
+
+    def test_missing_key_cached(self, test_db):
+        """Проверка кэширования отсутствующего ключа"""
+        assert test_db.get_val("nope", "dflt") == "dflt"
+        assert test_db.get_val("nope", "dflt") == "dflt"
+
+        assert test_db.kv_cache.stats()["hits"] == 1
+
+    def test_null_value_is_cache_hit(self, test_db):
+        """Проверка что сохраненный JSON null читается из кэша, а не из базы"""
+        test_db.set_val("last_task", "null")
+        test_db.kv_cache.invalidate()
+
+        assert test_db.get_val("last_task", "dflt") is None
+        assert test_db.get_val("last_task", "dflt") is None
+        assert test_db.get_many(["last_task"], default="dflt") == {"last_task": None}
+
+        stats = test_db.kv_cache.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 2
+
+    @pytest.mark.parametrize("write_behind", [False, True])
+    def test_hot_and_cold_reads_agree(self, test_db, write_behind):
+        """Проверка что None и bool читаются одинаково из кэша и из базы"""
+        test_db.write_behind = write_behind
+        test_db.set_val("none", None)
+        test_db.set_val("flag", True)
+        test_db.set_many({"none_many": None, "flag_many": False})
+        keys = ["none", "flag", "none_many", "flag_many"]
+
+        hot = test_db.get_many(keys, default="dflt")
+        test_db.flush()
+        test_db.kv_cache.invalidate()
+        cold = test_db.get_many(keys, default="dflt")
+
+        assert hot == cold == {"none": None, "flag": 1, "none_many": None, "flag_many": 0}
+        assert test_db.get_val("none", "dflt") is None
+
+    def test_cached_container_is_copy(self, test_db):
+        """Проверка что изменение полученного словаря не портит кэш"""
+        test_db.set_val("cfg", {"a": 1})
+
+        value = test_db.get_val("cfg")
+        value["a"] = 2
+
+        assert test_db.get_val("cfg") == {"a": 1}
+
+    def test_get_many_set_many(self, test_db):
+        """Проверка пакетных операций"""
+        test_db.set_many({"a": 1, "b": {"x": [1, 2]}, "c": "text"})
+        test_db.kv_cache.invalidate()
+
+        result = test_db.get_many(["a", "b", "c", "missing"], default=0)
+
+        assert result == {"a": 1, "b": {"x": [1, 2]}, "c": "text", "missing": 0}
+        assert test_db.kv_cache.stats()["items"] == 4
+
+    def test_memory_cap(self):
+        """Проверка вытеснения по объему"""
+        from utils.kv_cache import KVCache, NOT_CACHED
+        cache = KVCache(max_items=100, max_bytes=50, ttl=0)
+
+        for i in range(10):
+            cache.put(f"k{i}", "x" * 10)
+
+        assert cache.bytes <= 50
+        assert cache.get("k9") == "x" * 10
+        assert cache.get("k0") is NOT_CACHED
+        assert cache.stats()["evictions"] > 0
+
+    def test_ttl_expiry(self):
+        """Проверка истечения TTL"""
+        from utils.kv_cache import KVCache, NOT_CACHED
+        cache = KVCache(ttl=0.01)
+        cache.put("k", '"v"')
+
+        import time
+        time.sleep(0.02)
+
+        assert cache.get("k") is NOT_CACHED
+
+
+@pytest.mark.unit
+@pytest.mark.db
+class TestOutboxLeases:
+    """Тесты захвата outbox в аренду и пакетного подтверждения"""
+
+    def test_claim_bounded_and_exclusive(self, test_db):
+        """Проверка ограниченного захвата без повторной выдачи"""
+        for i in range(5):
+            test_db.add_tg_message(f"msg {i}")
+
+        first = test_db.claim_tg_batch(limit=3)
+        second = test_db.claim_tg_batch(limit=3)
+
+        assert [row[1] for row in first] == ["msg 0", "msg 1", "msg 2"]
+        assert [row[1] for row in second] == ["msg 3", "msg 4"]
+        assert test_db.claim_tg_batch() == []
+
+    def test_claim_priority_first(self, test_db):
+        """Проверка что высокий приоритет захватывается первым"""
+        test_db.add_tg_message("обычное", priority=0)
+        test_db.add_tg_message("важное", priority=5)
+
+        batch = test_db.claim_tg_batch()
+
+        assert [row[1] for row in batch] == ["важное", "обычное"]
+
+    def test_ack_batch(self, test_db):
+        """Проверка подтверждения пачки одним запросом"""
+        for i in range(3):
+            test_db.add_tg_message(f"msg {i}")
+        batch = test_db.claim_tg_batch()
+
+        test_db.ack_tg_batch([row[0] for row in batch])
+        test_db.requeue_expired_tg_leases()
+
+        assert test_db.claim_tg_batch() == []
+
+    def test_expired_lease_requeued(self, test_db):
+        """Проверка возврата сообщений с истекшей арендой"""
+        test_db.add_tg_message("потерянное")
+        test_db.claim_tg_batch(lease_sec=-1)
+
+        batch = test_db.claim_tg_batch()
+
+        assert [row[1] for row in batch] == ["потерянное"]
+
+    def test_extend_lease(self, test_db):
+        """Проверка продления аренды: сообщение не возвращается в очередь"""
+        test_db.add_tg_message("долгое")
+        test_db.add_tg_message("отправленное")
+        ids = [row[0] for row in test_db.claim_tg_batch(lease_sec=-1)]
+        test_db.ack_tg_batch(ids[1:])
+
+        assert test_db.extend_tg_lease(ids, lease_sec=60) == 1
+        assert test_db.claim_tg_batch() == []
+
+    def test_release_batch(self, test_db):
+        """Проверка досрочного возврата неотправленного"""
+        test_db.add_tg_message("msg")
+        batch = test_db.claim_tg_batch()
+
+        test_db.release_tg_batch([batch[0][0]])
+
+        assert len(test_db.claim_tg_batch()) == 1
@@ -0,0 +1,187 @@
+"""
+Тесты NLU-классификатора и автомата триггеров
+"""
+import random
+import pytest
+from unittest.mock import patch
+from utils.aho_corasick import TriggerAutomaton
+from utils.Intent_сlassifier import IntentClassifier
+
+
+class Plugin:
+    def __init__(self, name, triggers=(), samples=()):
+        self.name = name
+        self.triggers = list(triggers)
+        self.samples = list(samples)
+
+
+def _naive_longest(patterns, text):
+    """Эталон: перебор всех триггеров, самый длинный, затем самый левый"""
+    best = None
+    for pattern in patterns:
+        start = text.find(pattern)
+        if start < 0:
+            continue
+        key = (-len(pattern), start)
+        if best is None or key < best[0]:
+            best = (key, pattern)
+    return best[1] if best else None
+
+
+@pytest.mark.unit
+class TestTriggerAutomaton:
+    """Тесты автомата Ахо–Корасик"""
+
+    def test_longest_match_wins(self):
+        """Проверка что длинный триггер побеждает вложенный короткий"""
+        automaton = TriggerAutomaton({"статус": 1, "статус системы": 2, "система": 3})
+
+        assert automaton.longest_match("покажи статус системы") == ("статус системы", 2)
+
+    def test_leftmost_on_equal_length(self):
+        """Проверка что при равной длине выигрывает стоящий левее"""
+        automaton = TriggerAutomaton({"фокус": 1, "будил": 2})
+
+        assert automaton.longest_match("будил фокус") == ("будил", 2)
+
+    def test_overlapping_suffixes(self):
+        """Проверка совпадений через суффиксные ссылки"""
+        automaton = TriggerAutomaton({"he": 1, "she": 2, "hers": 3, "his": 4})
+
+        assert automaton.longest_match("ushers") == ("hers", 3)
+        assert automaton.longest_match("xyz") is None
+
+    def test_matches_naive_scan(self):
+        """Проверка совпадения с перебором на случайных данных"""
+        rnd = random.Random(7)
+        alphabet = "абвг "
+        patterns = {"".join(rnd.choice(alphabet) for _ in range(rnd.randint(1, 5))).strip() or "а": i
+                    for i in range(60)}
+        automaton = TriggerAutomaton(patterns)
+
+        for _ in range(300):
+            text = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 30)))
+            expected = _naive_longest(patterns, text)
+            match = automaton.longest_match(text)
+            assert (match[0] if match else None) == expected
+
+
+@pytest.mark.unit
+class TestIntentClassifier:
+    """Тесты двухуровневого классификатора"""
+
+    @pytest.fixture
+    def nlu(self, temp_dir):
+        return IntentClassifier(model_path=temp_dir / "nlu.pkl")
+
+    def test_keyword_longest_trigger(self, nlu):
+        """Проверка что уровень триггеров выбирает самое длинное совпадение"""
+        status = Plugin("status", triggers=["статус"])
+        system = Plugin("system", triggers=["статус системы"])
+        nlu.train([status, system])
+
+        assert nlu.predict("Айко, покажи статус системы!") is system
+        assert nlu.predict("какой статус") is status
+
+    def test_keyword_inside_word(self, nlu):
+        """Проверка вхождения триггера в словоформу (как и раньше)"""
+        focus = Plugin("focus", triggers=["фокус"])
+        nlu.train([focus])
+
+        assert nlu.predict("включи режим фокуса") is focus
+
+    def test_no_match_without_ml(self, nlu):
+        """Проверка пустого результата, когда триггеров нет, а ML не обучена"""
+        nlu.train([Plugin("focus", triggers=["фокус"])])
+
+        assert nlu.predict("сколько времени") is None
+
+
+WEATHER = Plugin("weather", samples=[
+    "какая погода", "погода на завтра", "будет ли дождь", "какая температура на улице",
+    "прогноз погоды", "нужен ли зонт", "холодно ли сегодня", "что с погодой",
+])
+MUSIC = Plugin("music", samples=[
+    "включи музыку", "поставь песню", "следующий трек", "выключи музыку",
+    "громче музыку", "включи плейлист", "поставь что нибудь послушать", "пауза в музыке",
+])
+TIMER = Plugin("timer", samples=[
+    "поставь таймер", "засеки пять минут", "таймер на десять минут", "сколько осталось на таймере",
+    "отмени таймер", "засеки время", "таймер на час", "останови таймер",
+])
+
+
+def _intent(plugin):
+    return plugin.__class__.__name__
+
+
+@pytest.mark.unit
+class TestIntentClassifierML:
+    """Тесты ML-уровня: один проход TF-IDF, top-k и пакетное предсказание"""
+
+    @pytest.fixture
+    def nlu(self, temp_dir):
+        nlu = IntentClassifier(model_path=temp_dir / "nlu.pkl")
+        nlu.confidence_threshold = -10.0
+        return nlu
+
+    @staticmethod
+    def _train(nlu, *plugins):
+        # Классы ML именуются по классу плагина: даем каждому свой класс
+        typed = [type(p.name, (Plugin,), {})(p.name, samples=p.samples) for p in plugins]
+        nlu.train(typed)
+        return typed
+
+    def test_single_vectorization(self, nlu):
+        """Проверка что predict считает TF-IDF один раз на фразу"""
+        weather, music, timer = self._train(nlu, WEATHER, MUSIC, TIMER)
+        tfidf = nlu.pipeline.named_steps["tfidf"]
+
+        with patch.object(tfidf, "transform", wraps=tfidf.transform) as transform:
+            assert nlu.predict("какая завтра погода") is weather
+
+        assert transform.call_count == 1
+
+    def test_topk_ranked(self, nlu):
+        """Проверка ранжирования top-k по убыванию оценки"""
+        weather, music, timer = self._train(nlu, WEATHER, MUSIC, TIMER)
+
+        ranked = nlu.predict_topk("включи музыку погромче", k=2)
+
+        assert len(ranked) == 2
+        assert ranked[0][0] == _intent(music)
+        assert ranked[0][1] >= ranked[1][1]
+
+    def test_binary_model(self, nlu):
+        """Проверка двух классов: decision_function возвращает одну колонку"""
+        weather, music = self._train(nlu, WEATHER, MUSIC)
+
+        assert nlu.predict("прогноз погоды на завтра") is weather
+        assert nlu.predict("поставь музыку") is music
+        ranked = nlu.predict_topk("прогноз погоды на завтра")
+        assert [name for name, _ in ranked] == [_intent(weather), _intent(music)]
+        assert ranked[0][1] == pytest.approx(-ranked[1][1])
+
+    def test_batch_matches_predict(self, nlu):
+        """Проверка что predict_batch совпадает с predict по каждой фразе"""
+        plugins = self._train(nlu, WEATHER, MUSIC, TIMER)
+        trigger = Plugin("alarm", triggers=["будильник"])
+        nlu.train(plugins + [trigger])
+        texts = ["будет ли дождь", "", "заведи будильник", "следующий трек", "засеки минуту", None]
+
+        tfidf = nlu.pipeline.named_steps["tfidf"]
+        with patch.object(tfidf, "transform", wraps=tfidf.transform) as transform:
+            batch = nlu.predict_batch(texts)
+
+        assert transform.call_count == 1
+        assert batch == [nlu.predict(t) for t in texts]
+        assert batch[2] is trigger
+
+    def test_threshold_applied(self, nlu):
+        """Проверка порога уверенности в predict и predict_batch"""
+        self._train(nlu, WEATHER, MUSIC, TIMER)
+        nlu.confidence_threshold = 100.0
+
+        assert nlu.predict("какая погода") is None
+        assert nlu.predict_batch(["какая погода"]) == [None]
+        assert nlu.predict_topk("какая погода")  # top-k порог не применяет
@@ -0,0 +1,141 @@
+"""
+Тесты офлайн-прогона конвейера по записям
+"""
+import json
+import wave
+import pytest
+import numpy as np
+from unittest.mock import patch
+from core.offline_batch import load_audio, collect_files, OfflinePipeline
+
+
+def _write_wav(path, samples, rate=16000, channels=1):
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+
+
+class ScriptedRecognizer:
+    """Фейковый Vosk: на N-м блоке после Reset отдает заданную фразу"""
+
+    script = {}
+    partials = {}
+
+    def __init__(self, model, rate, grammar=None):
+        self.count = 0
+
+    def AcceptWaveform(self, data):
+        self.count += 1
+        return self.count in self.script
+
+    def Result(self):
+        return json.dumps({"text": self.script.get(self.count, "")})
+
+    def PartialResult(self):
+        return json.dumps({"partial": self.partials.get(self.count, "")})
+
+    def FinalResult(self):
+        return json.dumps({"text": ""})
+
+    def Reset(self):
+        self.count = 0
+
+
+@pytest.mark.unit
+class TestLoadAudio:
+    """Тесты чтения записей"""
+
+    def test_load_wav(self, temp_dir):
+        """Проверка чтения моно WAV 16 кГц"""
+        path = temp_dir / "a.wav"
+        _write_wav(path, np.arange(100))
+
+        samples = load_audio(path)
+
+        assert samples.dtype == np.int16
+        assert len(samples) == 100
+
+    def test_load_raw(self, temp_dir):
+        """Проверка чтения сырого int16"""
+        path = temp_dir / "a.raw"
+        np.arange(50, dtype=np.int16).tofile(path)
+
+        assert len(load_audio(path)) == 50
+
+    def test_reject_wrong_format(self, temp_dir):
+        """Проверка отказа для стерео/другой частоты"""
+        path = temp_dir / "stereo.wav"
+        _write_wav(path, np.zeros(200), rate=44100, channels=2)
+
+        with pytest.raises(ValueError):
+            load_audio(path)
+
+    def test_collect_files(self, temp_dir):
+        """Проверка сбора аудиофайлов из директории"""
+        (temp_dir / "sub").mkdir()
+        _write_wav(temp_dir / "a.wav", np.zeros(10))
+        np.zeros(10, dtype=np.int16).tofile(temp_dir / "sub" / "b.raw")
+        (temp_dir / "notes.txt").write_text("x")
+
+        files = collect_files(temp_dir)
+
+        assert [f.name for f in files] == ["a.wav", "b.raw"]
+
+
+@pytest.mark.unit
+class TestOfflinePipeline:
+    """Тесты офлайн-конвейера с фейковым Vosk"""
+
+    @pytest.fixture
+    def pipeline(self, temp_dir):
+        ScriptedRecognizer.partials = {}
+        plugins_dir = temp_dir / "plugins"
+        plugins_dir.mkdir()
+        with patch("core.stt.Model"), patch("core.stt.KaldiRecognizer", ScriptedRecognizer):
+            pipeline = OfflinePipeline("model", str(plugins_dir))
+            pipeline.vad.enabled = False
+            yield pipeline
+
+    def test_transcribe_reports_phrases_and_rtf(self, pipeline, temp_dir):
+        """Проверка фраз, активации и real-time factor"""
+        ScriptedRecognizer.script = {2: "айко статус системы"}
+        path = temp_dir / "cmd.wav"
+        _write_wav(path, np.zeros(16000))
+
+        result = pipeline.transcribe(path)
+
+        assert result["audio_sec"] == 1.0
+        assert result["rtf"] is not None
+        assert len(result["phrases"]) == 1
+
+        phrase = result["phrases"][0]
+        assert phrase["text"] == "айко статус системы"
+        assert phrase["activated"] is True
+        assert phrase["command"] == "статус системы"
+        assert phrase["t"] == 0.5
+
+    def test_phrase_without_name_not_activated(self, pipeline, temp_dir):
+        """Проверка что фраза без имени вне окна не активирует бота"""
+        ScriptedRecognizer.script = {1: "включи свет"}
+        path = temp_dir / "noise.wav"
+        _write_wav(path, np.zeros(8000))
+
+        result = pipeline.transcribe(path)
+
+        assert result["phrases"][0]["activated"] is False
+
+    def test_revised_partial_name_not_activated(self, pipeline, temp_dir):
+        """Проверка что имя только в промежуточной гипотезе не открывает окно команд"""
+        ScriptedRecognizer.partials = {1: "айко"}
+        ScriptedRecognizer.script = {2: "включи свет"}
+        path = temp_dir / "revised.wav"
+        _write_wav(path, np.zeros(16000))
+
+        result = pipeline.transcribe(path)
+
+        wake, final = result["phrases"]
+        assert wake["wake"] is True
+        assert final["text"] == "включи свет"
+        assert final["activated"] is False
@@ -0,0 +1,54 @@
+"""
+Тесты правил повторения задач планировщика
+"""
+from datetime import datetime
+import pytest
+from core.recurrence import next_occurrence, rule_from_repeat
+
+
+def _dt(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M:%S")
+
+
+@pytest.mark.unit
+class TestRecurrence:
+    """Тесты вычисления следующего запуска"""
+
+    def test_interval_next_after_now(self):
+        """Проверка интервала: ближайший запуск строго после момента, без накопления пропусков"""
+        rule = {"every_sec": 7200, "anchor": "2026-01-05 09:00:00"}
+
+        assert next_occurrence(rule, _dt("2026-01-05 08:00:00")) == _dt("2026-01-05 09:00:00")
+        assert next_occurrence(rule, _dt("2026-01-05 09:00:00")) == _dt("2026-01-05 11:00:00")
+        # После долгого простоя — следующий слот, а не все пропущенные
+        assert next_occurrence(rule, _dt("2026-01-06 10:30:00")) == _dt("2026-01-06 11:00:00")
+
+    def test_weekdays_keep_time_of_day(self):
+        """Проверка дней недели: время суток берется из якоря"""
+        # 2026-01-05 — понедельник
+        rule = {"weekdays": [0, 4], "anchor": "2026-01-05 09:00:00"}
+
+        assert next_occurrence(rule, _dt("2026-01-05 09:00:00")) == _dt("2026-01-09 09:00:00")
+        assert next_occurrence(rule, _dt("2026-01-09 10:00:00")) == _dt("2026-01-12 09:00:00")
+
+    def test_weekdays_future_anchor(self):
+        """Проверка что до якоря запусков нет"""
+        rule = {"weekdays": [2], "anchor": "2026-03-02 07:30:00"}  # якорь — понедельник
+
+        assert next_occurrence(rule, _dt("2026-01-01 00:00:00")) == _dt("2026-03-04 07:30:00")
+
+    def test_rule_from_repeat(self):
+        """Проверка перевода настроек окна напоминаний в правило"""
+        anchor = "2026-01-05 09:00:00"
+
+        assert rule_from_repeat({"type": "Один раз", "interval": 1, "days": []}, anchor) is None
+        assert rule_from_repeat({"type": "Каждые N часов", "interval": 3, "days": []}, anchor) == \
+            {"every_sec": 10800, "anchor": anchor}
+        assert rule_from_repeat({"type": "По дням недели", "interval": 1, "days": ["Ср", "Пн"]}, anchor) == \
+            {"weekdays": [0, 2], "anchor": anchor}
+        assert rule_from_repeat({"type": "По дням недели", "interval": 1, "days": []}, anchor) is None
+
+    def test_broken_rule(self):
+        """Проверка что битое правило не роняет планировщик"""
+        assert next_occurrence({"every_sec": 60}, datetime.now()) is None
+        assert next_occurrence({"weekdays": [], "anchor": "2026-01-05 09:00:00"}, datetime.now()) is None
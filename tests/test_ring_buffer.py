@@ -0,0 +1,120 @@
+"""
+Тесты для AudioRingBuffer
+"""
+import pytest
+import numpy as np
+from core.ring_buffer import AudioRingBuffer
+
+
+@pytest.mark.unit
+class TestAudioRingBuffer:
+    """Тесты кольцевого аудиобуфера"""
+
+    def test_write_read_roundtrip(self):
+        """Проверка записи и чтения без потерь"""
+        buf = AudioRingBuffer(capacity=100, max_read=10)
+        buf.write(np.arange(10, dtype=np.int16))
+
+        view = buf.read()
+
+        assert isinstance(view, memoryview)
+        assert list(np.frombuffer(view, dtype=np.int16)) == list(range(10))
+        assert len(buf) == 0
+
+    def test_read_empty_returns_none(self):
+        """Проверка чтения из пустого буфера"""
+        buf = AudioRingBuffer(capacity=100, max_read=10)
+        assert buf.read() is None
+        assert buf.read(timeout=0.01) is None
+
+    def test_accepts_portaudio_shape(self):
+        """Проверка записи блока формы (N, 1) как у sounddevice"""
+        buf = AudioRingBuffer(capacity=100, max_read=10)
+        buf.write(np.ones((5, 1), dtype=np.int16))
+
+        assert len(buf) == 5
+
+    def test_read_is_zero_copy(self):
+        """Проверка что чтение отдает вид на внутреннюю память"""
+        buf = AudioRingBuffer(capacity=100, max_read=10)
+        buf.write(np.arange(5, dtype=np.int16))
+
+        view = buf.read()
+        arr = np.frombuffer(view, dtype=np.int16)
+
+        assert np.shares_memory(arr, buf._buf)
+
+    def test_wraparound(self):
+        """Проверка корректного перехода через границу буфера"""
+        buf = AudioRingBuffer(capacity=8, max_read=4)
+        received = []
+
+        for i in range(10):
+            buf.write(np.arange(i * 3, i * 3 + 3, dtype=np.int16))
+            while (view := buf.read()) is not None:
+                received.extend(np.frombuffer(view, dtype=np.int16).tolist())
+
+        assert received == list(range(30))
+        assert buf.dropped_frames == 0
+
+    def test_drop_oldest_keeps_latest_audio(self):
+        """Проверка политики drop_oldest"""
+        buf = AudioRingBuffer(capacity=10, max_read=10, overflow=AudioRingBuffer.DROP_OLDEST)
+        buf.write(np.arange(25, dtype=np.int16))
+
+        view = buf.read()
+
+        assert list(np.frombuffer(view, dtype=np.int16)) == list(range(15, 25))
+        assert buf.dropped_frames == 15
+        assert buf.overflow_events == 1
+
+    def test_drop_newest_keeps_earliest_audio(self):
+        """Проверка политики drop_newest"""
+        buf = AudioRingBuffer(capacity=10, max_read=10, overflow=AudioRingBuffer.DROP_NEWEST)
+        written = buf.write(np.arange(25, dtype=np.int16))
+
+        view = buf.read()
+
+        assert written == 10
+        assert list(np.frombuffer(view, dtype=np.int16)) == list(range(10))
+        assert buf.dropped_frames == 15
+
+    def test_leased_block_is_protected(self):
+        """Проверка что выданный читателю блок не перезаписывается"""
+        buf = AudioRingBuffer(capacity=4, max_read=4, overflow=AudioRingBuffer.DROP_OLDEST)
+        buf.write(np.arange(4, dtype=np.int16))
+        view = buf.read()
+        snapshot = bytes(view)
+
+        # Читатель "завис" на блоке, писатель продолжает лить данные
+        for _ in range(10):
+            buf.write(np.full(4, 99, dtype=np.int16))
+
+        assert bytes(view) == snapshot
+        assert buf.dropped_frames > 0
+
+    def test_clear(self):
+        """Проверка сброса накопленных данных"""
+        buf = AudioRingBuffer(capacity=100, max_read=10)
+        buf.write(np.arange(20, dtype=np.int16))
+        buf.clear()
+
+        assert len(buf) == 0
+        assert buf.read() is None
+
+    def test_invalid_policy(self):
+        """Проверка валидации политики переполнения"""
+        with pytest.raises(ValueError):
+            AudioRingBuffer(overflow="unknown")
+
+    def test_stats(self):
+        """Проверка статистики"""
+        buf = AudioRingBuffer(capacity=100, max_read=10)
+        buf.write(np.arange(15, dtype=np.int16))
+        buf.read()
+
+        stats = buf.stats()
+        assert stats["written"] == 15
+        assert stats["read"] == 10
+        assert stats["queued"] == 5
+        assert stats["dropped"] == 0
@@ -0,0 +1,337 @@
+"""
+Тесты планировщика задач (heap в памяти + пробуждение по событию)
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+import pytest
+from core.scheduler import TaskScheduler
+
+
+class ReminderPlugin:
+    """Плагин-исполнитель: запоминает моменты срабатывания"""
+    type = "reminder"
+    # Пропущенные за простой напоминания — одной сводкой
+    catch_up = "coalesce"
+
+    def __init__(self, db):
+        self.db = db
+        self.fired = []
+
+    def on_schedule(self, data, ctx, t_id):
+        self.fired.append((t_id, data.get("text"), time.time()))
+
+    def complete_task(self, t_id, data):
+        self.db.update_task_status(t_id, 'done')
+
+
+def _at(seconds):
+    return (datetime.now() + timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def scheduler_env(test_db):
+    """Планировщик на тестовой БД с одним плагином напоминаний"""
+    with patch("core.scheduler.db", test_db):
+        plugin = ReminderPlugin(test_db)
+        ctx = MagicMock(is_running=True, commands=[plugin])
+        scheduler = TaskScheduler(ctx)
+        yield scheduler, plugin, test_db
+        scheduler.stop()
+
+
+@pytest.mark.unit
+class TestTaskScheduler:
+    """Тесты планировщика"""
+
+    def test_overdue_task_fires_on_start(self, scheduler_env):
+        """Проверка что просроченная задача из БД выполняется при старте"""
+        scheduler, plugin, db = scheduler_env
+        db.add_task("reminder", {"text": "старое"}, _at(-60))
+
+        scheduler.start()
+
+        assert _wait_for(lambda: plugin.fired)
+        assert _wait_for(lambda: db.get_pending_tasks() == [])
+        # Просрочка до старта в джиттер не идет
+        assert scheduler.stats()["fire_jitter"]["count"] == 0
+
+    def test_add_task_wakes_scheduler(self, scheduler_env):
+        """Проверка что новая задача будит спящий цикл без опроса"""
+        scheduler, plugin, db = scheduler_env
+        scheduler.resync_sec = 3600
+        scheduler.start()
+        time.sleep(0.1)
+
+        started = time.monotonic()
+        db.add_task("reminder", {"text": "сейчас"}, _at(0))
+
+        assert _wait_for(lambda: plugin.fired)
+        assert time.monotonic() - started < 0.5
+
+    def test_fires_at_exec_time_and_records_jitter(self, scheduler_env):
+        """Проверка срабатывания точно в срок и замера опоздания"""
+        scheduler, plugin, db = scheduler_env
+        scheduler.resync_sec = 3600
+        scheduler.start()
+        exec_at = _at(1)
+        db.add_task("reminder", {"text": "скоро"}, exec_at)
+
+        assert _wait_for(lambda: plugin.fired)
+        fired_at = plugin.fired[0][2]
+        target = datetime.strptime(exec_at, "%Y-%m-%d %H:%M:%S").timestamp()
+        assert 0 <= fired_at - target < 0.3
+        assert scheduler.stats()["fire_jitter"]["count"] == 1
+
+    def test_deleted_task_not_fired(self, scheduler_env):
+        """Проверка что удаленная задача не срабатывает (источник истины — БД)"""
+        scheduler, plugin, db = scheduler_env
+        scheduler.start()
+        db.add_task("reminder", {"text": "отмена"}, _at(1))
+        task_id = db.get_upcoming_tasks()[0][0]
+
+        db.delete_task(task_id)
+        time.sleep(1.5)
+
+        assert plugin.fired == []
+
+    def test_slow_handler_does_not_delay_others(self, scheduler_env):
+        """Проверка что медленный плагин не задерживает другие задачи"""
+        scheduler, plugin, db = scheduler_env
+
+        class SlowPlugin:
+            type = "slow"
+            release = threading.Event()
+
+            def on_schedule(self, data, ctx, t_id):
+                self.release.wait(5)
+
+        slow = SlowPlugin()
+        scheduler.ctx.commands = [slow, plugin]
+        scheduler.reindex()
+        db.add_task("slow", {}, _at(-1))
+        db.add_task("reminder", {"text": "быстрое"}, _at(-1))
+
+        scheduler.start()
+
+        assert _wait_for(lambda: plugin.fired, timeout=1.0)
+        slow.release.set()
+        assert _wait_for(lambda: db.get_pending_tasks() == [])
+
+    def test_timeout_closes_hung_task(self, scheduler_env):
+        """Проверка что зависшая задача закрывается по таймауту и не срабатывает повторно"""
+        scheduler, plugin, db = scheduler_env
+        calls = []
+
+        class HungPlugin:
+            type = "hung"
+            release = threading.Event()
+
+            def on_schedule(self, data, ctx, t_id):
+                calls.append(t_id)
+                self.release.wait(5)
+
+        hung = HungPlugin()
+        scheduler.ctx.commands = [hung]
+        scheduler.reindex()
+        scheduler.task_timeout = 0.2
+        db.add_task("hung", {}, _at(-1))
+
+        scheduler.start()
+
+        assert _wait_for(lambda: scheduler.timeouts == 1)
+        assert _wait_for(lambda: db.get_pending_tasks() == [])
+        hung.release.set()
+        assert len(calls) == 1
+
+    def test_queued_task_cancelled_not_fired_late(self, scheduler_env):
+        """Проверка что задача, простоявшая в очереди пула дольше таймаута, отменяется и не срабатывает позже"""
+        scheduler, plugin, db = scheduler_env
+
+        class HungPlugin:
+            type = "hung"
+            release = threading.Event()
+
+            def on_schedule(self, data, ctx, t_id):
+                self.release.wait(5)
+
+        hung = HungPlugin()
+        scheduler.ctx.commands = [hung, plugin]
+        scheduler.reindex()
+        scheduler._pool = ThreadPoolExecutor(max_workers=1)
+        scheduler.task_timeout = 0.2
+        db.add_task("hung", {}, _at(-2))
+        db.add_task("reminder", {"text": "в очереди"}, _at(-1))
+
+        scheduler.start()
+
+        assert _wait_for(lambda: scheduler.timeouts == 2)
+        assert _wait_for(lambda: db.get_pending_tasks() == [])
+        hung.release.set()
+        time.sleep(0.1)
+        assert plugin.fired == []
+
+    def test_timeout_counted_from_start(self, scheduler_env):
+        """Проверка что ожидание в очереди пула не съедает таймаут выполнения"""
+        scheduler, plugin, db = scheduler_env
+
+        class SlowPlugin:
+            type = "slow"
+            done = []
+
+            def on_schedule(self, data, ctx, t_id):
+                time.sleep(0.15)
+                self.done.append(t_id)
+
+        slow = SlowPlugin()
+        scheduler.ctx.commands = [slow]
+        scheduler.reindex()
+        scheduler._pool = ThreadPoolExecutor(max_workers=1)
+        # Очередь ждет 0.15с, но это меньше таймаута ожидания; выполнение — тоже меньше
+        scheduler.task_timeout = 0.25
+        db.add_task("slow", {}, _at(-2))
+        db.add_task("slow", {}, _at(-1))
+
+        scheduler.start()
+
+        assert _wait_for(lambda: len(slow.done) == 2)
+        assert _wait_for(lambda: db.get_pending_tasks() == [])
+        assert scheduler.timeouts == 0
+
+    def test_unknown_type_closed_in_one_batch(self, scheduler_env):
+        """Проверка что задачи без исполнителя закрываются одной записью с одним предупреждением"""
+        scheduler, plugin, db = scheduler_env
+        for _ in range(3):
+            db.add_task("nobody", {}, _at(-1))
+
+        with patch.object(db, "finish_tasks", wraps=db.finish_tasks) as update:
+            scheduler.start()
+            assert _wait_for(lambda: db.get_pending_tasks() == [])
+
+        batches = [call.args[0] for call in update.call_args_list if call.args[0]]
+        assert [len(ids) for ids in batches] == [3]
+        scheduler.ctx.broadcast.assert_called_once()
+
+    def test_handler_index(self, scheduler_env):
+        """Проверка индекса type -> плагин (первый плагин с типом выигрывает)"""
+        scheduler, plugin, db = scheduler_env
+        other = ReminderPlugin(db)
+        scheduler.ctx.commands = [plugin, other, object()]
+
+        scheduler.reindex()
+
+        assert scheduler._handlers == {"reminder": plugin}
+
+    def test_recurring_task_rescheduled_in_place(self, scheduler_env):
+        """Проверка что повторяющаяся задача переносится в той же строке"""
+        scheduler, plugin, db = scheduler_env
+        anchor = _at(-1)
+        db.add_task("reminder", {"text": "вода"}, anchor, rule={"every_sec": 3600, "anchor": anchor})
+
+        scheduler.start()
+
+        assert _wait_for(lambda: db.get_pending_tasks() == [])
+        rows = db.get_all_scheduler_tasks()
+        assert len(rows) == 1
+        assert rows[0][2] == (datetime.strptime(anchor, "%Y-%m-%d %H:%M:%S")
+                              + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+        assert len(plugin.fired) == 1
+
+
+@pytest.mark.unit
+class TestCatchUp:
+    """Тесты догонялки пропущенных за время простоя задач"""
+
+    def _add_missed(self, db, count, t_type="reminder"):
+        for i in range(count):
+            db.add_task(t_type, {"text": f"#{i}"}, _at(-3600 + i))
+
+    def _run(self, scheduler, db):
+        with patch.object(db, "finish_tasks", wraps=db.finish_tasks) as finish:
+            scheduler.start()
+            assert _wait_for(lambda: db.get_pending_tasks() == [])
+        return [call.args[0] for call in finish.call_args_list if call.args[0]]
+
+    def test_coalesce_single_summary(self, scheduler_env):
+        """Проверка сводки: одно уведомление, все задачи закрыты одной транзакцией"""
+        scheduler, plugin, db = scheduler_env
+        self._add_missed(db, 5)
+
+        batches = self._run(scheduler, db)
+
+        assert plugin.fired == []
+        assert [len(ids) for ids in batches] == [5]
+        scheduler.ctx.broadcast.assert_called_once()
+        summary = scheduler.ctx.broadcast.call_args.args[0]
+        assert "5" in summary and "#4" in summary
+        assert scheduler.stats()["caught_up"] == 5
+
+    def test_latest_only(self, scheduler_env):
+        """Проверка что выполняется только последняя пропущенная задача"""
+        scheduler, plugin, db = scheduler_env
+        scheduler.catch_up = {"reminder": "latest"}
+        self._add_missed(db, 4)
+
+        batches = self._run(scheduler, db)
+
+        assert _wait_for(lambda: plugin.fired)
+        assert [text for _, text, _ in plugin.fired] == ["#3"]
+        assert [len(ids) for ids in batches] == [3]
+
+    def test_skip_and_plugin_policy(self, scheduler_env):
+        """Проверка политики из атрибута плагина: пропуск без уведомлений"""
+        scheduler, plugin, db = scheduler_env
+        plugin.catch_up = "skip"
+        self._add_missed(db, 3)
+
+        self._run(scheduler, db)
+
+        assert plugin.fired == []
+        scheduler.ctx.broadcast.assert_not_called()
+
+    def test_all_fires_every_task(self, scheduler_env):
+        """Проверка что без политики у плагина и в конфиге выполняются все (прежнее поведение)"""
+        scheduler, plugin, db = scheduler_env
+        plugin.catch_up = None
+        self._add_missed(db, 3)
+
+        scheduler.start()
+
+        assert _wait_for(lambda: len(plugin.fired) == 3)
+
+    def test_coalesce_with_plugin_batch_handler(self, scheduler_env):
+        """Проверка что плагин может собрать сводку сам"""
+        scheduler, plugin, db = scheduler_env
+        received = []
+        plugin.on_schedule_batch = lambda batch, ctx: received.append([data["text"] for _, data in batch])
+        self._add_missed(db, 3)
+
+        self._run(scheduler, db)
+
+        assert _wait_for(lambda: received)
+        assert received == [["#0", "#1", "#2"]]
+        scheduler.ctx.broadcast.assert_not_called()
+
+    def test_recurring_missed_moves_to_next_slot(self, scheduler_env):
+        """Проверка что пропущенная повторяющаяся задача переносится на ближайший будущий запуск"""
+        scheduler, plugin, db = scheduler_env
+        plugin.catch_up = "skip"
+        anchor = _at(-3 * 3600 - 30)
+        db.add_task("reminder", {"text": "вода"}, anchor, rule={"every_sec": 3600, "anchor": anchor})
+        db.add_task("reminder", {"text": "еще"}, _at(-600))
+
+        self._run(scheduler, db)
+
+        rows = db.get_all_scheduler_tasks()
+        assert len(rows) == 1
+        next_at = datetime.strptime(rows[0][2], "%Y-%m-%d %H:%M:%S")
+        assert datetime.now() < next_at <= datetime.now() + timedelta(hours=1)
@@ -0,0 +1,259 @@
+"""
+Тесты для STTService (Vosk подменяется фейковым распознавателем)
+"""
+import json
+import time
+import pytest
+from unittest.mock import patch
+from vosk import _ffi
+from core.stt import STTService
+
+
+class FakeRecognizer:
+    """Имитация KaldiRecognizer: фразы задаются сценарием по номеру блока"""
+
+    def __init__(self, model, rate, grammar=None):
+        self.grammar = grammar
+        self.fed = []
+        self.finals = {}    # номер блока -> финальный текст
+        self.partials = {}  # номер блока -> гипотеза
+        self.resets = 0
+
+    def AcceptWaveform(self, data):
+        if isinstance(data, _ffi.CData):
+            data = _ffi.buffer(data)[:]
+        self.fed.append(bytes(data))
+        return len(self.fed) in self.finals
+
+    def Result(self):
+        return json.dumps({"text": self.finals.get(len(self.fed), "")})
+
+    def PartialResult(self):
+        return json.dumps({"partial": self.partials.get(len(self.fed), "")})
+
+    def FinalResult(self):
+        return json.dumps({"text": "хвост фразы"})
+
+    def Reset(self):
+        self.resets += 1
+        self.fed = []
+
+
+@pytest.fixture
+def fake_vosk():
+    created = []
+
+    def factory(model, rate, grammar=None):
+        rec = FakeRecognizer(model, rate, grammar)
+        created.append(rec)
+        return rec
+
+    with patch("core.stt.Model"), patch("core.stt.KaldiRecognizer", side_effect=factory):
+        yield created
+
+
+@pytest.mark.unit
+class TestSTTService:
+    """Тесты сервиса распознавания"""
+
+    def test_final_phrase(self, fake_vosk):
+        """Проверка получения финальной фразы"""
+        stt = STTService("model")
+        stt._init_rec()
+        fake_vosk[0].finals = {2: "айко привет"}
+
+        assert stt.get_phrase(b"\x00" * 8) is None
+        assert stt.get_phrase(b"\x00" * 8) == "айко привет"
+
+    def test_partial_deduplicated(self, fake_vosk):
+        """Проверка что одинаковые гипотезы не повторяются"""
+        stt = STTService("model")
+        stt._init_rec()
+        fake_vosk[0].partials = {1: "айко", 2: "айко"}
+
+        stt.get_phrase(b"\x00" * 8)
+        assert stt.get_partial() == "айко"
+
+        stt.get_phrase(b"\x00" * 8)
+        assert stt.get_partial() is None
+
+    def test_flush_returns_final_result(self, fake_vosk):
+        """Проверка принудительного закрытия фразы"""
+        stt = STTService("model")
+        stt.get_phrase(b"\x00" * 8)
+
+        assert stt.flush() == "хвост фразы"
+
+    def test_memoryview_input(self, fake_vosk):
+        """Проверка приема memoryview без ошибок"""
+        stt = STTService("model")
+        stt._init_rec()
+        fake_vosk[0].finals = {1: "текст"}
+
+        assert stt.get_phrase(memoryview(b"\x01\x00\x02\x00")) == "текст"
+
+
+@pytest.mark.unit
+class TestTwoTierSTT:
+    """Тесты двухуровневого режима (wake-грамматика + полный словарь)"""
+
+    @pytest.fixture
+    def stt(self, fake_vosk):
+        stt = STTService("model")
+        stt.two_tier = True
+        stt.window_probe = lambda: False
+        stt._init_rec()
+        return stt
+
+    def test_wake_grammar_built_from_phonetics(self, stt, fake_vosk):
+        """Проверка грамматики легкого уровня"""
+        full, wake = fake_vosk
+        grammar = json.loads(wake.grammar)
+
+        assert full.grammar is None
+        assert "айко" in grammar
+        assert "слушай" in grammar
+        assert "[unk]" in grammar
+
+    def test_wake_tier_uses_configured_name(self, fake_vosk):
+        """Проверка что wake-уровень берет имя бота из конфига"""
+        from utils.config_manager import aiko_cfg
+        original = aiko_cfg.get
+
+        def get(key, default=None):
+            return "Мира" if key == "bot.name" else original(key, default)
+
+        with patch.object(aiko_cfg, "get", side_effect=get):
+            stt = STTService("model")
+        stt.two_tier = True
+        stt.window_probe = lambda: False
+        stt._init_rec()
+        full, wake = fake_vosk
+        grammar = json.loads(wake.grammar)
+
+        assert "мира" in grammar
+        assert "айко" not in grammar
+
+        wake.partials = {1: "айко", 2: "мира"}
+        stt.get_phrase(b"\x00" * 8)
+        assert not stt._full_active
+        stt.get_phrase(b"\x00" * 8)
+        assert stt._full_active
+
+    def test_full_tier_idle_without_wake_word(self, stt, fake_vosk):
+        """Проверка что полный распознаватель не работает без имени"""
+        full, wake = fake_vosk
+
+        for _ in range(3):
+            assert stt.get_phrase(b"\x00" * 8) is None
+
+        assert len(wake.fed) == 3
+        assert full.fed == []
+
+    def test_wake_word_hands_over_preroll(self, stt, fake_vosk):
+        """Проверка передачи пре-ролла полному уровню после имени"""
+        full, wake = fake_vosk
+        wake.partials = {2: "айко"}
+
+        stt.get_phrase(b"\x01" * 8)
+        stt.get_phrase(b"\x02" * 8)
+
+        # Полная модель получила оба блока (вместе с самим именем)
+        assert full.fed == [b"\x01" * 8, b"\x02" * 8]
+        assert stt.get_partial() == "айко"
+
+        stt.get_phrase(b"\x03" * 8)
+        assert len(full.fed) == 3
+
+    def test_open_window_enables_full_tier(self, stt, fake_vosk):
+        """Проверка работы полного уровня при открытом окне активации"""
+        full, _ = fake_vosk
+        stt.window_probe = lambda: True
+
+        stt.get_phrase(b"\x00" * 8)
+
+        assert len(full.fed) == 1
+
+    def test_returns_to_wake_tier_after_phrase(self, stt, fake_vosk):
+        """Проверка возврата на легкий уровень после фразы"""
+        full, wake = fake_vosk
+        wake.partials = {1: "айко"}
+        full.finals = {2: "айко включи свет"}
+
+        stt.get_phrase(b"\x00" * 8)
+        assert stt.get_phrase(b"\x00" * 8) == "айко включи свет"
+
+        wake.partials = {}
+        stt.get_phrase(b"\x00" * 8)
+        assert len(full.fed) == 2
+
+
+@pytest.mark.unit
+class TestSTTPreload:
+    """Тесты фоновой загрузки и прогрева модели"""
+
+    def test_preload_reports_ready(self, fake_vosk):
+        """Проверка фоновой загрузки и сигнала готовности"""
+        states = []
+        stt = STTService("model")
+
+        stt.preload(on_state_change=states.append)
+
+        assert stt.ready.wait(timeout=2)
+        assert stt.state == "ready"
+        assert states == ["loading", "ready"]
+
+    def test_warm_up_decodes_silence(self, fake_vosk):
+        """Проверка прогрева на синтетической тишине"""
+        stt = STTService("model")
+        stt._init_rec()
+
+        rec = fake_vosk[0]
+        assert rec.resets == 1
+        assert rec.fed == []
+
+    def test_preload_error_state(self):
+        """Проверка состояния ошибки при отсутствии модели"""
+        states = []
+        stt = STTService("model")
+
+        with patch("core.stt.Model", side_effect=Exception("no model")):
+            stt.preload(on_state_change=states.append)
+            for _ in range(100):
+                if stt.state == "error":
+                    break
+                time.sleep(0.01)
+
+        assert stt.state == "error"
+        assert not stt.ready.is_set()
+
+    def test_failed_load_not_retried_per_block(self):
+        """Проверка что ошибка загрузки запоминается: без перезагрузки и уведомлений на каждом блоке"""
+        states = []
+        stt = STTService("model")
+        stt.on_state_change = states.append
+
+        with patch("core.stt.Model", side_effect=Exception("no model")) as model:
+            for _ in range(4):
+                assert stt.get_phrase(b"\x00" * 8) is None
+
+        assert model.call_count == 1
+        assert states == ["loading", "error"]
+        assert stt.load_error is not None
+
+    def test_retry_after_backoff(self, fake_vosk):
+        """Проверка повторной загрузки после паузы: без повторного 'loading' до успеха"""
+        states = []
+        stt = STTService("model")
+        stt.on_state_change = states.append
+
+        with patch("core.stt.Model", side_effect=Exception("no model")):
+            stt.get_phrase(b"\x00" * 8)
+        first_delay = stt._retry_delay
+
+        stt.retry_load()
+        stt.get_phrase(b"\x00" * 8)
+
+        assert first_delay == stt.retry_sec * 2
+        assert states == ["loading", "error", "ready"]
+        assert stt.load_error is None
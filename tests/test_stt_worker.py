@@ -0,0 +1,119 @@
+"""
+Тесты для STTWorker (стадия распознавания в отдельном потоке)
+"""
+import pytest
+import threading
+import time
+import numpy as np
+from unittest.mock import Mock
+from core.ring_buffer import AudioRingBuffer
+from core.stt_worker import STTWorker
+from utils.metrics import LatencyStats
+
+
+@pytest.mark.unit
+class TestSTTWorker:
+    """Тесты потока распознавания"""
+
+    @pytest.fixture
+    def audio_q(self):
+        return AudioRingBuffer(capacity=16000, max_read=4000)
+
+    @pytest.fixture
+    def vad(self):
+        vad = Mock()
+        vad.process = Mock(side_effect=lambda block: ([block], False))
+        vad.stats = Mock(return_value={})
+        return vad
+
+    @pytest.fixture
+    def stt(self):
+        stt = Mock()
+        stt.get_phrase = Mock(return_value="айко привет")
+        stt.flush = Mock(return_value=None)
+        stt.streaming = False
+        return stt
+
+    def _run_briefly(self, worker, seconds=0.3):
+        stop = threading.Event()
+        t = threading.Thread(target=worker.run, args=(stop,), daemon=True)
+        t.start()
+        time.sleep(seconds)
+        stop.set()
+        t.join(timeout=1)
+        assert not t.is_alive()
+
+    def test_phrase_emitted_to_queue(self, audio_q, vad, stt):
+        """Проверка что распознанная фраза попадает в очередь фраз"""
+        worker = STTWorker(audio_q, vad, stt)
+        audio_q.write(np.zeros(4000, dtype=np.int16))
+
+        self._run_briefly(worker)
+
+        text, is_final, captured_at, _ = worker.phrase_q.get_nowait()
+        assert text == "айко привет"
+        assert is_final is True
+        assert captured_at <= time.monotonic()
+        assert worker.decode_latency.count == 1
+
+    def test_segment_end_flushes_recognizer(self, audio_q, vad, stt):
+        """Проверка финализации фразы по концу сегмента VAD"""
+        vad.process = Mock(return_value=([], True))
+        stt.flush = Mock(return_value="финальная фраза")
+        worker = STTWorker(audio_q, vad, stt)
+        audio_q.write(np.zeros(4000, dtype=np.int16))
+
+        self._run_briefly(worker)
+
+        assert worker.phrase_q.get_nowait()[0] == "финальная фраза"
+        stt.get_phrase.assert_not_called()
+
+    def test_partial_results_emitted(self, audio_q, vad, stt):
+        """Проверка передачи промежуточных гипотез в потоковом режиме"""
+        stt.streaming = True
+        stt.get_phrase = Mock(return_value=None)
+        stt.get_partial = Mock(return_value="айко")
+        worker = STTWorker(audio_q, vad, stt)
+        audio_q.write(np.zeros(4000, dtype=np.int16))
+
+        self._run_briefly(worker)
+
+        text, is_final, _, _ = worker.phrase_q.get_nowait()
+        assert text == "айко"
+        assert is_final is False
+
+    def test_full_phrase_queue_drops(self, audio_q, vad, stt):
+        """Проверка что переполнение очереди фраз не блокирует поток"""
+        worker = STTWorker(audio_q, vad, stt, max_phrases=1)
+        for _ in range(3):
+            audio_q.write(np.zeros(4000, dtype=np.int16))
+
+        self._run_briefly(worker)
+
+        assert worker.phrase_q.qsize() == 1
+        assert worker.dropped_phrases == 2
+
+    def test_stats(self, audio_q, vad, stt):
+        """Проверка метрик стадии"""
+        worker = STTWorker(audio_q, vad, stt)
+        stats = worker.stats()
+
+        assert stats["queue_depth"] == 0
+        assert stats["decode"]["count"] == 0
+
+
+@pytest.mark.unit
+class TestLatencyStats:
+    """Тесты сборщика задержек"""
+
+    def test_snapshot(self):
+        """Проверка перцентилей и максимума"""
+        stats = LatencyStats()
+        for ms in range(1, 101):
+            stats.add(ms / 1000)
+
+        snap = stats.snapshot()
+        assert snap["count"] == 100
+        assert snap["max_ms"] == 100.0
+        assert 49 <= snap["p50_ms"] <= 51
+        assert 94 <= snap["p95_ms"] <= 96
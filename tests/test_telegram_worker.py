@@ -0,0 +1,304 @@
+"""
+Тесты воркера outbox Telegram (бот подменяется фейком)
+"""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from services.telegram.rate_limit import TokenBucket
+from services.telegram.worker import TelegramWorker
+
+
+class FakeBot:
+    """Имитация aiogram.Bot: запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text))
+
+
+def _cfg(overrides):
+    from utils.config_manager import aiko_cfg
+    original = aiko_cfg.get
+
+    def get(key, default=None):
+        return overrides[key] if key in overrides else original(key, default)
+
+    return patch.object(aiko_cfg, "get", side_effect=get)
+
+
+@pytest.fixture
+def worker_env(test_db):
+    """Воркер на тестовой БД с заданным chat_id"""
+    with patch("services.telegram.worker.db", test_db), \
+            _cfg({"telegram.chat_id": "42", "telegram.safety_poll_sec": 60}):
+        bot = FakeBot()
+        yield TelegramWorker(bot), bot, test_db
+
+
+async def _run_until(worker, predicate, timeout=2.0):
+    task = asyncio.create_task(worker.run())
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    worker.is_running = False
+    worker._wake.set()
+    await asyncio.wait_for(task, 1)
+
+
+@pytest.mark.unit
+class TestTelegramWorker:
+    """Тесты доставки outbox"""
+
+    def test_enqueue_wakes_worker(self, worker_env):
+        """Проверка что новое сообщение отправляется без ожидания опроса"""
+        worker, bot, db = worker_env
+
+        async def scenario():
+            async def enqueue_later():
+                await asyncio.sleep(0.1)
+                # Запись из другого потока, как из голосового ядра
+                t = threading.Thread(target=db.add_tg_message, args=("привет",))
+                t.start()
+                t.join()
+
+            started = time.monotonic()
+            asyncio.get_running_loop().create_task(enqueue_later())
+            await _run_until(worker, lambda: bot.sent)
+            return time.monotonic() - started
+
+        elapsed = asyncio.run(scenario())
+
+        assert bot.sent == [("42", "привет")]
+        assert elapsed < 1.0
+        assert db.get_pending_tg_messages() == []
+
+    def test_enqueue_to_send_latency_recorded(self, worker_env):
+        """Проверка замера задержки от постановки до отправки"""
+        worker, bot, db = worker_env
+        db.add_tg_message("раз")
+        db.add_tg_message("два")
+
+        asyncio.run(_run_until(worker, lambda: worker.send_latency.count == 2))
+
+        stats = worker.stats()["enqueue_to_send"]
+        assert stats["count"] == 2
+        assert stats["max_ms"] < 1000
+
+    def test_failed_send_releases_rest_of_batch(self, worker_env):
+        """Проверка что при ошибке отправленное подтверждается, а остаток возвращается"""
+        worker, bot, db = worker_env
+        for text in ("раз", "два", "три"):
+            db.add_tg_message(text)
+
+        calls = []
+
+        async def flaky_send(chat_id, text, parse_mode=None):
+            calls.append(text)
+            if text == "два":
+                raise ConnectionError("network down")
+
+        bot.send_message = flaky_send
+        worker.coalesce_priority = -1  # Каждое сообщение отдельно
+        worker.max_concurrency = 1
+        batch = db.claim_tg_batch()
+
+        ok = asyncio.run(worker._send_batch("42", batch))
+
+        assert ok is False
+        assert [row[1] for row in db.claim_tg_batch()] == ["два", "три"]
+
+    def test_backlog_coalesced_under_limit(self, worker_env):
+        """Проверка склейки бэклога в несколько сообщений не длиннее лимита"""
+        worker, bot, db = worker_env
+        old = "2020-01-01 10:00:00"
+        batch = [(i, "x" * 1000, 0, old, None) for i in range(10)]
+
+        units = worker._coalesce(batch)
+
+        assert [len(ids) for ids, _, _ in units] == [3, 3, 3, 1]
+        assert [m_id for ids, _, _ in units for m_id in ids] == list(range(10))
+        for _, text, _ in units:
+            assert len(text) <= TelegramWorker.MAX_MESSAGE_LEN
+            assert text.startswith(TelegramWorker.BACKLOG_HEADER)
+            assert text.count(old) == text.count("x" * 1000)
+
+    def test_priority_messages_sent_first_and_alone(self, worker_env):
+        """Проверка что важные сообщения уходят первыми и не склеиваются"""
+        worker, bot, db = worker_env
+        db.add_tg_message("фон 1")
+        db.add_tg_message("тревога", priority=2)
+        db.add_tg_message("фон 2")
+
+        asyncio.run(worker._send_batch("42", db.claim_tg_batch()))
+
+        assert [text for _, text in bot.sent] == ["тревога", "фон 1", "фон 2"]
+        assert db.get_pending_tg_messages() == []
+
+    def test_fresh_replies_not_coalesced(self, worker_env):
+        """Проверка что склеивается только бэклог, а свежие ответы уходят по одному"""
+        worker, bot, db = worker_env
+        old = "2020-01-01 10:00:00"
+        fresh = time.strftime("%Y-%m-%d %H:%M:%S")
+        batch = [(1, "старое 1", 0, old, None), (2, "старое 2", 0, old, None),
+                 (3, "ответ 1", 0, fresh, None), (4, "ответ 2", 0, fresh, None)]
+
+        units = worker._coalesce(batch)
+
+        assert [ids for ids, _, _ in units] == [[1, 2], [3], [4]]
+        assert [text for _, text, _ in units[1:]] == ["ответ 1", "ответ 2"]
+
+    def test_context_priority_mapped_to_outbox(self, worker_env):
+        """Проверка что priority из broadcast/reply задает приоритет outbox"""
+        from core.context import AikoContext
+        worker, bot, db = worker_env
+        ctx = AikoContext()
+        ctx.last_input_source = "tg"
+
+        with patch("core.context.db", db):
+            ctx.reply("обычный")
+            ctx.broadcast("внимание", ui=False, priority="WARNING")
+            ctx.reply("авария", priority="critical")
+
+        rows = db.claim_tg_batch()
+        assert [(row[1], row[2]) for row in rows] == [("авария", 2), ("⚠️ внимание", 1), ("обычный", 0)]
+
+    def test_chat_replies_delivered_in_order(self, worker_env):
+        """Проверка что в один чат сообщения уходят по одному и по порядку"""
+        worker, bot, db = worker_env
+        worker.chat_burst = 10
+        texts = [f"ответ {i}" for i in range(6)]
+        for text in texts:
+            db.add_tg_message(text, priority=1)
+        in_flight, peak = [], []
+
+        async def slow_send(chat_id, text, parse_mode=None):
+            in_flight.append(text)
+            peak.append(len(in_flight))
+            # Первые сообщения отвечают дольше: при параллельной отправке порядок бы сбился
+            await asyncio.sleep(0.05 if text.endswith(("0", "1")) else 0.001)
+            in_flight.remove(text)
+            bot.sent.append((chat_id, text))
+
+        bot.send_message = slow_send
+
+        asyncio.run(worker._send_batch("42", db.claim_tg_batch()))
+
+        assert [text for _, text in bot.sent] == texts
+        assert max(peak) == 1
+        assert worker.max_concurrency > 1
+
+    def test_lease_renewed_while_sending(self, worker_env):
+        """Проверка что долгая отправка пачки не отдает ее сообщения другому воркеру"""
+        worker, bot, db = worker_env
+        worker.lease_sec = 0.2
+        for text in ("раз", "два", "три"):
+            db.add_tg_message(text, priority=1)
+        stolen = []
+
+        async def slow_send(chat_id, text, parse_mode=None):
+            await asyncio.sleep(0.2)
+            stolen.extend(db.claim_tg_batch())
+            bot.sent.append((chat_id, text))
+
+        bot.send_message = slow_send
+
+        asyncio.run(worker._send_batch("42", db.claim_tg_batch(lease_sec=worker.lease_sec)))
+
+        assert stolen == []
+        assert [text for _, text in bot.sent] == ["раз", "два", "три"]
+
+    def test_retry_after_pauses_chat_without_backoff(self, worker_env):
+        """Проверка что 429 возвращает сообщение в очередь и выдерживает retry_after"""
+        worker, bot, db = worker_env
+        db.add_tg_message("раз")
+        attempts = []
+
+        async def limited_send(chat_id, text, parse_mode=None):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Flood control", 1)
+            bot.sent.append((chat_id, text))
+
+        bot.send_message = limited_send
+
+        asyncio.run(_run_until(worker, lambda: bot.sent, timeout=3))
+
+        assert bot.sent == [("42", "раз")]
+        assert attempts[1] - attempts[0] >= 0.95
+        assert worker.retry_delay == 5
+        assert worker.stats()["throttled"] == 1
+
+    def test_poison_message_does_not_block_queue(self, worker_env):
+        """Проверка что отклоненное Telegram сообщение откладывается, а остальные уходят"""
+        worker, bot, db = worker_env
+        db.add_tg_message("яд", priority=1)
+        db.add_tg_message("норма", priority=1)
+
+        async def picky_send(chat_id, text, parse_mode=None):
+            if text == "яд":
+                raise TelegramBadRequest(SendMessage(chat_id=chat_id, text=text), "Bad Request: message is too long")
+            bot.sent.append((chat_id, text))
+
+        bot.send_message = picky_send
+
+        ok = asyncio.run(worker._send_batch("42", db.claim_tg_batch()))
+
+        assert ok is True
+        assert bot.sent == [("42", "норма")]
+        assert db.claim_tg_batch() == []
+        assert worker.stats()["failed"] == 1
+
+    def test_broken_markdown_sent_as_plain_text(self, worker_env):
+        """Проверка повторной отправки без разметки при ошибке парсинга"""
+        worker, bot, db = worker_env
+        db.add_tg_message("snake_case")
+        modes = []
+
+        async def strict_send(chat_id, text, parse_mode=None):
+            modes.append(parse_mode)
+            if parse_mode:
+                raise TelegramBadRequest(SendMessage(chat_id=chat_id, text=text),
+                                         "Bad Request: can't parse entities")
+            bot.sent.append((chat_id, text))
+
+        bot.send_message = strict_send
+
+        asyncio.run(worker._send_batch("42", db.claim_tg_batch()))
+
+        assert modes == ["Markdown", None]
+        assert bot.sent == [("42", "snake_case")]
+
+
+@pytest.mark.unit
+class TestTokenBucket:
+    """Тесты ведра токенов"""
+
+    def test_rate_limited_after_burst(self):
+        """Проверка что после запаса токены выдаются с заданной частотой"""
+
+        async def scenario():
+            bucket = TokenBucket(rate=50, capacity=2)
+            started = time.monotonic()
+            for _ in range(7):
+                await bucket.acquire()
+            return time.monotonic() - started
+
+        assert asyncio.run(scenario()) >= 0.09
+
+    def test_pause_blocks_acquire(self):
+        """Проверка паузы по retry_after"""
+
+        async def scenario():
+            bucket = TokenBucket(rate=100, capacity=10)
+            bucket.pause(0.2)
+            started = time.monotonic()
+            await bucket.acquire()
+            return time.monotonic() - started
+
+        assert asyncio.run(scenario()) >= 0.19
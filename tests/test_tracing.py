@@ -0,0 +1,128 @@
+"""
+Тесты трассировки команд
+"""
+import json
+import pytest
+from unittest.mock import Mock
+from core.plugin_router import CommandRouter
+from utils.tracing import Tracer, tracer as global_tracer
+
+
+@pytest.fixture
+def enabled_tracer():
+    """Глобальный трейсер, включенный на время теста"""
+    global_tracer.enabled = True
+    global_tracer.finished.clear()
+    yield global_tracer
+    global_tracer.enabled = False
+    global_tracer.finished.clear()
+
+
+@pytest.mark.unit
+class TestTracer:
+    """Тесты трейсера"""
+
+    def test_disabled_is_noop(self):
+        """Проверка что выключенный трейсер ничего не создает"""
+        tracer = Tracer()
+        tracer.enabled = False
+
+        assert tracer.start("mic") is None
+        with tracer.activate(None):
+            with tracer.span("stt.decode") as span:
+                span.set(x=1)
+        tracer.finish(None)
+
+        assert len(tracer.finished) == 0
+
+    def test_spans_recorded(self):
+        """Проверка спанов и завершения трейса"""
+        tracer = Tracer()
+        tracer.enabled = True
+
+        trace = tracer.start("tg")
+        with tracer.activate(trace):
+            with tracer.span("nlu.predict", plugin="X"):
+                pass
+        tracer.finish(trace, executed=True)
+
+        data = tracer.recent()[0]
+        assert data["source"] == "tg"
+        assert data["executed"] is True
+        assert data["spans"][0]["name"] == "nlu.predict"
+        assert data["spans"][0]["plugin"] == "X"
+        assert data["total_ms"] >= data["spans"][0]["dur_ms"]
+
+    def test_span_outside_trace_ignored(self):
+        """Проверка что спан без текущего трейса не падает"""
+        tracer = Tracer()
+        tracer.enabled = True
+
+        with tracer.span("orphan"):
+            pass
+
+        assert tracer.current() is None
+
+    def test_buffer_bounded(self):
+        """Проверка ограничения буфера трейсов"""
+        tracer = Tracer()
+        tracer.enabled = True
+        tracer.finished = tracer.finished.__class__(maxlen=3)
+
+        for _ in range(5):
+            tracer.finish(tracer.start("mic"))
+
+        assert len(tracer.finished) == 3
+
+    def test_jsonl_export(self, temp_dir):
+        """Проверка записи трейсов в JSONL"""
+        tracer = Tracer()
+        tracer.enabled = True
+        tracer.jsonl_path = str(temp_dir / "traces.jsonl")
+
+        tracer.finish(tracer.start("mic"), text="айко привет")
+        tracer.finish(tracer.start("tg"))
+
+        lines = (temp_dir / "traces.jsonl").read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[0])["text"] == "айко привет"
+
+    def test_router_pipeline_spans(self, enabled_tracer, mock_ctx):
+        """Проверка спанов NLU, матчера и каждой попытки исполнения"""
+        rejecting = Mock()
+        rejecting.execute = Mock(return_value=False)
+        accepting = Mock()
+        accepting.execute = Mock(return_value=True)
+
+        nlu = Mock()
+        nlu.predict = Mock(return_value=rejecting)
+        router = CommandRouter(nlu, {"тест": [accepting]}, [])
+
+        trace = enabled_tracer.start("tg")
+        with enabled_tracer.activate(trace):
+            assert router.route("тест", mock_ctx) is True
+        enabled_tracer.finish(trace)
+
+        names = [s["name"] for s in trace.spans]
+        assert "matcher.extract" in names
+        executes = [s for s in trace.spans if s["name"] == "router.execute"]
+        assert [s["ok"] for s in executes] == [False, True]
+
+    def test_stt_worker_hands_trace_with_phrase(self, enabled_tracer):
+        """Проверка что трейс высказывания уходит вместе с финальной фразой"""
+        from core.stt_worker import STTWorker
+
+        vad = Mock()
+        vad.process = Mock(side_effect=lambda block: ([block], False))
+        stt = Mock()
+        stt.get_phrase = Mock(side_effect=[None, "айко привет"])
+        stt.streaming = False
+        worker = STTWorker(None, vad, stt)
+
+        worker.process(b"\x00" * 8)
+        worker.process(b"\x00" * 8)
+
+        _, _, _, trace = worker.phrase_q.get_nowait()
+        assert trace.source == "mic"
+        assert [s["name"] for s in trace.spans] == ["stt.decode", "stt.decode"]
+        assert worker._trace is None
@@ -0,0 +1,97 @@
+"""
+Тесты для VoiceActivityGate
+"""
+import pytest
+import numpy as np
+from core.vad import VoiceActivityGate
+
+
+def _silence(n=4000):
+    return np.zeros(n, dtype=np.int16)
+
+
+def _speech(n=4000, amp=6000):
+    # Тон 200 Гц: высокая энергия, низкий ZCR
+    t = np.arange(n) / 16000
+    return (amp * np.sin(2 * np.pi * 200 * t)).astype(np.int16)
+
+
+def _hiss(n=4000, amp=6000):
+    # Знакопеременный сигнал: громкий, но ZCR = 1
+    return (amp * np.where(np.arange(n) % 2, 1, -1)).astype(np.int16)
+
+
+@pytest.mark.unit
+class TestVoiceActivityGate:
+    """Тесты VAD-гейта перед распознавателем"""
+
+    @pytest.fixture
+    def gate(self):
+        gate = VoiceActivityGate(samplerate=16000)
+        gate.enabled = True
+        gate.energy_threshold = 300
+        gate.hangover_frames = 8000
+        gate.preroll_frames = 4000
+        return gate
+
+    def test_silence_is_skipped(self, gate):
+        """Проверка что тишина не уходит в распознаватель"""
+        chunks, ended = gate.process(memoryview(_silence()))
+
+        assert chunks == []
+        assert ended is False
+        assert gate.frames_skipped == 4000
+        assert gate.frames_passed == 0
+
+    def test_speech_passes_with_preroll(self, gate):
+        """Проверка пре-ролла перед началом речи"""
+        gate.process(memoryview(_silence()))
+        gate.process(memoryview(_silence()))
+
+        chunks, ended = gate.process(memoryview(_speech()))
+
+        # Один блок пре-ролла (4000 сэмплов) + сам речевой блок
+        assert len(chunks) == 2
+        assert isinstance(chunks[0], bytes)
+        assert ended is False
+        assert gate.frames_passed == 8000
+        assert gate.frames_skipped == 4000
+        assert gate.segments == 1
+
+    def test_hangover_and_segment_end(self, gate):
+        """Проверка хвоста тишины и сигнала конца сегмента"""
+        gate.process(memoryview(_speech()))
+
+        chunks, ended = gate.process(memoryview(_silence()))
+        assert len(chunks) == 1 and ended is False
+
+        chunks, ended = gate.process(memoryview(_silence()))
+        assert len(chunks) == 1 and ended is True
+
+        chunks, ended = gate.process(memoryview(_silence()))
+        assert chunks == [] and ended is False
+
+    def test_high_zcr_noise_rejected(self, gate):
+        """Проверка что шипение с высоким ZCR не считается речью"""
+        chunks, _ = gate.process(memoryview(_hiss()))
+        assert chunks == []
+
+    def test_disabled_gate_passes_everything(self, gate):
+        """Проверка выключенного гейта"""
+        gate.enabled = False
+        block = memoryview(_silence())
+
+        chunks, ended = gate.process(block)
+
+        assert chunks == [block]
+        assert ended is False
+
+    def test_stats(self, gate):
+        """Проверка статистики гейта"""
+        gate.process(memoryview(_silence()))
+        gate.process(memoryview(_silence()))
+        gate.process(memoryview(_silence()))
+
+        stats = gate.stats()
+        assert stats["skipped"] == 12000
+        assert stats["skip_ratio"] == 1.0
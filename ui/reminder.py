@@ -5,6 +5,7 @@ from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLineEdit,
                                QMainWindow, QWidget, QTableWidget, QTableWidgetItem,
                                QHeaderView, QApplication)
 from PySide6.QtCore import Qt, QDateTime
+from core.recurrence import rule_from_repeat
 from utils.db_manager import db
 from utils.logger import logger
 
@@ -92,18 +93,21 @@ class ReminderCreateDialog(QDialog):
             },
             "to_gui": True, "to_tg": False
         }
-        if db.add_task("reminder", data, data['time']):
+        # Повторение — правило на той же строке, планировщик сам переносит запуск
+        rule = rule_from_repeat(data["repeat"], data["time"])
+        if db.add_task("reminder", data, data['time'], rule=rule):
             logger.info(f"Reminders: Задача сохранена в БД: {data['text']}")
             self.accept()
 
 
 class AlarmWindow(QDialog):
-    def __init__(self, data, on_close_callback=None): # Добавлен аргумент
+    def __init__(self, data, on_close_callback=None, task_id=None): # Добавлен аргумент
         super().__init__()
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setFixedSize(400, 220)
         self.data = data
+        self.task_id = task_id
         self.on_close = on_close_callback # Сохраняем колбэк
 
         layout = QVBoxLayout(self)
@@ -148,7 +152,12 @@ class AlarmWindow(QDialog):
 
     def handle_snooze(self):
         new_time = QDateTime.currentDateTime().addSecs(self.spin_min.value() * 60).toString("yyyy-MM-dd HH:mm:ss")
-        if db.add_task("reminder", self.data, new_time):
+        # Откладываем ту же задачу; новая строка — только если id неизвестен
+        if self.task_id is not None:
+            snoozed = db.snooze_task(self.task_id, new_time)
+        else:
+            snoozed = db.add_task("reminder", self.data, new_time)
+        if snoozed:
             logger.info(f"Reminders: Отложено на {self.spin_min.value()} мин.")
         self.close_and_cleanup()
 
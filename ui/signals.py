@@ -4,4 +4,5 @@ class AikoSignals(QObject):
     # Только один аргумент типа object (туда мы положим dict)
     show_window = Signal(object)
     display_message = Signal(str, str, str)
-    audio_status_changed = Signal(bool, str)
\ No newline at end of file
+    audio_status_changed = Signal(bool, str)
+    stt_status_changed = Signal(str)
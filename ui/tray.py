@@ -44,4 +44,13 @@ class AikoTray(QSystemTrayIcon):
         p.setBrush(QColor(colors.get(status, "#555555")))
         p.drawEllipse(12, 12, 40, 40)
         p.end()
-        self.setIcon(QIcon(pixmap))
\ No newline at end of file
+        self.setIcon(QIcon(pixmap))
+
+    def update_stt_status(self, state):
+        labels = {
+            "idle": "ожидание",
+            "loading": "загрузка модели...",
+            "ready": "готова",
+            "error": "ошибка загрузки",
+        }
+        self.setToolTip(f"AiKo | Распознавание речи: {labels.get(state, state)}")
@@ -1,13 +1,16 @@
 import joblib
 import hashlib
 import re
+import numpy as np
 from pathlib import Path
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.svm import LinearSVC
 from sklearn.pipeline import Pipeline
 
+from utils.aho_corasick import TriggerAutomaton
 from utils.logger import logger
 from utils.config_manager import aiko_cfg
+from utils.tracing import tracer
 
 
 class IntentClassifier:
@@ -25,6 +28,8 @@ class IntentClassifier:
         
         # Уровень 1: Точные триггеры (быстро)
         self.trigger_map = {}  # {"напомни": PluginObject, ...}
+        # Все триггеры одним автоматом: поиск за один проход по фразе
+        self.trigger_automaton = TriggerAutomaton({})
         
         # Уровень 2: ML-модель (медленно, но умно)
         self.pipeline = None
@@ -61,6 +66,7 @@ class IntentClassifier:
                     self.trigger_map[clean_trigger] = plugin
                     logger.debug(f"NLU: Trigger '{clean_trigger}' → {plugin.__class__.__name__}")
 
+        self.trigger_automaton = TriggerAutomaton(self.trigger_map)
         logger.info(f"NLU: Зарегистрировано {len(self.trigger_map)} триггеров")
 
         # --- Уровень 2: ML на samples ---
@@ -114,6 +120,47 @@ class IntentClassifier:
         except Exception as e:
             logger.error(f"NLU: Критическая ошибка обучения ML: {e}", exc_info=True)
 
+    def _match_trigger(self, clean_text):
+        """Уровень 1: один проход автомата; побеждает самый длинный триггер, при равной длине — левее."""
+        match = self.trigger_automaton.longest_match(clean_text)
+        if match:
+            trigger, plugin = match
+            logger.debug(f"NLU: Keyword Match → {plugin.__class__.__name__} ('{trigger}')")
+            return plugin
+        return None
+
+    def _scores(self, clean_texts):
+        """
+        Уровень 2: матрица оценок SVM (фраза × класс) за один проход.
+        TF-IDF считается один раз на все фразы, интент — argmax по строке.
+        :return: (scores, classes) или None, если ML не обучена.
+        """
+        if not self.is_trained or self.pipeline is None:
+            return None
+
+        features = self.pipeline.named_steps['tfidf'].transform(clean_texts)
+        clf = self.pipeline.named_steps['clf']
+        scores = clf.decision_function(features)
+        if scores.ndim == 1:
+            # Два класса: одна оценка в пользу classes_[1], для classes_[0] она с обратным знаком
+            scores = np.column_stack([-scores, scores])
+        return scores, clf.classes_
+
+    def _pick(self, row, classes, clean_text):
+        """Плагин лучшего класса строки оценок с учетом порога уверенности."""
+        best = int(row.argmax())
+        score = row[best]
+        if score < self.confidence_threshold:
+            logger.debug(f"NLU: ML Low Confidence ({score:.2f} < {self.confidence_threshold}) для '{clean_text}'")
+            return None
+
+        intent_name = classes[best]
+        plugin = self.intent_to_plugin.get(intent_name)
+        if plugin:
+            logger.debug(f"NLU: ML Match → {intent_name} (Score: {score:.2f})")
+        return plugin
+
+    @tracer.traced("nlu.predict")
     def predict(self, text: str):
         """
         Предсказывает плагин для фразы:
@@ -127,44 +174,76 @@ class IntentClassifier:
         if not clean_text:
             return None
 
-        # --- Уровень 1: Проверка триггеров (O(1) поиск) ---
-        words = clean_text.split()
-        
-        # Проверяем первые 3 слова на совпадение с триггерами
-        for i in range(min(3, len(words)), 0, -1):
-            probe = " ".join(words[:i])
-            if probe in self.trigger_map:
-                plugin = self.trigger_map[probe]
-                logger.debug(f"NLU: Keyword Match → {plugin.__class__.__name__} ('{probe}')")
-                return plugin
-
-        # Проверяем вхождение триггера в любом месте фразы
-        for trigger, plugin in self.trigger_map.items():
-            if trigger in clean_text:
-                logger.debug(f"NLU: Keyword Partial → {plugin.__class__.__name__} ('{trigger}')")
-                return plugin
-
-        # --- Уровень 2: ML-модель ---
-        if not self.is_trained or self.pipeline is None:
-            logger.debug(f"NLU: ML не обучена, пропускаем '{clean_text}'")
-            return None
+        plugin = self._match_trigger(clean_text)
+        if plugin:
+            return plugin
 
         try:
-            decision = self.pipeline.decision_function([clean_text])
-            score = decision.max()
-
-            if score < self.confidence_threshold:
-                logger.debug(f"NLU: ML Low Confidence ({score:.2f} < {self.confidence_threshold}) для '{clean_text}'")
+            result = self._scores([clean_text])
+            if result is None:
+                logger.debug(f"NLU: ML не обучена, пропускаем '{clean_text}'")
                 return None
+            scores, classes = result
+            return self._pick(scores[0], classes, clean_text)
+
+        except Exception as e:
+            logger.error(f"NLU: Ошибка ML-классификации: {e}")
+            return None
+
+    def predict_topk(self, text: str, k: int = 3):
+        """
+        Ранжированные интенты ML-модели без порога и без триггеров
+        (для отладки и офлайн-оценки).
+        :return: [(intent_name, score), ...] по убыванию оценки.
+        """
+        clean_text = self._preprocess(text or "")
+        if not clean_text:
+            return []
+
+        try:
+            result = self._scores([clean_text])
+        except Exception as e:
+            logger.error(f"NLU: Ошибка ML-классификации: {e}")
+            return []
+        if result is None:
+            return []
 
-            intent_name = self.pipeline.predict([clean_text])[0]
-            plugin = self.intent_to_plugin.get(intent_name)
+        scores, classes = result
+        row = scores[0]
+        order = np.argsort(-row, kind="stable")[:k]
+        return [(classes[i], float(row[i])) for i in order]
 
+    def predict_batch(self, texts):
+        """
+        predict() для списка фраз: триггеры проверяются по каждой,
+        а оставшиеся идут в ML одним вызовом (одна матрица TF-IDF).
+        :return: список плагинов или None в порядке texts.
+        """
+        results = [None] * len(texts)
+        pending = []  # [(индекс, очищенный текст)] для ML
+
+        for i, text in enumerate(texts):
+            clean_text = self._preprocess(text) if text else ""
+            if not clean_text:
+                continue
+            plugin = self._match_trigger(clean_text)
             if plugin:
-                logger.debug(f"NLU: ML Match → {intent_name} (Score: {score:.2f})")
+                results[i] = plugin
+            else:
+                pending.append((i, clean_text))
 
-            return plugin
+        if not pending:
+            return results
 
+        try:
+            result = self._scores([clean for _, clean in pending])
         except Exception as e:
             logger.error(f"NLU: Ошибка ML-классификации: {e}")
-            return None
+            return results
+        if result is None:
+            return results
+
+        scores, classes = result
+        for (i, clean_text), row in zip(pending, scores):
+            results[i] = self._pick(row, classes, clean_text)
+        return results
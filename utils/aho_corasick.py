@@ -0,0 +1,80 @@
+from collections import deque
+
+
+class TriggerAutomaton:
+    """
+    Автомат Ахо–Корасик по набору триггеров: все вхождения во фразу
+    находятся за один проход, независимо от числа триггеров.
+    Строится один раз (при обучении NLU), поиск не аллоцирует ничего, кроме результата.
+
+    Приоритет совпадения детерминирован: самый длинный триггер,
+    при равной длине — стоящий левее во фразе.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out", "_values", "size")
+
+    def __init__(self, patterns):
+        """:param patterns: {триггер: значение}; пустые строки игнорируются."""
+        self._goto = [{}]    # узел -> {символ: узел}
+        self._fail = [0]
+        self._out = [None]   # узел -> длина самого длинного триггера, оканчивающегося здесь
+        self._values = {}    # триггер -> значение
+        self.size = 0
+
+        for pattern, value in patterns.items():
+            if pattern:
+                self._add(pattern)
+                self._values[pattern] = value
+                self.size += 1
+        self._link()
+
+    def _add(self, pattern):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+            node = nxt
+        self._out[node] = len(pattern)
+
+    def _link(self):
+        """Суффиксные ссылки обходом в ширину; выход узла — самый длинный из своего и по ссылке."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                link = self._goto[fail].get(ch, 0)
+                self._fail[child] = link if link != child else 0
+                if self._out[child] is None:
+                    self._out[child] = self._out[self._fail[child]]
+
+    def longest_match(self, text):
+        """:return: (триггер, значение) лучшего совпадения или None."""
+        best_len, best_start = 0, 0
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            length = out[node]
+            # Строго длиннее: при равной длине остается найденный раньше (левее)
+            if length and length > best_len:
+                best_len, best_start = length, i - length + 1
+
+        if not best_len:
+            return None
+        trigger = text[best_start:best_start + best_len]
+        return trigger, self._values[trigger]
+
+    def __len__(self):
+        return self.size
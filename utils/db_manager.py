@@ -1,8 +1,13 @@
+import atexit
 import sqlite3
 import json
 import os
 import shutil
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
+from utils.config_manager import aiko_cfg
+from utils.kv_cache import KVCache, MISSING, NOT_CACHED
 from utils.logger import logger
 
 
@@ -11,13 +16,62 @@ class DBManager:
     Отказоустойчивое хранилище данных.
     Реализует паттерны: Integrity Guard (контроль целостности) и
     Outbox (очередь сообщений для внешних сервисов).
+
+    Соединения постоянные, по одному на поток: PRAGMA применяются один раз
+    при открытии, а не на каждом запросе.
+
+    Write-behind (db.write_behind): записи outbox, KV и статусов планировщика
+    копятся в памяти и коммитятся одной транзакцией раз в flush_interval_ms
+    или по flush_max_items. durability="critical" пишет сразу.
+
+    kv_store читается через LRU/TTL-кэш (write-through на set_val/set_many).
     """
 
+    BUFFERED = "buffered"
+    CRITICAL = "critical"
+
     def __init__(self, db_path="aiko_data.db"):
         self.db_path = db_path
         self.is_functional = False
         self.was_recovered = False
         self.on_error_callback = None
+        # Уведомление о новом сообщении в outbox (воркер Telegram просыпается сразу)
+        self.on_tg_message_added = None
+        # Уведомление об изменении расписания: (task_id, exec_at) или (task_id, None) при удалении
+        self.on_task_changed = None
+
+        # --- Пул соединений (thread-local) ---
+        self._local = threading.local()
+        self._conn_lock = threading.Lock()
+        self._connections = {}  # thread -> connection
+        self._generation = 0    # растет при close(): старые соединения потоков открываются заново
+        self._opened = 0
+        self._reused = 0
+
+        # --- Write-behind ---
+        self.write_behind = aiko_cfg.get("db.write_behind", False)
+        self.flush_interval = aiko_cfg.get("db.flush_interval_ms", 200) / 1000
+        self.flush_max_items = aiko_cfg.get("db.flush_max_items", 64)
+        self._pending = []       # [(sql, params), ...] в порядке поступления
+        self._pending_kv = {}    # key -> json: чтение своих же несброшенных записей
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._flusher = None
+        self._batches = 0
+        self._batched_items = 0
+        self._max_batch = 0
+        if self.write_behind:
+            # Поток сброса — демон: последняя пачка дописывается при выходе интерпретатора
+            atexit.register(self.flush)
+
+        # --- Кэш kv_store ---
+        self.kv_cache = KVCache(
+            max_items=aiko_cfg.get("db.kv_cache_items", 1024),
+            max_bytes=int(aiko_cfg.get("db.kv_cache_mb", 4) * 1024 * 1024),
+            ttl=aiko_cfg.get("db.kv_cache_ttl", 300)
+        )
+
         self._init_db()
 
     def _init_db(self):
@@ -48,6 +102,9 @@ class DBManager:
 
     def _handle_corruption(self):
         """Изоляция поврежденного файла и горячая замена (AK-SYS-02)."""
+        # Открытые соединения смотрят на старый файл
+        self.close()
+        self.kv_cache.invalidate()
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = f"{self.db_path}.corrupt_{timestamp}"
         try:
@@ -64,11 +121,8 @@ class DBManager:
 
     def _create_tables(self):
         """Создание схемы данных с индексами."""
-        with sqlite3.connect(self.db_path) as conn:
-            # Настройка режима для КАЖДОГО нового подключения или создания
-            conn.execute("PRAGMA journal_mode=WAL")
-            conn.execute("PRAGMA synchronous=NORMAL")  # Оптимально для WAL
-
+        # PRAGMA (WAL и пр.) выставляются при открытии соединения
+        with self._conn() as conn:
             # Планировщик задач + ИНДЕКС
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS scheduler (
@@ -79,7 +133,14 @@ class DBManager:
                     status TEXT DEFAULT 'pending'
                 )
             """)
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_sch_pending ON scheduler(status, exec_at)")
+            # Миграция: правило повторения (одна строка на повторяющуюся задачу)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(scheduler)")]
+            if "rule" not in columns:
+                conn.execute("ALTER TABLE scheduler ADD COLUMN rule TEXT")
+            # Частичный индекс только по ожидающим задачам: выполненная история
+            # (сотни тысяч строк) не раздувает поиск наступивших
+            conn.execute("DROP INDEX IF EXISTS idx_sch_pending")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sch_due ON scheduler(exec_at) WHERE status = 'pending'")
 
             # KV Store
             conn.execute("""
@@ -100,8 +161,189 @@ class DBManager:
                 )
             """)
             conn.execute("CREATE INDEX IF NOT EXISTS idx_tg_pending ON tg_outbox(status, priority DESC)")
+
+            # Миграция: точное время постановки в очередь (для замера задержки доставки)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(tg_outbox)")]
+            if "enqueued_at" not in columns:
+                conn.execute("ALTER TABLE tg_outbox ADD COLUMN enqueued_at REAL")
+            # ... и аренда захваченных воркером сообщений (status='sending')
+            if "lease_until" not in columns:
+                conn.execute("ALTER TABLE tg_outbox ADD COLUMN lease_until REAL")
             conn.commit()
 
+    # --- CONNECTIONS ---
+
+    def _open_connection(self):
+        # check_same_thread=False только ради close() из потока shutdown;
+        # запросы идут строго из потока-владельца
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # Оптимально для WAL
+        conn.execute(f"PRAGMA cache_size=-{int(aiko_cfg.get('db.cache_size_kb', 8192))}")
+        conn.execute(f"PRAGMA mmap_size={int(aiko_cfg.get('db.mmap_size_mb', 64)) * 1024 * 1024}")
+        return conn
+
+    def _conn(self):
+        """Постоянное соединение текущего потока (открывается при первом обращении)."""
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is not None and local.generation == self._generation:
+            self._reused += 1
+            return conn
+
+        conn = self._open_connection()
+        thread = threading.current_thread()
+        with self._conn_lock:
+            self._prune_dead_threads()
+            self._connections[thread] = conn
+            self._opened += 1
+        local.conn, local.generation = conn, self._generation
+        return conn
+
+    def _prune_dead_threads(self):
+        """Закрывает соединения завершившихся потоков (вызывается под _conn_lock)."""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            try:
+                self._connections.pop(thread).close()
+            except sqlite3.Error:
+                pass
+
+    def close(self):
+        """
+        Сбрасывает отложенные записи и закрывает все открытые соединения (штатное завершение).
+        Последующие обращения потоков откроют соединения заново.
+        """
+        try:
+            self.flush()
+        except Exception as e:
+            self._report_runtime_error(e)
+
+        with self._conn_lock:
+            self._generation += 1
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    logger.debug(f"DB: Ошибка закрытия соединения: {e}")
+            closed = len(self._connections)
+            self._connections.clear()
+        logger.info(f"DB: Закрыто соединений: {closed}. {self.connection_stats()}")
+
+    def connection_stats(self) -> dict:
+        """Статистика переиспользования соединений."""
+        total = self._opened + self._reused
+        return {
+            "open": len(self._connections),
+            "opened": self._opened,
+            "reused": self._reused,
+            "reuse_ratio": round(self._reused / total, 3) if total else 0.0,
+        }
+
+    # --- WRITE-BEHIND ---
+
+    def _write(self, sql, params, durability=None):
+        """
+        Запись с выбранной гарантией: в буфер (сброс фоновым потоком) или сразу.
+        Немедленная запись сначала сбрасывает буфер, чтобы не нарушить порядок.
+        """
+        if not self.write_behind or durability == self.CRITICAL:
+            self._write_through([(sql, params)])
+            return
+
+        self._enqueue([(sql, params)])
+
+    def _write_through(self, statements):
+        """
+        Немедленная запись одной транзакцией после сброса буфера. _flush_lock держится
+        на оба шага: пачку, которую другой поток уже забрал из буфера, но еще не записал, не обогнать.
+        """
+        with self._flush_lock:
+            self._flush_locked()
+            with self._conn() as conn:
+                for sql, params in statements:
+                    conn.execute(sql, params)
+
+    def _enqueue(self, statements):
+        """Ставит запросы в буфер write-behind одним захватом блокировки (сброс не разрежет пачку)."""
+        with self._pending_lock:
+            self._pending.extend(statements)
+            full = len(self._pending) >= self.flush_max_items
+
+        self._ensure_flusher()
+        if full:
+            self._flush_event.set()
+
+    def _ensure_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            with self._pending_lock:
+                if self._flusher is None or not self._flusher.is_alive():
+                    self._flusher = threading.Thread(target=self._flush_loop, name="DB-Flush", daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self._report_runtime_error(e)
+
+    def flush(self):
+        """Сбрасывает накопленные записи одной транзакцией."""
+        if not self._pending:
+            return
+
+        with self._flush_lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        """Сброс буфера; вызывающий уже держит _flush_lock."""
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+            kv_snapshot = dict(self._pending_kv)
+        if not batch:
+            return
+
+        try:
+            with self._conn() as conn:
+                for sql, params in batch:
+                    conn.execute(sql, params)
+            written = True
+        except sqlite3.OperationalError as e:
+            # База занята/заблокирована: вернем пачку в начало очереди до следующего сброса
+            with self._pending_lock:
+                self._pending[:0] = batch
+            logger.warning(f"DB: Отложенная запись не удалась, повтор позже: {e}")
+            return
+        except Exception as e:
+            # Пачка потеряна: ни оверлей KV, ни кэш не должны показывать то, чего нет в базе
+            self._report_runtime_error(e)
+            for key in kv_snapshot:
+                self.kv_cache.invalidate(key)
+            written = False
+
+        with self._pending_lock:
+            # Убираем из оверлея только то, что не перезаписали за время сброса
+            for key, value in kv_snapshot.items():
+                if self._pending_kv.get(key) is value:
+                    del self._pending_kv[key]
+
+        if written:
+            self._batches += 1
+            self._batched_items += len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+
+    def write_stats(self) -> dict:
+        """Статистика отложенной записи."""
+        return {
+            "write_behind": self.write_behind,
+            "pending": len(self._pending),
+            "batches": self._batches,
+            "items": self._batched_items,
+            "max_batch": self._max_batch,
+        }
+
     # --- SHARED HELPERS ---
 
     def _report_runtime_error(self, error):
@@ -113,29 +355,66 @@ class DBManager:
     def _to_json(self, data):
         return json.dumps(data, ensure_ascii=False) if isinstance(data, (dict, list)) else data
 
+    def _kv_raw(self, value):
+        """Значение KV в том виде, в каком его вернет SQLite (bool хранится как 0/1)."""
+        raw = self._to_json(value)
+        return int(raw) if isinstance(raw, bool) else raw
+
+    def _cache_written(self, key, raw):
+        """Кэширует записанное значение; NULL в базе — это значение None, а не отсутствие ключа."""
+        self.kv_cache.put(key, raw, None if raw is None else MISSING)
+
     # --- SCHEDULER ---
 
-    def add_task(self, task_type, payload, exec_at):
+    def add_task(self, task_type, payload, exec_at, rule=None):
+        """rule — правило повторения (core.recurrence), None для разовой задачи."""
         if not self.is_functional: return False
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(
-                    "INSERT INTO scheduler (type, payload, exec_at) VALUES (?, ?, ?)",
-                    (task_type, self._to_json(payload), exec_at)
+            with self._conn() as conn:
+                cur = conn.execute(
+                    "INSERT INTO scheduler (type, payload, exec_at, rule) VALUES (?, ?, ?, ?)",
+                    (task_type, self._to_json(payload), exec_at, self._to_json(rule) if rule else None)
                 )
+            self._notify_task_changed(cur.lastrowid, exec_at)
             return True
         except Exception as e:
             self._report_runtime_error(e);
             return False
 
-    def get_pending_tasks(self):
+    def _notify_task_changed(self, task_id, exec_at):
+        if self.on_task_changed:
+            try:
+                self.on_task_changed(task_id, exec_at)
+            except Exception as e:
+                logger.debug(f"DB: Ошибка уведомления планировщика: {e}")
+
+    def get_upcoming_tasks(self):
+        """Все ожидающие задачи [(id, exec_at), ...] — для расписания планировщика в памяти."""
+        if not self.is_functional: return []
+        try:
+            self.flush()
+            return self._conn().execute(
+                "SELECT id, exec_at FROM scheduler WHERE status = 'pending'"
+            ).fetchall()
+        except Exception as e:
+            self._report_runtime_error(e);
+            return []
+
+    def get_pending_tasks(self, with_schedule=False):
+        """
+        Наступившие задачи: [(id, type, payload), ...];
+        with_schedule — еще правило повторения и exec_at: (id, type, payload, rule, exec_at).
+        """
         if not self.is_functional: return []
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         try:
-            with sqlite3.connect(self.db_path, timeout=10) as conn:
+            # Несброшенные статусы не должны вернуть уже выполненную задачу
+            self.flush()
+            with self._conn() as conn:
                 cursor = conn.cursor()
+                columns = "id, type, payload, rule, exec_at" if with_schedule else "id, type, payload"
                 cursor.execute(
-                    "SELECT id, type, payload FROM scheduler WHERE exec_at <= ? AND status = 'pending'",
+                    f"SELECT {columns} FROM scheduler WHERE status = 'pending' AND exec_at <= ?",
                     (now,)
                 )
                 return cursor.fetchall()
@@ -143,84 +422,374 @@ class DBManager:
             self._report_runtime_error(e);
             return []
 
-    def update_task_status(self, task_id, status='done'):
+    def update_task_status(self, task_id, status='done', durability=None):
         if not self.is_functional: return
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("UPDATE scheduler SET status = ? WHERE id = ?", (status, task_id))
+            self._write("UPDATE scheduler SET status = ? WHERE id = ?", (status, task_id), durability)
         except Exception as e:
             self._report_runtime_error(e)
 
+    @staticmethod
+    def _status_statements(task_ids, status):
+        ids = list(task_ids)
+        return [
+            (f"UPDATE scheduler SET status = ? WHERE id IN ({','.join('?' * len(chunk))})", (status, *chunk))
+            for chunk in (ids[i:i + 500] for i in range(0, len(ids), 500))
+        ]
+
+    def _write_many(self, statements, durability=None):
+        """Несколько запросов одной транзакцией (в write-behind — одним сбросом)."""
+        if self.write_behind and durability != self.CRITICAL:
+            self._enqueue(list(statements))
+            return
+
+        self._write_through(statements)
+
+    def update_tasks_status(self, task_ids, status='done', durability=None):
+        """Статус пачки задач одной транзакцией."""
+        if not self.is_functional or not task_ids: return
+        try:
+            self._write_many(self._status_statements(task_ids, status), durability)
+        except Exception as e:
+            self._report_runtime_error(e)
+
+    def finish_tasks(self, done_ids, rescheduled=(), durability=None):
+        """
+        Итог пачки сработавших задач одной транзакцией: разовые закрываются,
+        повторяющиеся переносятся на следующий запуск в той же строке.
+        :param rescheduled: [(task_id, next_exec_at), ...]
+        """
+        if not self.is_functional or not (done_ids or rescheduled): return
+        statements = self._status_statements(done_ids, 'done') if done_ids else []
+        statements += [
+            ("UPDATE scheduler SET exec_at = ?, status = 'pending' WHERE id = ?", (exec_at, t_id))
+            for t_id, exec_at in rescheduled
+        ]
+        try:
+            self._write_many(statements, durability)
+        except Exception as e:
+            self._report_runtime_error(e)
+            return
+        for t_id, exec_at in rescheduled:
+            self._notify_task_changed(t_id, exec_at)
+
+    def snooze_task(self, task_id, exec_at):
+        """
+        Откладывает задачу без новой строки. Разовая снова ждет запуска в exec_at;
+        у повторяющейся просто приближается ближайший запуск (дальше — по правилу).
+        """
+        if not self.is_functional: return False
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    "UPDATE scheduler SET status = 'pending', "
+                    "exec_at = CASE WHEN rule IS NULL OR exec_at > ? THEN ? ELSE exec_at END "
+                    "WHERE id = ?",
+                    (exec_at, exec_at, task_id)
+                )
+            self._notify_task_changed(task_id, exec_at)
+            return True
+        except Exception as e:
+            self._report_runtime_error(e);
+            return False
+
+    def get_all_scheduler_tasks(self):
+        """Ожидающие задачи для менеджера напоминаний: [(id, payload, exec_at, rule), ...]."""
+        if not self.is_functional: return []
+        try:
+            self.flush()
+            return self._conn().execute(
+                "SELECT id, payload, exec_at, rule FROM scheduler WHERE status = 'pending' ORDER BY exec_at"
+            ).fetchall()
+        except Exception as e:
+            self._report_runtime_error(e);
+            return []
+
+    def compact_scheduler(self, retention_days=30) -> int:
+        """Удаляет выполненные задачи старше retention_days. :return: число удаленных строк."""
+        if not self.is_functional: return 0
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            self.flush()
+            with self._conn() as conn:
+                deleted = conn.execute(
+                    "DELETE FROM scheduler WHERE status = 'done' AND exec_at < ?", (cutoff,)
+                ).rowcount
+            if deleted:
+                logger.info(f"DB: Удалено выполненных задач планировщика: {deleted}")
+            return deleted
+        except Exception as e:
+            self._report_runtime_error(e);
+            return 0
+
     # --- KV STORE ---
 
-    def set_val(self, key, value):
+    def set_val(self, key, value, durability=None):
         if not self.is_functional: return
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("INSERT OR REPLACE INTO kv_store (key, value) VALUES (?, ?)",
-                             (key, self._to_json(value)))
+            raw = self._kv_raw(value)
+            if self.write_behind and durability != self.CRITICAL:
+                with self._pending_lock:
+                    self._pending_kv[key] = raw
+            self._write("INSERT OR REPLACE INTO kv_store (key, value) VALUES (?, ?)", (key, raw), durability)
+            self._cache_written(key, raw)
+        except Exception as e:
+            self.kv_cache.invalidate(key)
+            self._report_runtime_error(e)
+
+    def set_many(self, items: dict, durability=None):
+        """Пакетная запись KV одной транзакцией (или одной пачкой write-behind)."""
+        if not self.is_functional or not items: return
+        rows = [(key, self._kv_raw(value)) for key, value in items.items()]
+        statements = [("INSERT OR REPLACE INTO kv_store (key, value) VALUES (?, ?)", row) for row in rows]
+        try:
+            if self.write_behind and durability != self.CRITICAL:
+                with self._pending_lock:
+                    self._pending_kv.update(rows)
+                self._enqueue(statements)
+            else:
+                self._write_through(statements)
+
+            for key, raw in rows:
+                self._cache_written(key, raw)
         except Exception as e:
+            for key, _ in rows:
+                self.kv_cache.invalidate(key)
             self._report_runtime_error(e)
 
     def get_val(self, key, default=None):
         if not self.is_functional: return default
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                row = conn.execute("SELECT value FROM kv_store WHERE key = ?", (key,)).fetchone()
-                if not row: return default
 
+        cached = self.kv_cache.get(key)
+        if cached is not NOT_CACHED:
+            return default if cached is MISSING else cached
+
+        try:
+            if key in self._pending_kv:
+                raw_val = self._pending_kv.get(key)
+            else:
+                with self._conn() as conn:
+                    row = conn.execute("SELECT value FROM kv_store WHERE key = ?", (key,)).fetchone()
+                if not row:
+                    self.kv_cache.put(key, None)
+                    return default
                 raw_val = row[0]
-                try:
-                    return json.loads(raw_val)
-                except (json.JSONDecodeError, TypeError):
-                    return raw_val  # Если не JSON, возвращаем как есть
+
+            value = KVCache.decode(raw_val)
+            self.kv_cache.put(key, raw_val, value)
+            return KVCache.decode(raw_val) if isinstance(value, (dict, list)) else value
         except Exception as e:
             logger.error(f"DB KV Read error: {e}")
             return default
 
+    def get_many(self, keys, default=None) -> dict:
+        """Пакетное чтение KV: промахи кэша добираются одним запросом."""
+        result, missing = {}, []
+        if not self.is_functional:
+            return {key: default for key in keys}
+
+        for key in keys:
+            cached = self.kv_cache.get(key)
+            if cached is NOT_CACHED:
+                missing.append(key)
+            else:
+                result[key] = default if cached is MISSING else cached
+
+        try:
+            found = {key: self._pending_kv[key] for key in missing if key in self._pending_kv}
+            to_query = [key for key in missing if key not in found]
+
+            # Лимит переменных SQLite: запрашиваем частями
+            with self._conn() as conn:
+                for i in range(0, len(to_query), 500):
+                    chunk = to_query[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    found.update(conn.execute(
+                        f"SELECT key, value FROM kv_store WHERE key IN ({placeholders})", chunk
+                    ).fetchall())
+
+            for key in missing:
+                if key in found:
+                    value = KVCache.decode(found[key])
+                    self.kv_cache.put(key, found[key], value)
+                    result[key] = KVCache.decode(found[key]) if isinstance(value, (dict, list)) else value
+                else:
+                    self.kv_cache.put(key, None)
+                    result[key] = default
+        except Exception as e:
+            logger.error(f"DB KV Read error: {e}")
+            for key in missing:
+                result.setdefault(key, default)
+
+        return result
+
     # --- TELEGRAM OUTBOX ---
 
-    def add_tg_message(self, text, priority=0):
+    def add_tg_message(self, text, priority=0, durability=None):
         if not self.is_functional: return False
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute(
-                    "INSERT INTO tg_outbox (message, priority, created_at) VALUES (?, ?, ?)",
-                    (text, priority, now)
-                )
+            self._write(
+                "INSERT INTO tg_outbox (message, priority, created_at, enqueued_at) VALUES (?, ?, ?, ?)",
+                (text, priority, now, time.time()),
+                durability
+            )
+            self._notify_tg_message_added()
             return True
         except Exception as e:
             logger.error(f"DB Outbox Error: {e}");
             return False
 
-    def get_pending_tg_messages(self):
+    def _notify_tg_message_added(self):
+        if self.on_tg_message_added:
+            try:
+                self.on_tg_message_added()
+            except Exception as e:
+                logger.debug(f"DB: Ошибка уведомления outbox: {e}")
+
+    def get_pending_tg_messages(self, with_enqueued=False):
+        """
+        :return: [(id, message, created_at), ...] или, с with_enqueued,
+                 [(id, message, created_at, enqueued_at), ...].
+        """
         if not self.is_functional: return []
+        columns = "id, message, created_at, enqueued_at" if with_enqueued else "id, message, created_at"
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            # Отметки об отправке из буфера должны быть видны, иначе будет повтор
+            self.flush()
+            with self._conn() as conn:
                 return conn.execute(
-                    "SELECT id, message, created_at FROM tg_outbox WHERE status = 'pending' ORDER BY id ASC"
+                    f"SELECT {columns} FROM tg_outbox WHERE status = 'pending' ORDER BY id ASC"
                 ).fetchall()
         except Exception as e:
             logger.error(f"DB: Error reading TG queue: {e}");
             return []
 
-    def mark_tg_sent(self, msg_id):
+    def claim_tg_batch(self, limit=20, lease_sec=60):
+        """
+        Захватывает пачку сообщений одной транзакцией: status='sending' + срок аренды.
+        Сначала возвращает в очередь сообщения с истекшей арендой (воркер упал до ack).
+        Порядок: сначала высокий priority, внутри — по времени постановки.
+        :return: [(id, message, priority, created_at, enqueued_at), ...]
+        """
+        if not self.is_functional: return []
+        now = time.time()
+        try:
+            self.flush()
+            conn = self._conn()
+            with conn:
+                # IMMEDIATE: два воркера не захватят одни и те же строки
+                conn.execute("BEGIN IMMEDIATE")
+                self._requeue_expired(conn, now)
+                rows = conn.execute(
+                    "SELECT id, message, priority, created_at, enqueued_at FROM tg_outbox "
+                    "WHERE status = 'pending' ORDER BY priority DESC, id ASC LIMIT ?",
+                    (limit,)
+                ).fetchall()
+                if rows:
+                    ids = [row[0] for row in rows]
+                    conn.execute(
+                        f"UPDATE tg_outbox SET status = 'sending', lease_until = ? "
+                        f"WHERE id IN ({','.join('?' * len(ids))})",
+                        (now + lease_sec, *ids)
+                    )
+            return rows
+        except Exception as e:
+            logger.error(f"DB: Error claiming TG batch: {e}")
+            return []
+
+    @staticmethod
+    def _requeue_expired(conn, now):
+        cur = conn.execute(
+            "UPDATE tg_outbox SET status = 'pending', lease_until = NULL "
+            "WHERE status = 'sending' AND lease_until < ?",
+            (now,)
+        )
+        if cur.rowcount:
+            logger.warning(f"DB: Возвращено в очередь сообщений с истекшей арендой: {cur.rowcount}")
+        return cur.rowcount
+
+    def requeue_expired_tg_leases(self) -> int:
+        """Возвращает в очередь сообщения, аренда которых истекла."""
+        if not self.is_functional: return 0
+        try:
+            with self._conn() as conn:
+                return self._requeue_expired(conn, time.time())
+        except Exception as e:
+            logger.error(f"DB: Lease requeue error: {e}")
+            return 0
+
+    def extend_tg_lease(self, msg_ids, lease_sec=60) -> int:
+        """Продлевает аренду захваченных сообщений, пока пачка отправляется. :return: число продленных."""
+        if not self.is_functional or not msg_ids: return 0
+        try:
+            with self._conn() as conn:
+                return conn.execute(
+                    f"UPDATE tg_outbox SET lease_until = ? "
+                    f"WHERE id IN ({','.join('?' * len(msg_ids))}) AND status = 'sending'",
+                    (time.time() + lease_sec, *msg_ids)
+                ).rowcount
+        except Exception as e:
+            logger.error(f"DB: Lease extend error: {e}")
+            return 0
+
+    def ack_tg_batch(self, msg_ids, durability=CRITICAL):
+        """Подтверждает отправку пачки одним запросом (по умолчанию сразу, чтобы не было повторов)."""
+        if not self.is_functional or not msg_ids: return
+        try:
+            self._write(
+                f"DELETE FROM tg_outbox WHERE id IN ({','.join('?' * len(msg_ids))})",
+                tuple(msg_ids),
+                durability
+            )
+        except Exception as e:
+            logger.error(f"DB: Batch ack error: {e}")
+
+    def release_tg_batch(self, msg_ids):
+        """Досрочно возвращает захваченные, но не отправленные сообщения в очередь."""
+        if not self.is_functional or not msg_ids: return
+        try:
+            self._write(
+                f"UPDATE tg_outbox SET status = 'pending', lease_until = NULL "
+                f"WHERE id IN ({','.join('?' * len(msg_ids))}) AND status = 'sending'",
+                tuple(msg_ids),
+                self.CRITICAL
+            )
+        except Exception as e:
+            logger.error(f"DB: Batch release error: {e}")
+
+    def fail_tg_batch(self, msg_ids):
+        """
+        Откладывает сообщения, которые Telegram не примет никогда (status='failed'):
+        они остаются в базе для разбора, но больше не захватываются воркером.
+        """
+        if not self.is_functional or not msg_ids: return
+        try:
+            self._write(
+                f"UPDATE tg_outbox SET status = 'failed', lease_until = NULL "
+                f"WHERE id IN ({','.join('?' * len(msg_ids))})",
+                tuple(msg_ids),
+                self.CRITICAL
+            )
+        except Exception as e:
+            logger.error(f"DB: Batch fail mark error: {e}")
+
+    def mark_tg_sent(self, msg_id, durability=None):
         """Удаляет сообщение или переводит в архив (Status Change)."""
         if not self.is_functional: return
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                # В твоей версии удаление — это ок для экономии места,
-                # но для отладки лучше сменить статус
-                conn.execute("DELETE FROM tg_outbox WHERE id = ?", (msg_id,))
+            # В твоей версии удаление — это ок для экономии места,
+            # но для отладки лучше сменить статус
+            self._write("DELETE FROM tg_outbox WHERE id = ?", (msg_id,), durability)
         except Exception as e:
             logger.error(f"DB: Sent mark error: {e}")
 
     def delete_task(self, task_id):
         if not self.is_functional: return False
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn() as conn:
                 conn.execute("DELETE FROM scheduler WHERE id = ?", (task_id,))
+            self._notify_task_changed(task_id, None)
             return True
         except Exception as e:
             self._report_runtime_error(e);
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Отметка отсутствующего ключа (кэшируются и промахи, чтобы не ходить в базу повторно)
+MISSING = object()
+# Результат get() при промахе кэша: None — законное закэшированное значение (JSON null)
+NOT_CACHED = object()
+
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+class KVCache:
+    """
+    LRU-кэш с TTL перед таблицей kv_store.
+    Хранит и декодированное значение, и исходный JSON: скаляры отдаются как есть,
+    а словари/списки декодируются заново, чтобы вызывающий код не мог
+    испортить закэшированный экземпляр.
+    Размер ограничен и числом записей, и суммарным объемом (по длине JSON и ключа).
+    """
+
+    def __init__(self, max_items=1024, max_bytes=4 * 1024 * 1024, ttl=300.0):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._data = OrderedDict()  # key -> (value, raw, size, expires_at)
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def decode(raw):
+        try:
+            return json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            return raw  # Если не JSON, возвращаем как есть
+
+    def get(self, key):
+        """Значение, MISSING для закэшированного отсутствия или NOT_CACHED при промахе кэша."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl and entry[3] < time.monotonic()):
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return NOT_CACHED
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            value, raw = entry[0], entry[1]
+
+        if value is MISSING or isinstance(value, _IMMUTABLE):
+            return value
+        return self.decode(raw)
+
+    def put(self, key, raw, value=MISSING):
+        """
+        Кладет значение из базы (raw — JSON-строка) или отметку отсутствия (raw=None).
+        Уже декодированное значение можно передать, чтобы не декодировать повторно.
+        """
+        if raw is not None and value is MISSING:
+            value = self.decode(raw)
+
+        size = len(key) + (len(raw) if isinstance(raw, str) else 16)
+        if size > self.max_bytes:
+            self.invalidate(key)
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, raw, size, expires_at)
+            self.bytes += size
+
+            while len(self._data) > self.max_items or self.bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Сбрасывает один ключ или весь кэш."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+                self.bytes = 0
+            elif key in self._data:
+                self._drop(key)
+
+    def _drop(self, key):
+        self.bytes -= self._data.pop(key)[2]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "items": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+        }
@@ -2,6 +2,7 @@ from fuzzywuzzy import fuzz
 from functools import lru_cache
 from utils.logger import logger
 from utils.config_manager import aiko_cfg
+from utils.tracing import tracer
 
 
 class CommandMatcher:
@@ -56,6 +57,7 @@ class CommandMatcher:
             return fuzz.ratio(t, v)
 
     @staticmethod
+    @tracer.traced("matcher.extract")
     def extract(text: str, variants: list, threshold=80, partial=False):
         """
         Ищет наилучшее совпадение из списка вариантов.
@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+
+
+class LatencyStats:
+    """
+    Легковесный сборщик задержек для стадий конвейера.
+    Хранит скользящее окно последних замеров для перцентилей
+    и общие счетчики за все время работы.
+    """
+
+    def __init__(self, window=256):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds: float):
+        """Регистрирует один замер (в секундах)."""
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        """Перцентиль по скользящему окну (в секундах)."""
+        with self._lock:
+            data = sorted(self._samples)
+        if not data:
+            return 0.0
+        idx = min(len(data) - 1, int(round(p / 100 * (len(data) - 1))))
+        return data[idx]
+
+    def snapshot(self) -> dict:
+        """Сводка в миллисекундах для логов и диагностики."""
+        avg = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "last_ms": round(self.last * 1000, 1),
+            "avg_ms": round(avg * 1000, 1),
+            "p50_ms": round(self.percentile(50) * 1000, 1),
+            "p95_ms": round(self.percentile(95) * 1000, 1),
+            "p99_ms": round(self.percentile(99) * 1000, 1),
+            "max_ms": round(self.max * 1000, 1),
+        }
+
+
+def find_regressions(current: dict, baseline: dict, threshold=0.25, min_delta_ms=1.0, thresholds=None) -> list:
+    """
+    Сравнивает отчет бенчмарка с сохраненным базовым.
+    Задержки (*_ms) хуже, если выросли, пропускная способность (*_per_sec) — если упала,
+    относительная стоимость (*_rel, например время автомата / время перебора) — если выросла.
+    Отчеты вложенные ({стадия: {метрика: значение}}), сравниваются общие ключи.
+    :param threshold: допустимое относительное ухудшение (0.25 = 25%).
+    :param min_delta_ms: абсолютный допуск для задержек, чтобы не ловить шум на долях миллисекунды.
+    :param thresholds: порог по имени метрики ({"p99_ms": 1.0}); None — метрика только для справки.
+    :return: список описаний регрессий (пустой — все в норме).
+    """
+    regressions = []
+    thresholds = thresholds or {}
+
+    for key, base in baseline.items():
+        cur = current.get(key)
+        if isinstance(base, dict) and isinstance(cur, dict):
+            regressions += [f"{key}.{r}" for r in find_regressions(cur, base, threshold, min_delta_ms, thresholds)]
+            continue
+        if not isinstance(base, (int, float)) or not isinstance(cur, (int, float)) or not base:
+            continue
+
+        limit = thresholds.get(key, threshold)
+        if limit is None:
+            continue
+
+        if key.endswith("_ms"):
+            if cur > base * (1 + limit) and cur - base > min_delta_ms:
+                regressions.append(f"{key}: {base} -> {cur}")
+        elif key.endswith("_rel"):
+            if cur > base * (1 + limit):
+                regressions.append(f"{key}: {base} -> {cur}")
+        elif key.endswith("_per_sec"):
+            if cur < base * (1 - limit):
+                regressions.append(f"{key}: {base} -> {cur}")
+
+    return regressions
@@ -0,0 +1,190 @@
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from utils.config_manager import aiko_cfg
+from utils.logger import logger
+
+
+class Trace:
+    """Одна команда от захвата (микрофон/Telegram) до исполнения плагина."""
+
+    MAX_SPANS = 256
+
+    __slots__ = ("id", "source", "started_at", "_t0", "attrs", "spans", "total_ms")
+
+    def __init__(self, trace_id, source, started=None, **attrs):
+        self.id = trace_id
+        self.source = source
+        self.started_at = time.time()
+        # Начало в шкале time.monotonic (совпадает с captured_at стадии STT)
+        self._t0 = started if started is not None else time.monotonic()
+        self.attrs = attrs
+        self.spans = []
+        self.total_ms = None
+
+    def add_span(self, name, start, duration, attrs):
+        if len(self.spans) < self.MAX_SPANS:
+            self.spans.append({
+                "name": name,
+                "start_ms": round((start - self._t0) * 1000, 3),
+                "dur_ms": round(duration * 1000, 3),
+                **attrs,
+            })
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.id,
+            "source": self.source,
+            "started_at": round(self.started_at, 3),
+            "total_ms": self.total_ms,
+            **self.attrs,
+            "spans": self.spans,
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "attrs", "_start")
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.monotonic()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.add_span(self.name, self._start, end - self._start, self.attrs)
+        return False
+
+
+class _NoopSpan:
+    """Общий пустой спан: когда трассировка выключена или трейса нет, ничего не аллоцируется."""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+_current = contextvars.ContextVar("aiko_trace", default=None)
+
+
+class Tracer:
+    """
+    Легковесная трассировка команд.
+    Трейс создается при захвате фразы или приходе сообщения из Telegram,
+    спаны стадий (STT, активация, NLU, матчер, исполнение плагина)
+    пишутся в текущий трейс (contextvars: свой в каждом потоке и asyncio-задаче).
+    Готовые трейсы хранятся в ограниченном буфере и, опционально, в JSONL.
+    Выключенный трейсер сводится к одной проверке флага.
+    """
+
+    def __init__(self):
+        self.enabled = aiko_cfg.get("tracing.enabled", False)
+        self.finished = deque(maxlen=aiko_cfg.get("tracing.buffer_size", 200))
+        self.jsonl_path = aiko_cfg.get("tracing.jsonl_path", "")
+
+        self._ids = itertools.count(1)
+        self._prefix = f"{os.getpid():x}"
+        self._file_lock = threading.Lock()
+
+        if self.enabled:
+            logger.info(f"Tracing: Включено (буфер: {self.finished.maxlen}, файл: {self.jsonl_path or '-'})")
+
+    def start(self, source, started=None, **attrs):
+        """Новый трейс или None, если трассировка выключена."""
+        if not self.enabled:
+            return None
+        return Trace(f"{self._prefix}-{next(self._ids)}", source, started, **attrs)
+
+    def activate(self, trace):
+        """Делает трейс текущим в контексте: `with tracer.activate(trace): ...`."""
+        if trace is None:
+            return _NOOP
+        return _Activation(trace)
+
+    def current(self):
+        return _current.get() if self.enabled else None
+
+    def span(self, name, **attrs):
+        """Замер стадии в текущем трейсе: `with tracer.span("nlu.predict"): ...`."""
+        if not self.enabled:
+            return _NOOP
+        trace = _current.get()
+        if trace is None:
+            return _NOOP
+        return _Span(trace, name, attrs)
+
+    def traced(self, name):
+        """Декоратор: весь вызов функции — спан текущего трейса."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or _current.get() is None:
+                    return func(*args, **kwargs)
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def finish(self, trace, **attrs):
+        """Закрывает трейс: буфер последних трейсов и JSONL (если задан)."""
+        if trace is None:
+            return
+        trace.total_ms = round((time.monotonic() - trace._t0) * 1000, 3)
+        trace.attrs.update(attrs)
+        self.finished.append(trace)
+
+        if self.jsonl_path:
+            line = json.dumps(trace.to_dict(), ensure_ascii=False)
+            try:
+                with self._file_lock, open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logger.error(f"Tracing: Ошибка записи в {self.jsonl_path}: {e}")
+
+    def recent(self, limit=20) -> list:
+        """Последние завершенные трейсы (новые в конце)."""
+        return [t.to_dict() for t in list(self.finished)[-limit:]]
+
+
+class _Activation:
+    __slots__ = ("trace", "_token")
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __enter__(self):
+        self._token = _current.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        return False
+
+
+tracer = Tracer()